@@ -1,22 +1,25 @@
+import sys
+from pathlib import Path
+
 import streamlit as st
 
-from src.memory import MemoryStore
-from src.llm_client import LLMClient
-from src.retriever_agent import RetrieverAgent
-from src.planner_agent import PlannerAgent
-from src.evaluator_agent import EvaluatorAgent
+# Library code lives in src/ba_bot (same imports as the CLI scripts in src/).
+sys.path.insert(0, str(Path(__file__).resolve().parent / "src"))
+
+from ba_bot.memory import MemoryStore
+from ba_bot.llm_client import LLMClient
+from ba_bot.retriever import Retriever
+from ba_bot.retriever_agent import RetrieverAgent
+from ba_bot.planner_agent import PlannerAgent
+from ba_bot.evaluator_agent import EvaluatorAgent
+from ba_bot.turn_engine import TurnEngine
 
-SYSTEM_PROMPT = """
-You are a helpful assistant.
-Use the provided CONTEXT to answer the user's question.
 
-Rules:
-- Base your answer on the CONTEXT; do not invent facts.
-- If multiple rules apply depending on route, country, or situation,
-  explain the condition clearly.
-- If essential details are missing, ask ONE clarifying question.
-- Keep the answer concise and user-friendly.
-""".strip()
+@st.cache_resource
+def shared_retriever() -> Retriever:
+    # One embedding model + index for all browser sessions; picks up newly
+    # published index versions without restarting the app.
+    return Retriever(watch_interval_s=10.0)
 
 
 def init_state():
@@ -24,22 +27,18 @@ def init_state():
         st.session_state.memory = MemoryStore(session_id="ui_session")
     if "messages" not in st.session_state:
         st.session_state.messages = []
-    if "llm" not in st.session_state:
-        st.session_state.llm = LLMClient(model="llama3.2:3b")
-    if "retriever" not in st.session_state:
-        st.session_state.retriever = RetrieverAgent(top_k=5)
-    if "planner" not in st.session_state:
-        st.session_state.planner = PlannerAgent(st.session_state.llm, max_subqueries=5)
-    if "evaluator" not in st.session_state:
-        st.session_state.evaluator = EvaluatorAgent(st.session_state.llm, max_extra=4)
+    if "engine" not in st.session_state:
+        llm = LLMClient(model="llama3.2:3b")
+        st.session_state.engine = TurnEngine(
+            llm,
+            RetrieverAgent(top_k=5, retriever=shared_retriever()),
+            PlannerAgent(llm, max_subqueries=5),
+            EvaluatorAgent(llm, max_extra=4),
+        )
     if "debug" not in st.session_state:
         st.session_state.debug = True
 
 
-def build_context_block(contexts):
-    return "\n\n---\n\n".join(f"[{c['chunk_id']}]\n{c['text']}" for c in contexts)
-
-
 st.set_page_config(page_title="Agentic RAG Bot", page_icon="🧳", layout="centered")
 init_state()
 
@@ -61,84 +60,36 @@ for m in st.session_state.messages:
 
 q = st.chat_input("Ask a question…")
 if q:
-    mem = st.session_state.memory
-    llm = st.session_state.llm
-    retriever = st.session_state.retriever
-    planner = st.session_state.planner
-    evaluator = st.session_state.evaluator
-
-    mem.add_turn("user", q)
     st.session_state.messages.append({"role": "user", "content": q})
     with st.chat_message("user"):
         st.markdown(q)
 
-    user_context = mem.get_facts().get("user_context", "")
-
-    # 1) PLAN
-    subqueries = planner.plan(q, user_context=user_context)
-
-    # 2) RETRIEVE
-    contexts = retriever.retrieve(subqueries)
-    used_ids = [c["chunk_id"] for c in contexts]
-    context_block = build_context_block(contexts)
-
-    # 3) DRAFT
-    user_prompt = f"""
-USER_CONTEXT:
-{user_context}
-
-SUBQUERIES:
-{subqueries}
-
-CONTEXT:
-{context_block}
-
-QUESTION:
-{q}
-""".strip()
-
-    draft = llm.chat(SYSTEM_PROMPT, user_prompt)
-
-    # 4) EVALUATE
-    needs_more, extra_queries, reason = evaluator.evaluate(
-        question=q, user_context=user_context, answer=draft, context_chunk_ids=used_ids
-    )
-
-    # 5) OPTIONAL RE-RETRIEVE ONCE
-    if needs_more and extra_queries:
-        contexts2 = retriever.retrieve(extra_queries)
-        used_ids = [c["chunk_id"] for c in contexts2]
-        context_block2 = build_context_block(contexts2)
-
-        user_prompt2 = f"""
-USER_CONTEXT:
-{user_context}
-
-EXTRA_QUERIES:
-{extra_queries}
-
-CONTEXT:
-{context_block2}
-
-QUESTION:
-{q}
-""".strip()
-
-        answer = llm.chat(SYSTEM_PROMPT, user_prompt2)
-    else:
-        answer = draft
-
-    mem.add_turn("assistant", answer, citations=used_ids)
+    result = st.session_state.engine.run(q, st.session_state.memory)
+    answer = result["answer"]
 
     with st.chat_message("assistant"):
         st.markdown(answer)
 
-        if st.session_state.debug:
+        if st.session_state.debug and not result.get("context_only"):
             with st.expander("Debug: subqueries"):
-                st.write(subqueries)
+                st.write(result.get("subqueries", []))
             with st.expander("Debug: chunk IDs"):
-                st.write(used_ids)
+                st.write(result.get("chunk_ids", []))
             with st.expander("Debug: evaluator"):
-                st.write({"needs_more": needs_more, "extra_queries": extra_queries, "reason": reason})
+                st.write({
+                    "needs_more": result.get("needs_more"),
+                    "extra_queries": result.get("extra_queries"),
+                    "reason": result.get("reason"),
+                })
+            with st.expander("Debug: LLM calls"):
+                st.write({
+                    "llm_calls": result["llm_calls"],
+                    "reused": result["reused"],
+                    "skipped": result.get("skipped", []),
+                    "timings": result["timings"],
+                })
+            if result.get("unsupported"):
+                with st.expander("Debug: sentences without supporting context"):
+                    st.write(result["unsupported"])
 
     st.session_state.messages.append({"role": "assistant", "content": answer})
@@ -0,0 +1,182 @@
+import queue
+import threading
+import time
+from concurrent.futures import Future
+from typing import Any, Dict, List, Optional, Tuple
+
+from .retriever import Filters, filter_key
+from .stats import LatencyStats
+
+
+class BatcherFull(RuntimeError):
+    """Raised when the batcher queue is at capacity (caller should back off)."""
+
+
+class QueryBatcher:
+    """
+    Coalesces concurrent Retriever.search calls into micro-batches.
+
+    Requests arriving within `window_ms` of the first queued one are encoded
+    together in a single model.encode() call and searched with one batched
+    index.search(). Exposes .search(query, k) so it can stand in for a
+    Retriever wherever one is expected (e.g. RetrieverAgent).
+    """
+
+    def __init__(
+        self,
+        retriever,
+        window_ms: float = 5.0,
+        max_batch: int = 32,
+        max_queue: int = 256,
+    ):
+        self.retriever = retriever
+        self.window = window_ms / 1000.0
+        self.max_batch = max_batch
+        self._queue: "queue.Queue[Tuple[str, int, Optional[Filters], Future, float]]" = queue.Queue(
+            maxsize=max_queue
+        )
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+        self.latency = LatencyStats()
+        self.batches = 0
+        self.batched_queries = 0
+        self.rejected = 0
+
+    def start(self) -> "QueryBatcher":
+        if self._stop.is_set():
+            raise RuntimeError("QueryBatcher was stopped; create a new one")
+        if self._thread is None:
+            self._thread = threading.Thread(target=self._run, name="query-batcher", daemon=True)
+            self._thread.start()
+        return self
+
+    def stop(self) -> None:
+        """Stop the worker and fail queries still queued; later submit() calls raise."""
+        self._stop.set()
+        if self._thread is not None:
+            self._thread.join(timeout=2)
+            self._thread = None
+        pending = []
+        while True:
+            try:
+                pending.append(self._queue.get_nowait())
+            except queue.Empty:
+                break
+        self._fail(pending, RuntimeError("QueryBatcher stopped"))
+
+    def __getattr__(self, name: str) -> Any:
+        # Anything not batched (chunks, partition_values, ...) goes to the Retriever.
+        if name == "retriever":
+            raise AttributeError(name)
+        return getattr(self.retriever, name)
+
+    def submit(self, query: str, k: int = 5, filters: Optional[Filters] = None) -> Future:
+        fut: Future = Future()
+        query = (query or "").strip()
+        if not query:
+            fut.set_result([])
+            return fut
+
+        self.start()
+        try:
+            self._queue.put_nowait((query, k, filters, fut, time.monotonic()))
+        except queue.Full:
+            self.rejected += 1
+            raise BatcherFull(f"Query queue full ({self._queue.maxsize} pending)")
+        return fut
+
+    def search(self, query: str, k: int = 5, filters: Optional[Filters] = None) -> List[Dict[str, Any]]:
+        return self.submit(query, k, filters).result()
+
+    def pending(self) -> int:
+        return self._queue.qsize()
+
+    def _collect(self) -> List[Tuple[str, int, Optional[Filters], Future, float]]:
+        try:
+            first = self._queue.get(timeout=0.1)
+        except queue.Empty:
+            return []
+
+        batch = [first]
+        deadline = time.monotonic() + self.window
+        while len(batch) < self.max_batch:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self) -> None:
+        while not self._stop.is_set():
+            batch = self._collect()
+            if not batch:
+                continue
+
+            # Identical queries in a batch share one embedding row.
+            unique: Dict[str, int] = {}
+            for q, _, _, _, _ in batch:
+                unique.setdefault(q, len(unique))
+
+            # One index search per distinct filter in the batch.
+            groups: Dict[Tuple, List[Tuple[str, int, Optional[Filters], Future, float]]] = {}
+            for item in batch:
+                groups.setdefault(filter_key(item[2]), []).append(item)
+
+            try:
+                vecs = self.retriever.encode(list(unique))
+            except Exception as e:
+                self._fail(batch, e)
+                continue
+
+            self.batches += 1
+            self.batched_queries += len(batch)
+            for items in groups.values():
+                rows_needed = sorted({unique[q] for q, _, _, _, _ in items})
+                k_max = max(k for _, k, _, _, _ in items)
+                try:
+                    rows = self.retriever.search_vectors(vecs[rows_needed], k_max, items[0][2])
+                except Exception as e:
+                    self._fail(items, e)
+                    continue
+
+                pos = {r: i for i, r in enumerate(rows_needed)}
+                for q, k, _, fut, t0 in items:
+                    if self._resolve(fut, result=[dict(h) for h in rows[pos[unique[q]]][:k]]):
+                        self.latency.record(time.monotonic() - t0)
+
+    def _fail(self, items, exc: Exception) -> None:
+        for _, _, _, fut, t0 in items:
+            if self._resolve(fut, exc=exc):
+                self.latency.record(time.monotonic() - t0, ok=False)
+
+    @staticmethod
+    def _resolve(fut: Future, result: Any = None, exc: Optional[Exception] = None) -> bool:
+        """
+        Settle `fut` unless its caller gave up on it (asyncio.wrap_future
+        cancels it when the request is cancelled). Never raises: an
+        InvalidStateError here would kill the batcher thread.
+        """
+        if fut.done():
+            return False
+        try:
+            if exc is not None:
+                fut.set_exception(exc)
+            else:
+                fut.set_result(result)
+        except Exception:  # cancelled between the check and the call
+            return False
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "batches": self.batches,
+            "mean_batch_size": round(self.batched_queries / self.batches, 2) if self.batches else 0.0,
+            "pending": self.pending(),
+            "rejected": self.rejected,
+            "window_ms": self.window * 1000.0,
+            "latency": self.latency.snapshot(),
+        }
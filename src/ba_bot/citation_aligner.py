@@ -0,0 +1,141 @@
+"""
+Post-hoc citations: attach [chunk_id]s to answer sentences locally instead
+of asking the LLM to rewrite its answer.
+
+Each sentence without a citation is scored against the turn's context
+chunks and gets the best-supporting id(s) appended. With an encoder (the
+Retriever's, already loaded) the score is the cosine similarity between the
+sentence embedding and the chunk's stored index vector; without one it is
+lexical: the IDF-weighted share of the sentence's terms found in the chunk.
+Sentences whose best score is under the threshold are left uncited and
+reported as unsupported.
+"""
+import re
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from .text_utils import sentence_spans, terms
+
+CITATION_RE = re.compile(r"\[[^\[\]]+\]")
+TRAILING_PUNCT = ".!?:;"
+
+Encoder = Callable[[List[str]], np.ndarray]
+VectorLookup = Callable[[List[str]], Optional[np.ndarray]]
+
+
+class CitationAligner:
+    """
+    align(answer, contexts) -> (answer with citations, per-sentence report).
+
+    `encoder` embeds a list of texts (normalized rows); `chunk_vectors`
+    returns the stored vectors for a list of chunk ids (or None), so chunks
+    are not re-encoded. Without an encoder, or if encoding fails, scoring
+    falls back to lexical overlap weighted by `idf`.
+    """
+
+    def __init__(
+        self,
+        encoder: Optional[Encoder] = None,
+        chunk_vectors: Optional[VectorLookup] = None,
+        idf: Optional[Dict[str, float]] = None,
+        threshold: float = 0.35,
+        lexical_threshold: float = 0.4,
+        max_ids: int = 2,
+        margin: float = 0.05,
+        min_terms: int = 3,
+    ):
+        self.encoder = encoder
+        self.chunk_vectors = chunk_vectors
+        self.idf = idf or {}
+        self.threshold = threshold
+        self.lexical_threshold = lexical_threshold
+        self.max_ids = max_ids
+        self.margin = margin
+        self.min_terms = min_terms
+
+    # ---------- scoring ----------
+
+    def _embedding_scores(self, sentences: List[str], contexts: Sequence[Dict[str, Any]]) -> np.ndarray:
+        ids = [c["chunk_id"] for c in contexts]
+        ctx = self.chunk_vectors(ids) if self.chunk_vectors else None
+        if ctx is None:
+            vecs = self.encoder(sentences + [c.get("text", "") for c in contexts])
+            sent, ctx = vecs[: len(sentences)], vecs[len(sentences):]
+        else:
+            sent = self.encoder(sentences)
+        return np.asarray(sent, dtype="float32") @ np.asarray(ctx, dtype="float32").T
+
+    def _lexical_scores(self, sentences: List[str], contexts: Sequence[Dict[str, Any]]) -> np.ndarray:
+        # ingest.py stores a term -> sentence index per chunk; its keys are the chunk's terms.
+        ctx_terms = [set(c["terms"]) if "terms" in c else set(terms(c.get("text", ""))) for c in contexts]
+        scores = np.zeros((len(sentences), len(contexts)), dtype="float32")
+        for i, s in enumerate(sentences):
+            weights = {t: self.idf.get(t, 1.0) for t in terms(s)}
+            total = sum(weights.values())
+            if not total:
+                continue
+            for j, have in enumerate(ctx_terms):
+                scores[i, j] = sum(w for t, w in weights.items() if t in have) / total
+        return scores
+
+    def score(self, sentences: List[str], contexts: Sequence[Dict[str, Any]]) -> Tuple[np.ndarray, float, str]:
+        """(sentence x context scores, threshold, method)."""
+        if self.encoder is not None:
+            try:
+                return self._embedding_scores(sentences, contexts), self.threshold, "embedding"
+            except Exception:
+                pass  # e.g. encoder unavailable; lexical still works
+        return self._lexical_scores(sentences, contexts), self.lexical_threshold, "lexical"
+
+    # ---------- alignment ----------
+
+    def _units(self, answer: str) -> List[Tuple[int, int, bool]]:
+        """(start, end, already_cited) for each sentence worth citing."""
+        units: List[List[Any]] = []
+        for start, end in sentence_spans(answer):
+            text = answer[start:end]
+            cited = bool(CITATION_RE.search(text))
+            content = CITATION_RE.sub(" ", text)
+            if cited and not terms(content) and units:
+                # "... sentence. [id]" splits into two spans; credit the sentence.
+                units[-1][2] = True
+                continue
+            if len(terms(content)) >= self.min_terms:
+                units.append([start, end, cited])
+        return [(s, e, c) for s, e, c in units]
+
+    def align(self, answer: str, contexts: Sequence[Dict[str, Any]]) -> Tuple[str, List[Dict[str, Any]]]:
+        contexts = [c for c in contexts if c.get("chunk_id")]
+        todo = [(s, e) for s, e, cited in self._units(answer) if not cited]
+        if not todo or not contexts:
+            return answer, []
+
+        sentences = [answer[s:e] for s, e in todo]
+        scores, threshold, method = self.score(sentences, contexts)
+
+        report: List[Dict[str, Any]] = []
+        inserts: List[Tuple[int, str]] = []
+        for (s, e), sentence, row in zip(todo, sentences, scores):
+            order = np.argsort(-row)
+            best = float(row[order[0]])
+            ids = [
+                contexts[j]["chunk_id"]
+                for j in order[: self.max_ids]
+                if row[j] >= threshold and row[j] >= best - self.margin
+            ]
+            report.append({
+                "sentence": sentence,
+                "chunk_ids": ids,
+                "score": round(best, 3),
+                "supported": bool(ids),
+                "method": method,
+            })
+            if ids:
+                # Before the closing punctuation: "... 100ml [ba_lr_002]."
+                pos = e - 1 if answer[e - 1] in TRAILING_PUNCT else e
+                inserts.append((pos, " " + "".join(f"[{cid}]" for cid in ids)))
+
+        for pos, text in reversed(inserts):
+            answer = answer[:pos] + text + answer[pos:]
+        return answer, report
@@ -0,0 +1,66 @@
+import math
+import threading
+import time
+from typing import Dict, Optional
+
+
+class Deadline:
+    """
+    Per-turn latency budget. Each stage checks what is left before it starts
+    and passes the remainder to the LLM as its timeout.
+
+    budget_s=None (or <= 0) means no limit.
+    """
+
+    def __init__(self, budget_s: Optional[float] = None):
+        self.budget_s = budget_s if budget_s and budget_s > 0 else None
+        self.started = time.monotonic()
+
+    def elapsed(self) -> float:
+        return time.monotonic() - self.started
+
+    def remaining(self) -> float:
+        if self.budget_s is None:
+            return math.inf
+        return max(0.0, self.budget_s - self.elapsed())
+
+    def expired(self) -> bool:
+        return self.budget_s is not None and self.remaining() <= 0
+
+    def allows(self, seconds: float) -> bool:
+        # Nothing fits once the budget is used up, not even a stage estimated at 0s.
+        return not self.expired() and self.remaining() >= seconds
+
+    def timeout(self, reserve: float = 0.0) -> Optional[float]:
+        """Seconds a call may take while keeping `reserve` for later stages (None = unbounded)."""
+        if self.budget_s is None:
+            return None
+        return max(0.0, self.remaining() - reserve)
+
+
+class StageEstimates:
+    """
+    Running estimate (EMA) of how long each pipeline stage takes, used to
+    decide whether an optional stage still fits in the remaining budget.
+    """
+
+    # Conservative starting points for a local 3B model; replaced by
+    # observations after the first few turns.
+    DEFAULTS = {"plan": 3.0, "retrieve": 0.2, "draft": 8.0, "evaluate": 3.0, "final": 8.0}
+
+    def __init__(self, alpha: float = 0.3, defaults: Optional[Dict[str, float]] = None):
+        self.alpha = alpha
+        self._est: Dict[str, float] = dict(defaults or self.DEFAULTS)
+        self._lock = threading.Lock()
+
+    def get(self, stage: str) -> float:
+        return self._est.get(stage, 0.0)
+
+    def observe(self, stage: str, seconds: float) -> None:
+        with self._lock:
+            prev = self._est.get(stage)
+            self._est[stage] = seconds if prev is None else (1 - self.alpha) * prev + self.alpha * seconds
+
+    def snapshot(self) -> Dict[str, float]:
+        with self._lock:
+            return {k: round(v, 3) for k, v in self._est.items()}
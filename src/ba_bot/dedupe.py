@@ -0,0 +1,138 @@
+"""
+Near-duplicate chunk detection with MinHash + LSH.
+
+Each chunk is reduced to its set of word shingles (SHINGLE_SIZE consecutive
+terms) and a MinHash signature of NUM_PERM values. Signatures are cut into
+BANDS bands; chunks sharing any band bucket become candidate pairs (for
+Jaccard ~0.5 and up with the defaults), so the corpus is never compared
+all-against-all. Candidates are confirmed with the exact shingle Jaccard
+against `threshold`, and confirmed pairs are merged into clusters.
+
+With group keys (ingest.py: source + section), chunks of one group merge
+at `threshold` and chunks of different groups only at the stricter
+`cross_threshold`: boilerplate repeated across sections folds, while two
+sections that merely share a closing paragraph keep their own rules.
+Consecutive positions of one group are overlapping windows of the same
+text and never merged: neighbour expansion and stitching
+(ba_bot.stitching) join exactly those.
+
+ingest.py keeps the first chunk of each cluster (in corpus order) and lists
+the others (id, section, source) under its "aliases"; the Retriever
+resolves alias ids to it and searches it under the alias sections too.
+"""
+import zlib
+from typing import Dict, Hashable, Iterable, List, Optional, Sequence, Set
+
+import numpy as np
+
+from .text_utils import TOKEN_RE
+
+SHINGLE_SIZE = 5
+NUM_PERM = 64
+BANDS = 16
+# Mersenne prime 2^31 - 1: with 31-bit hashes a*x + b stays below 2^63.
+PRIME = (1 << 31) - 1
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> Set[int]:
+    toks = TOKEN_RE.findall((text or "").lower())
+    if len(toks) <= size:
+        grams = [" ".join(toks)] if toks else []
+    else:
+        grams = [" ".join(toks[i:i + size]) for i in range(len(toks) - size + 1)]
+    return {zlib.crc32(g.encode("utf-8")) & PRIME for g in grams}
+
+
+def jaccard(a: Set[int], b: Set[int]) -> float:
+    if not a and not b:
+        return 1.0
+    return len(a & b) / len(a | b)
+
+
+class MinHasher:
+    """MinHash signatures from NUM_PERM random (a*x + b) mod PRIME permutations."""
+
+    def __init__(self, num_perm: int = NUM_PERM, seed: int = 1):
+        rng = np.random.RandomState(seed)
+        self.a = rng.randint(1, PRIME, size=num_perm).astype(np.uint64)
+        self.b = rng.randint(0, PRIME, size=num_perm).astype(np.uint64)
+
+    def signature(self, shingle_set: Iterable[int]) -> np.ndarray:
+        x = np.fromiter(shingle_set, dtype=np.uint64)
+        if x.size == 0:
+            return np.full(self.a.shape, PRIME, dtype=np.uint64)
+        return ((np.outer(x, self.a) + self.b) % PRIME).min(axis=0)
+
+
+def near_duplicate_groups(
+    texts: Sequence[str],
+    threshold: float = 0.8,
+    num_perm: int = NUM_PERM,
+    bands: int = BANDS,
+    groups: Optional[Sequence[Hashable]] = None,
+    cross_threshold: Optional[float] = None,
+) -> List[List[int]]:
+    """
+    Clusters of near-duplicate texts, as lists of positions in `texts`
+    (ascending; the first is the canonical one). Singletons are omitted.
+    `groups` (one key per text): texts with different keys pair only at
+    `cross_threshold` (None = never), and adjacent texts of one key
+    (overlapping windows) never end up in one cluster.
+    """
+    windows = groups is not None
+    keys = list(groups) if windows else [None] * len(texts)
+    if len(keys) != len(texts):
+        raise ValueError(f"groups has {len(keys)} keys for {len(texts)} texts")
+    if num_perm % bands:
+        raise ValueError(f"num_perm ({num_perm}) must be a multiple of bands ({bands})")
+    rows = num_perm // bands
+    hasher = MinHasher(num_perm)
+    sets = [shingles(t) for t in texts]
+
+    buckets: Dict[tuple, List[int]] = {}
+    for i, s in enumerate(sets):
+        if not s:
+            continue
+        sig = hasher.signature(s)
+        for band in range(bands):
+            key = (band, sig[band * rows:(band + 1) * rows].tobytes())
+            buckets.setdefault(key, []).append(i)
+
+    parent = list(range(len(texts)))
+
+    def find(i: int) -> int:
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    members: Dict[int, Set[int]] = {i: {i} for i in range(len(texts))}
+
+    checked = set()
+    for bucket in buckets.values():
+        for x in range(len(bucket)):
+            for y in range(x + 1, len(bucket)):
+                i, j = bucket[x], bucket[y]
+                if (i, j) in checked:
+                    continue
+                checked.add((i, j))
+                ri, rj = find(i), find(j)
+                if ri == rj:
+                    continue
+                need = threshold if keys[i] == keys[j] else cross_threshold
+                if need is None or jaccard(sets[i], sets[j]) < need:
+                    continue
+                if windows and any(
+                    m + d in members[rj] and keys[m] == keys[m + d]
+                    for m in members[ri] for d in (-1, 1)
+                ):
+                    continue  # would fold one overlapping window into its neighbour
+                # The earlier chunk stays the root, i.e. the canonical one.
+                root, other = min(ri, rj), max(ri, rj)
+                parent[other] = root
+                members[root] |= members.pop(other)
+
+    clusters: Dict[int, List[int]] = {}
+    for i in range(len(texts)):
+        clusters.setdefault(find(i), []).append(i)
+    return [g for g in clusters.values() if len(g) > 1]
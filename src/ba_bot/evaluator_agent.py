@@ -1,6 +1,6 @@
 import json
 import re
-from typing import List, Tuple, Any, Dict
+from typing import List, Tuple, Any, Dict, Optional
 
 
 class EvaluatorAgent:
@@ -13,11 +13,29 @@ class EvaluatorAgent:
     - ambiguity that could be resolved with more context
 
     Returns: (needs_more_evidence, extra_queries, reason)
+
+    The reply is constrained to `schema` (Ollama structured output) and
+    capped at `num_predict` tokens (None: the role's LLM route cap, see
+    data/llm_routes.json), so it always parses and stays short.
     """
 
-    def __init__(self, llm_client, max_extra: int = 4):
+    def __init__(self, llm_client, max_extra: int = 4, num_predict: Optional[int] = None):
         self.llm = llm_client
         self.max_extra = max_extra
+        self.num_predict = num_predict
+        self.schema: Dict[str, Any] = {
+            "type": "object",
+            "properties": {
+                "needs_more_evidence": {"type": "boolean"},
+                "extra_queries": {
+                    "type": "array",
+                    "items": {"type": "string", "maxLength": 100},
+                    "maxItems": max_extra,
+                },
+                "reason": {"type": "string", "maxLength": 200},
+            },
+            "required": ["needs_more_evidence", "extra_queries", "reason"],
+        }
         self.system = """
 You are an evaluator for a retrieval-grounded assistant.
 
@@ -28,6 +46,9 @@ Return ONLY valid JSON in this schema:
   "reason": "short reason"
 }
 
+Decide if more retrieval is needed. If yes, propose extra_queries that would
+retrieve missing evidence.
+
 Rules:
 - If the answer is incomplete, vague, or conditional without explanation,
   set needs_more_evidence=true.
@@ -40,8 +61,9 @@ Rules:
     @staticmethod
     def _extract_json_object(text: str) -> str:
         """
-        Some models wrap JSON in text or ```json fences.
-        This extracts the first top-level JSON object substring.
+        Some models wrap JSON in text or ```json fences (only seen when the
+        server ignores `format`). This extracts the first top-level JSON
+        object substring.
         """
         if not text:
             return ""
@@ -74,30 +96,39 @@ Rules:
         user_context: str,
         answer: str,
         context_chunk_ids: List[str],
+        timeout: Optional[float] = None,
     ) -> Tuple[bool, List[str], str]:
 
+        # Fixed instructions live in the system prompt (a cacheable prefix);
+        # the user prompt goes from session-stable to turn-specific.
         prompt = f"""
 USER_CONTEXT:
 {user_context}
 
-AVAILABLE_CONTEXT_CHUNK_IDS:
-{context_chunk_ids}
-
 QUESTION:
 {question}
 
+AVAILABLE_CONTEXT_CHUNK_IDS:
+{context_chunk_ids}
+
 ANSWER:
 {answer}
-
-Decide if more retrieval is needed. If yes, propose extra_queries that would retrieve missing evidence.
-Return JSON only.
 """.strip()
 
-        raw = self.llm.chat(self.system, prompt)
+        try:
+            raw = self.llm.chat(
+                self.system, prompt, timeout=timeout, format=self.schema, num_predict=self.num_predict,
+                role="evaluator",
+            )
+        except RuntimeError as e:
+            # Evaluation is optional; never fail the turn over it
+            return False, [], f"Evaluator skipped: {e}"
 
         try:
-            raw_json = self._extract_json_object(raw)
-            data: Dict[str, Any] = json.loads(raw_json)
+            try:
+                data: Dict[str, Any] = json.loads(raw)
+            except ValueError:
+                data = json.loads(self._extract_json_object(raw))
 
             # Allow mild key drift from the model
             needs = data.get("needs_more_evidence", data.get("needs_more", False))
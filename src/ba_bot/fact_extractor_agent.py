@@ -0,0 +1,25 @@
+from typing import Any, Dict, Optional, Tuple
+
+from .fact_rules import FactRuleEngine
+from .memory import MemoryStore
+
+class FactExtractorAgent:
+    """
+    Light-weight rule-based extractor (fast + reliable for demo).
+    Extracts stable travel-context facts from user messages and stores them in memory.
+
+    Rules live in data/fact_rules.json and are compiled into one matcher, so
+    each message is scanned once and all facts are committed in one write.
+    """
+
+    def __init__(self, engine: Optional[FactRuleEngine] = None):
+        self.engine = engine or FactRuleEngine()
+
+    def extract(self, user_text: str) -> Tuple[Dict[str, Any], bool]:
+        """(facts, context_only) for one message; nothing is stored."""
+        return self.engine.scan(user_text.strip())
+
+    def extract_and_store(self, user_text: str, memory: MemoryStore) -> Dict[str, Any]:
+        facts, _ = self.extract(user_text)
+        memory.set_facts(facts)
+        return facts
@@ -0,0 +1,93 @@
+import json
+import re
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parents[2]
+RULES_PATH = ROOT / "data" / "fact_rules.json"
+
+VALUE_GROUP_RE = re.compile(r"\(\?P<value>")
+
+
+class FactRuleEngine:
+    """
+    Compiles every fact and context-only rule from a declarative rule file
+    into a single alternation regex, so a message is scanned once however
+    many rules there are.
+
+    The scan resumes one character after each hit (not after the whole
+    match), so overlapping rules such as "flying from Australia" (place) and
+    "australia" (country) are both seen. At a hit position the alternation
+    reports the first rule in file order; later rules are checked with an
+    anchored match at that same position.
+    """
+
+    def __init__(self, rules_path: Optional[Path] = None):
+        rules_path = rules_path or RULES_PATH
+        spec = json.loads(rules_path.read_text(encoding="utf-8"))
+
+        # (kind, rule, anchored regex) per alternative, in file order
+        self._rules: List[Tuple[str, Optional[Dict[str, Any]], "re.Pattern[str]"]] = []
+        branches: List[str] = []
+
+        for rule in spec.get("facts", []):
+            self._add("fact", rule, rule["pattern"], branches)
+        for pattern in spec.get("context_only", []):
+            self._add("context_only", None, pattern, branches)
+
+        # Group names must be unique in the combined regex, so the union uses
+        # plain groups r0..rN and the per-rule regexes keep (?P<value>...).
+        self.regex = re.compile("|".join(branches) or r"(?!)", flags=re.IGNORECASE)
+        self._n_facts = len({r["fact"] for _, r, _ in self._rules if r})
+
+    def _add(self, kind: str, rule: Optional[Dict[str, Any]], pattern: str, branches: List[str]) -> None:
+        i = len(self._rules)
+        try:
+            own = re.compile(pattern, flags=re.IGNORECASE)
+        except re.error as e:
+            # Validate each rule on its own so a bad one is reported by itself.
+            raise ValueError(f"Invalid {kind} rule #{i}: {pattern!r} ({e})") from e
+        self._rules.append((kind, rule, own))
+        branches.append(f"(?P<r{i}>{VALUE_GROUP_RE.sub('(?:', pattern)})")
+
+    def scan(self, text: str) -> Tuple[Dict[str, Any], bool]:
+        """
+        One pass over `text`. Returns (facts, context_only): every fact found
+        (leftmost match per fact wins) and whether any context-only rule matched.
+        """
+        text = text or ""
+        facts: Dict[str, Any] = {}
+        context_only = False
+
+        pos = 0
+        while pos <= len(text):
+            m = self.regex.search(text, pos)
+            if m is None:
+                break
+            start = m.start()
+            first = int(m.lastgroup[1:])
+
+            for i in range(first, len(self._rules)):
+                kind, rule, own = self._rules[i]
+                # Leftmost match already decided this rule's outcome
+                if (context_only and kind == "context_only") or (rule and rule["fact"] in facts):
+                    continue
+                hit = m if i == first else own.match(text, start)
+                if hit is None:
+                    continue
+                if kind == "context_only":
+                    context_only = True
+                elif "value" in rule:
+                    facts[rule["fact"]] = rule["value"]
+                else:
+                    if hit is m:
+                        hit = own.match(text, start)
+                    captured = hit.group("value") if hit else None
+                    if captured and captured.strip():
+                        facts[rule["fact"]] = captured.strip()
+
+            if context_only and len(facts) == self._n_facts:
+                break  # every rule decided; nothing left to find
+            pos = start + 1
+
+        return facts, context_only
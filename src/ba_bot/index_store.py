@@ -0,0 +1,115 @@
+"""
+Versioned index snapshots on disk.
+
+    data/index/
+        CURRENT                      <- name of the live version (one line)
+        versions/<version>/
+            faiss.index
+            chunk_meta.json
+            partitions.json
+            manifest.json            <- written last; a dir without it is incomplete
+
+A sharded build (build_index.py --shard-by) instead puts one
+faiss.index/chunk_meta.json/partitions.json per shard under
+versions/<version>/shards/<name>/, lists the shards in the manifest and
+writes chunk_shards.json (chunk_id -> shard name) next to it.
+
+build_index.py fills a fresh version directory and only then publishes it by
+replacing CURRENT with os.replace(), which is atomic, so readers see either
+the old or the new version and never a half-written index/metadata pair.
+An index dir without CURRENT (the old flat layout) is still readable.
+"""
+import hashlib
+import json
+import os
+import shutil
+import time
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+
+ROOT = Path(__file__).resolve().parents[2]
+INDEX_DIR = ROOT / "data" / "index"
+
+CURRENT_FILE = "CURRENT"
+VERSIONS_DIR = "versions"
+SHARDS_DIR = "shards"
+MANIFEST_FILE = "manifest.json"
+UNVERSIONED = "unversioned"
+
+
+def file_digest(path: Path) -> str:
+    h = hashlib.sha256()
+    with path.open("rb") as f:
+        for block in iter(lambda: f.read(1 << 20), b""):
+            h.update(block)
+    return h.hexdigest()
+
+
+def version_dir(index_dir: Path, version: str) -> Path:
+    return index_dir / VERSIONS_DIR / version
+
+
+def new_version_dir(index_dir: Path, digest: str) -> Tuple[str, Path]:
+    """Create an empty, unpublished directory named <UTC timestamp>-<digest[:8]>."""
+    base = time.strftime("%Y%m%dT%H%M%SZ", time.gmtime()) + "-" + digest[:8]
+    version, n = base, 1
+    while True:
+        path = version_dir(index_dir, version)
+        try:
+            path.mkdir(parents=True)
+            return version, path
+        except FileExistsError:
+            n += 1
+            version = f"{base}.{n}"
+
+
+def write_manifest(path: Path, manifest: Dict[str, Any]) -> None:
+    (path / MANIFEST_FILE).write_text(json.dumps(manifest, indent=2), encoding="utf-8")
+
+
+def read_manifest(path: Path) -> Dict[str, Any]:
+    f = path / MANIFEST_FILE
+    return json.loads(f.read_text(encoding="utf-8")) if f.exists() else {}
+
+
+def read_current(index_dir: Path) -> Optional[str]:
+    """Published version name, or None for the flat (unversioned) layout."""
+    try:
+        return (index_dir / CURRENT_FILE).read_text(encoding="utf-8").strip() or None
+    except FileNotFoundError:
+        return None
+
+
+def resolve(index_dir: Path) -> Tuple[str, Path]:
+    """(version, directory holding faiss.index + chunk_meta.json)."""
+    version = read_current(index_dir)
+    if version is None:
+        return UNVERSIONED, index_dir
+    return version, version_dir(index_dir, version)
+
+
+def publish(index_dir: Path, version: str) -> None:
+    """Point CURRENT at `version` in one atomic rename."""
+    if not (version_dir(index_dir, version) / MANIFEST_FILE).exists():
+        raise RuntimeError(f"Refusing to publish incomplete index version: {version}")
+    tmp = index_dir / f"{CURRENT_FILE}.tmp-{os.getpid()}"
+    tmp.write_text(version + "\n", encoding="utf-8")
+    os.replace(tmp, index_dir / CURRENT_FILE)
+
+
+def prune(index_dir: Path, keep: int) -> List[str]:
+    """
+    Delete all but the newest `keep` versions (never the published one).
+    Running processes may still be reading a recent older version, so keep >= 2.
+    """
+    root = index_dir / VERSIONS_DIR
+    if not root.exists():
+        return []
+    current = read_current(index_dir)
+    versions = sorted((p.name for p in root.iterdir() if p.is_dir()), reverse=True)
+    removed = []
+    for v in versions[max(keep, 1):]:
+        if v != current:
+            shutil.rmtree(root / v, ignore_errors=True)
+            removed.append(v)
+    return removed
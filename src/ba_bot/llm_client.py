@@ -1,5 +1,122 @@
 from __future__ import annotations
-from typing import Any, Dict, Optional
+
+import json
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Sequence, Union
+
+from .stats import LatencyStats
+
+logger = logging.getLogger(__name__)
+
+# Ollama reports durations in nanoseconds.
+NS_PER_MS = 1_000_000
+
+ROOT = Path(__file__).resolve().parents[2]
+ROUTES_PATH = ROOT / "data" / "llm_routes.json"
+ROUTE_KEYS = {"model", "temperature", "num_predict"}
+# httpx timeouts raised before a request reached the backend.
+CONNECT_TIMEOUTS = {"ConnectTimeout", "PoolTimeout"}
+
+
+class LLMTimeout(RuntimeError):
+    """The model did not answer within the per-call timeout."""
+
+
+class ModelUnavailable(RuntimeError):
+    """No backend has the requested model (Ollama answered 404)."""
+
+
+def load_routes(path: Optional[Path] = None) -> Dict[str, Dict[str, Any]]:
+    """
+    Per-role call settings, e.g. data/llm_routes.json:
+        {"planner": {"model": "llama3.2:1b", "temperature": 0.0, "num_predict": 160}}
+    Roles are the callers' names (planner, evaluator, draft, final); each may
+    set any of model, temperature, num_predict. Missing file -> no routing.
+    """
+    path = path or ROUTES_PATH
+    if not path.exists():
+        return {}
+    spec = json.loads(path.read_text(encoding="utf-8"))
+    routes: Dict[str, Dict[str, Any]] = {}
+    for role, route in spec.items():
+        if role.startswith("_"):
+            continue  # "_comment"
+        unknown = set(route) - ROUTE_KEYS
+        if unknown:
+            raise ValueError(f"Unknown keys for LLM route {role!r} in {path}: {sorted(unknown)}")
+        routes[role] = dict(route)
+    return routes
+
+
+class Backend:
+    """
+    One Ollama endpoint plus the routing state the pool keeps for it:
+    in-flight requests, a latency EWMA and a circuit breaker.
+    """
+
+    def __init__(self, ollama, host: Optional[str], timeout: float):
+        self.ollama = ollama
+        self.host = host
+        self.client = ollama.Client(host=host, timeout=timeout) if host else ollama.Client(timeout=timeout)
+
+        self.inflight = 0
+        self.latency_ewma: Optional[float] = None
+        self.requests = 0
+        self.failures = 0
+        self.consecutive_failures = 0
+        self.open_until = 0.0  # circuit open (backend ejected) until this monotonic time
+        self.lock = threading.Lock()
+
+    @property
+    def name(self) -> str:
+        return self.host or "default"
+
+    @contextmanager
+    def client_for(self, timeout: Optional[float]):
+        """
+        The shared client, or for a per-call timeout (which ollama only takes
+        at construction) a temporary one whose HTTP connections are closed
+        after the call.
+        """
+        if timeout is None:
+            yield self.client
+            return
+        if self.host:
+            client = self.ollama.Client(host=self.host, timeout=timeout)
+        else:
+            client = self.ollama.Client(timeout=timeout)
+        try:
+            yield client
+        finally:
+            close = getattr(client, "close", None) or getattr(getattr(client, "_client", None), "close", None)
+            if close is not None:
+                close()
+
+    def available(self, now: float) -> bool:
+        # After the cooldown the circuit is half-open: the next request is a probe.
+        return now >= self.open_until
+
+    def load_score(self) -> float:
+        # Expected wait ≈ queue depth × typical latency. Unknown latency counts
+        # as fast so new/recovered backends get traffic.
+        return (self.inflight + 1) * (self.latency_ewma or 0.05)
+
+    def snapshot(self) -> Dict[str, Any]:
+        now = time.monotonic()
+        return {
+            "host": self.name,
+            "inflight": self.inflight,
+            "latency_ewma_s": round(self.latency_ewma, 3) if self.latency_ewma is not None else None,
+            "requests": self.requests,
+            "failures": self.failures,
+            "circuit": "open" if now < self.open_until else "closed",
+        }
 
 
 class LLMClient:
@@ -8,13 +125,34 @@ class LLMClient:
         model: str = "llama3.2:3b",
         temperature: float = 0.2,
         timeout: int = 60,
+        hosts: Optional[Sequence[str]] = None,
+        max_retries: int = 2,
+        failure_threshold: int = 3,
+        cooldown_s: float = 30.0,
+        health_interval_s: float = 0.0,
+        keep_alive: Union[str, float, None] = "30m",
+        routes: Optional[Dict[str, Dict[str, Any]]] = None,
     ):
         """
         Ollama client wrapper.
 
         model: Ollama model name (e.g., 'llama3.2:3b')
         temperature: decoding temperature
-        timeout: seconds (best-effort; depends on ollama python client/version)
+        timeout: default per-request timeout in seconds; chat(timeout=...)
+                 overrides it for one call (e.g. to respect a turn deadline)
+        hosts: Ollama endpoints to balance across (e.g. 'http://10.0.0.5:11434').
+               Defaults to $OLLAMA_HOSTS (comma-separated), else the local server.
+        max_retries: extra backends to try when a request fails
+        failure_threshold / cooldown_s: consecutive failures that eject a
+               backend, and for how long before it is probed again
+        health_interval_s: > 0 starts a background health checker
+        keep_alive: how long Ollama keeps the model (and its KV cache) loaded
+               after a request; the server default of 5m unloads it between
+               quiet turns and every prompt is then evaluated from scratch
+        routes: role -> {model, temperature, num_predict} for chat(role=...)
+               calls (see load_routes); defaults to data/llm_routes.json if
+               present, {} disables routing. A routed model that no backend
+               has falls back to `model` for cooldown_s before it is tried again.
         """
         try:
             import ollama  # type: ignore
@@ -27,36 +165,346 @@ class LLMClient:
         self.model = model
         self.temperature = temperature
         self.timeout = timeout
+        self.max_retries = max_retries
+        self.failure_threshold = failure_threshold
+        self.cooldown_s = cooldown_s
+        self.keep_alive = keep_alive
+        self.routes = load_routes() if routes is None else routes
+
+        # routed model -> monotonic time until which it is skipped (not pulled)
+        self._unavailable: Dict[str, float] = {}
+        self._role_lock = threading.Lock()
+        self._role_stats: Dict[str, LatencyStats] = {}
+        self._role_fallbacks: Dict[str, int] = {}
+
+        # affinity key -> backend that last served it (bounded LRU), so calls
+        # sharing a prompt prefix hit the node that already has it cached.
+        self._affinity: "OrderedDict[str, Backend]" = OrderedDict()
+        self._local = threading.local()
+        self._usage_lock = threading.Lock()
+        self.usage: Dict[str, float] = {
+            "calls": 0, "prompt_eval_tokens": 0, "prompt_eval_ms": 0.0, "eval_tokens": 0, "eval_ms": 0.0,
+        }
+
+        if hosts is None:
+            env = os.environ.get("OLLAMA_HOSTS", "")
+            hosts = [h.strip() for h in env.split(",") if h.strip()]
+        self.backends: List[Backend] = [Backend(ollama, h, timeout) for h in hosts] or [
+            Backend(ollama, None, timeout)
+        ]
+        self._pick_lock = threading.Lock()
+
+        self._health_stop = threading.Event()
+        if health_interval_s > 0:
+            threading.Thread(
+                target=self._health_loop, args=(health_interval_s,), name="llm-health", daemon=True
+            ).start()
+
+    # ---------- routing ----------
+
+    def _pick(self, exclude: Sequence[Backend], affinity: Optional[str] = None) -> Optional[Backend]:
+        """Least-loaded available backend; reserves an in-flight slot on it."""
+        now = time.monotonic()
+        with self._pick_lock:
+            candidates = [b for b in self.backends if b not in exclude and b.available(now)]
+            if not candidates:
+                return None
+            best = min(candidates, key=lambda b: b.load_score())
+
+            # Stick to the backend holding this prefix unless it is clearly busier.
+            sticky = self._affinity.get(affinity) if affinity else None
+            if sticky in candidates and sticky.load_score() <= 2 * best.load_score():
+                best = sticky
+            if affinity:
+                self._affinity[affinity] = best
+                self._affinity.move_to_end(affinity)
+                while len(self._affinity) > 256:
+                    self._affinity.popitem(last=False)
+
+            with best.lock:
+                best.inflight += 1
+                best.requests += 1
+                if now >= best.open_until and best.consecutive_failures >= self.failure_threshold:
+                    # Half-open probe: re-eject immediately if it fails again.
+                    best.open_until = now + self.cooldown_s
+            return best
+
+    def _release(self, b: Backend, elapsed: Optional[float], ok: Optional[bool]) -> None:
+        """ok=None: no verdict on the backend's health (e.g. it lacks a routed model)."""
+        with b.lock:
+            b.inflight -= 1
+            if elapsed is not None:
+                b.latency_ewma = elapsed if b.latency_ewma is None else 0.7 * b.latency_ewma + 0.3 * elapsed
+            if ok is None:
+                return
+            if ok:
+                b.consecutive_failures = 0
+                b.open_until = 0.0
+            else:
+                b.failures += 1
+                b.consecutive_failures += 1
+                if b.consecutive_failures >= self.failure_threshold:
+                    b.open_until = time.monotonic() + self.cooldown_s
+
+    @staticmethod
+    def _is_response_timeout(e: Exception) -> bool:
+        """
+        True when the backend accepted the request but was too slow to answer
+        (httpx ReadTimeout/WriteTimeout). Connect and pool timeouts mean the
+        node is unreachable: those are failures and go to the next backend.
+        """
+        names = {cls.__name__ for cls in type(e).__mro__}
+        if names & CONNECT_TIMEOUTS:
+            return False
+        return any("timeout" in n.lower() for n in names)
+
+    def _retryable(self, e: Exception) -> bool:
+        status = getattr(e, "status_code", None)
+        if status is None:
+            return True  # connection refused/reset, DNS, ...
+        # 404: model not pulled on this node; 429/5xx: overloaded or broken
+        return status in (404, 429) or status >= 500
+
+    # ---------- health ----------
+
+    def check_health(self) -> Dict[str, bool]:
+        """Ping every backend (GET /api/tags); eject dead ones, restore live ones."""
+        result = {}
+        for b in self.backends:
+            try:
+                with b.client_for(min(5.0, self.timeout)) as client:
+                    client.list()
+                ok = True
+            except Exception:
+                ok = False
+            with b.lock:
+                if ok:
+                    b.consecutive_failures = 0
+                    b.open_until = 0.0
+                else:
+                    b.consecutive_failures = max(b.consecutive_failures, self.failure_threshold)
+                    b.open_until = time.monotonic() + self.cooldown_s
+            result[b.name] = ok
+        return result
+
+    def _health_loop(self, interval: float) -> None:
+        while not self._health_stop.wait(interval):
+            self.check_health()
+
+    def close(self) -> None:
+        self._health_stop.set()
+
+    def backend_stats(self) -> List[Dict[str, Any]]:
+        return [b.snapshot() for b in self.backends]
+
+    # ---------- requests ----------
 
     def chat(
         self,
         system: str,
         user: str,
         options: Optional[Dict[str, Any]] = None,
+        timeout: Optional[float] = None,
+        affinity: Optional[str] = None,
+        format: Optional[Union[str, Dict[str, Any]]] = None,
+        num_predict: Optional[int] = None,
+        role: Optional[str] = None,
     ) -> str:
-        opts: Dict[str, Any] = {"temperature": self.temperature}
+        """
+        affinity: calls with the same key (e.g. the draft and final answer of
+        one turn) are routed to the same backend so its prompt cache is reused.
+
+        format: "json" or a JSON schema; Ollama then constrains decoding so
+        the reply always parses (and matches the schema).
+        num_predict: cap on generated tokens for this call; overrides the
+        role's route cap.
+        role: caller name (planner, evaluator, draft, final). Its route, if
+        any, sets the model, temperature and (when num_predict is None) token
+        cap; latency is tracked per role (role_stats()).
+        """
+        route = self.routes.get(role, {}) if role else {}
+        model = route.get("model") or self.model
+        if model != self.model and self._unavailable.get(model, 0.0) > time.monotonic():
+            model = self.model
+
+        # Keep options stable between calls: changing e.g. num_ctx makes
+        # Ollama reload the model and drop its cache. num_predict is a
+        # per-request sampling limit and does not.
+        opts: Dict[str, Any] = {"temperature": route.get("temperature", self.temperature)}
         if options:
             opts.update(options)
+        if num_predict is None:
+            num_predict = route.get("num_predict")
+        if num_predict is not None:
+            opts["num_predict"] = int(num_predict)
+        extra: Dict[str, Any] = {}
+        if format is not None:
+            extra["format"] = format
+        self._local.last_stats = {}
 
+        if timeout is not None and timeout <= 0:
+            raise LLMTimeout("No time left in the turn budget for an LLM call")
+        deadline = None if timeout is None else time.monotonic() + timeout
+
+        t0 = time.monotonic()
         try:
-            resp = self.ollama.chat(
-                model=self.model,
-                messages=[
-                    {"role": "system", "content": system},
-                    {"role": "user", "content": user},
-                ],
-                options=opts,
-            )
-        except Exception as e:
+            try:
+                out = self._request(model, system, user, opts, extra, deadline, timeout, affinity)
+            except ModelUnavailable:
+                if model == self.model:
+                    raise
+                # Routed model not pulled anywhere: use the default model and
+                # don't ask for the routed one again until the cooldown ends.
+                self._unavailable[model] = time.monotonic() + self.cooldown_s
+                logger.warning("model %s unavailable for role %s; falling back to %s", model, role, self.model)
+                if role:
+                    with self._role_lock:
+                        self._role_fallbacks[role] = self._role_fallbacks.get(role, 0) + 1
+                model = self.model
+                out = self._request(model, system, user, opts, extra, deadline, timeout, affinity)
+        except Exception:
+            self._record_role(role, model, time.monotonic() - t0, ok=False)
+            raise
+        self._record_role(role, model, time.monotonic() - t0, ok=True)
+        return out
+
+    def _request(
+        self,
+        model: str,
+        system: str,
+        user: str,
+        opts: Dict[str, Any],
+        extra: Dict[str, Any],
+        deadline: Optional[float],
+        timeout: Optional[float],
+        affinity: Optional[str],
+    ) -> str:
+        tried: List[Backend] = []
+        last_exc: Optional[Exception] = None
+        for _ in range(1 + self.max_retries):
+            b = self._pick(tried, affinity)
+            if b is None:
+                break
+            tried.append(b)
+
+            remaining = None if deadline is None else deadline - time.monotonic()
+            if remaining is not None and remaining <= 0:
+                self._release(b, None, ok=True)
+                break
+
+            t0 = time.monotonic()
+            try:
+                # Closing the HTTP request on timeout also makes Ollama stop generating.
+                with b.client_for(remaining) as client:
+                    resp = client.chat(
+                        model=model,
+                        messages=[
+                            {"role": "system", "content": system},
+                            {"role": "user", "content": user},
+                        ],
+                        options=opts,
+                        keep_alive=self.keep_alive,
+                        **extra,
+                    )
+            except Exception as e:
+                if self._is_response_timeout(e):
+                    # Slow, not broken: penalise its latency but keep it in rotation.
+                    # No health verdict, so a timed-out half-open probe stays open.
+                    self._release(b, time.monotonic() - t0, ok=None)
+                    raise LLMTimeout(
+                        f"Ollama did not answer within {timeout or self.timeout:.1f}s "
+                        f"(model: {model}, host: {b.name})"
+                    ) from e
+                # A node missing a routed model is still healthy for the default one.
+                missing = getattr(e, "status_code", None) == 404
+                self._release(b, None, ok=None if missing and model != self.model else False)
+                last_exc = e
+                if not self._retryable(e):
+                    break
+                continue
+
+            self._release(b, time.monotonic() - t0, ok=True)
+            resp = self._as_dict(resp)
+            self._record_stats(resp, b, model)
+            return self._content(resp)
+
+        if last_exc is not None and getattr(last_exc, "status_code", None) == 404:
+            raise ModelUnavailable(
+                f"Model {model} is not available on {[b.name for b in tried]}. Try:\n"
+                f"  ollama pull {model}"
+            ) from last_exc
+        if last_exc is not None or not tried:
             # Give a useful message for the most common failure: Ollama not running
             raise RuntimeError(
                 "Ollama request failed. Is the Ollama app/server running and the model pulled?\n"
-                f"Model: {self.model}\n"
+                f"Model: {model}\n"
+                f"Backends tried: {[b.name for b in tried] or 'none available (all ejected)'}\n"
                 "Try:\n"
                 "  ollama serve\n"
-                "  ollama pull llama3.2:3b"
-            ) from e
+                f"  ollama pull {model}"
+            ) from last_exc
+        raise LLMTimeout(f"No time left to retry the LLM call (model: {model})")
+
+    def _record_role(self, role: Optional[str], model: str, seconds: float, ok: bool) -> None:
+        if not role:
+            return
+        with self._role_lock:
+            stats = self._role_stats.setdefault(role, LatencyStats())
+        stats.record(seconds, ok=ok)
+        self._local.last_stats = {**(getattr(self._local, "last_stats", {}) or {}), "role": role, "model": model}
+
+    def role_stats(self) -> Dict[str, Dict[str, Any]]:
+        """Per-role latency, the model the role is routed to and how often it fell back."""
+        now = time.monotonic()
+        with self._role_lock:
+            roles = dict(self._role_stats)
+            fallbacks = dict(self._role_fallbacks)
+        out = {}
+        for role, stats in sorted(roles.items()):
+            routed = self.routes.get(role, {}).get("model") or self.model
+            out[role] = {
+                "model": routed,
+                "available": self._unavailable.get(routed, 0.0) <= now,
+                "fallbacks": fallbacks.get(role, 0),
+                **stats.snapshot(),
+            }
+        return out
+
+    @staticmethod
+    def _as_dict(resp: Any) -> Any:
+        # Newer ollama clients return pydantic models, older ones dicts.
+        if not isinstance(resp, dict) and hasattr(resp, "model_dump"):
+            return resp.model_dump()
+        return resp
+
+    def _record_stats(self, resp: Any, b: Backend, model: Optional[str] = None) -> None:
+        if not isinstance(resp, dict):
+            return
+        stats = {
+            "backend": b.name,
+            "model": model or self.model,
+            "load_ms": round((resp.get("load_duration") or 0) / NS_PER_MS, 1),
+            # Only tokens not served from the prompt cache are evaluated here.
+            "prompt_eval_tokens": resp.get("prompt_eval_count") or 0,
+            "prompt_eval_ms": round((resp.get("prompt_eval_duration") or 0) / NS_PER_MS, 1),
+            "eval_tokens": resp.get("eval_count") or 0,
+            "eval_ms": round((resp.get("eval_duration") or 0) / NS_PER_MS, 1),
+            "total_ms": round((resp.get("total_duration") or 0) / NS_PER_MS, 1),
+            # Hit num_predict before finishing (a constrained JSON reply may be cut off).
+            "truncated": resp.get("done_reason") == "length",
+        }
+        self._local.last_stats = stats
+        with self._usage_lock:
+            self.usage["calls"] += 1
+            for key in ("prompt_eval_tokens", "prompt_eval_ms", "eval_tokens", "eval_ms"):
+                self.usage[key] += stats[key]
+
+    def last_call_stats(self) -> Dict[str, Any]:
+        """Ollama timing stats of this thread's most recent chat() call."""
+        return dict(getattr(self._local, "last_stats", {}) or {})
 
+    @staticmethod
+    def _content(resp: Any) -> str:
         # Ollama Python responses can vary; handle safely
         msg = ""
         if isinstance(resp, dict):
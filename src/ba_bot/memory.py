@@ -15,8 +15,10 @@ class MemoryStore:
     Safe for Streamlit reruns and partial writes.
     """
 
-    def __init__(self, session_id: str = "default"):
+    def __init__(self, session_id: str = "default", persist: bool = True):
+        # persist=False keeps the session in memory only (batch jobs, tests).
         self.session_id = session_id
+        self.persist = persist
         self.path = MEM_DIR / f"session_{session_id}.json"
         self.data: Dict[str, Any] = {
             "session_id": session_id,
@@ -28,7 +30,7 @@ class MemoryStore:
         self.load()
 
     def load(self) -> None:
-        if self.path.exists():
+        if self.persist and self.path.exists():
             try:
                 self.data = json.loads(self.path.read_text(encoding="utf-8"))
             except Exception:
@@ -47,6 +49,8 @@ class MemoryStore:
 
     def save(self) -> None:
         self.data["updated_at"] = datetime.utcnow().isoformat()
+        if not self.persist:
+            return
         self.path.write_text(
             json.dumps(self.data, indent=2, ensure_ascii=False),
             encoding="utf-8",
@@ -73,6 +77,15 @@ class MemoryStore:
         self.data.setdefault("facts", {})[key] = value
         self.save()
 
+    def set_facts(self, facts: Dict[str, Any]) -> None:
+        """Merge several facts with a single save (no write if nothing changed)."""
+        current = self.data.setdefault("facts", {})
+        changed = {k: v for k, v in facts.items() if current.get(k, object()) != v}
+        if not changed:
+            return
+        current.update(changed)
+        self.save()
+
     def get_facts(self) -> Dict[str, Any]:
         return self.data.get("facts", {})
 
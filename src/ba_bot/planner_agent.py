@@ -1,17 +1,34 @@
 import json
 import re
-from typing import List, Any, Dict
+from typing import List, Any, Dict, Optional
 
 
 class PlannerAgent:
     """
     Generic planner: creates retrieval subqueries using the LLM.
     Output must be JSON: {"subqueries":[...]}
+
+    The reply is constrained to `schema` (Ollama structured output) and
+    capped at `num_predict` tokens (None: the role's LLM route cap, see
+    data/llm_routes.json), so it always parses and stays short.
     """
 
-    def __init__(self, llm_client, max_subqueries: int = 5):
+    def __init__(self, llm_client, max_subqueries: int = 5, num_predict: Optional[int] = None):
         self.llm = llm_client
         self.max_subqueries = max_subqueries
+        self.num_predict = num_predict
+        self.schema: Dict[str, Any] = {
+            "type": "object",
+            "properties": {
+                "subqueries": {
+                    "type": "array",
+                    "items": {"type": "string", "maxLength": 100},
+                    "minItems": min(3, max_subqueries),
+                    "maxItems": max_subqueries,
+                },
+            },
+            "required": ["subqueries"],
+        }
         self.system = """
 You are a retrieval planner.
 Return ONLY valid JSON exactly in this schema:
@@ -27,7 +44,10 @@ Rules:
 
     @staticmethod
     def _extract_json_object(text: str) -> str:
-        """Extract the first {...} JSON object even if wrapped in text/fences."""
+        """
+        Extract the first {...} JSON object even if wrapped in text/fences
+        (only needed for servers that ignore `format`).
+        """
         if not text:
             return ""
         t = text.strip()
@@ -63,25 +83,34 @@ Rules:
 
         return out
 
-    def plan(self, question: str, user_context: str = "") -> List[str]:
+    def plan(self, question: str, user_context: str = "", timeout: Optional[float] = None) -> List[str]:
+        # Instructions stay in the (cacheable) system prompt; session-stable
+        # USER_CONTEXT before the per-turn QUESTION.
         prompt = f"""
 USER_CONTEXT:
 {user_context}
 
 QUESTION:
 {question}
-
-Return JSON only.
 """.strip()
 
-        raw = self.llm.chat(self.system, prompt)
+        try:
+            raw = self.llm.chat(
+                self.system, prompt, timeout=timeout, format=self.schema, num_predict=self.num_predict,
+                role="planner",
+            )
+        except RuntimeError:
+            # LLM down or out of time: the fallback expansion below still works
+            raw = ""
 
         try:
-            raw_json = self._extract_json_object(raw)
-            data: Dict[str, Any] = json.loads(raw_json)
-            sq = self._normalize_subqueries(data.get("subqueries", []))
-        except Exception:
-            sq = []
+            data: Dict[str, Any] = json.loads(raw)
+        except ValueError:
+            try:
+                data = json.loads(self._extract_json_object(raw))
+            except ValueError:
+                data = {}
+        sq = self._normalize_subqueries(data.get("subqueries", []) if isinstance(data, dict) else [])
 
         # Ensure we have enough queries (LLMs often return 1–2)
         if len(sq) < 3:
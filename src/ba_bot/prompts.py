@@ -0,0 +1,54 @@
+"""
+Prompt assembly for the answer stages.
+
+Ollama reuses the KV cache for the longest token prefix shared with the
+previous request on the same loaded model, so prompts are laid out from
+most to least stable: system prompt, then the (large) CONTEXT block, then
+per-turn details (user context, queries, question, instruction). The draft
+and final answer of a turn therefore share everything up to the end of the
+original context block; extra evidence is appended after it, never
+interleaved.
+"""
+from typing import Any, Dict, List, Optional
+
+ANSWER_INSTRUCTION = "Answer using ONLY the CONTEXT and cite chunk_ids."
+
+
+def context_label(c: Dict[str, Any]) -> str:
+    """[id] for a chunk, [id1][id2]… for a stitched span (see stitching.py)."""
+    return "".join(f"[{cid}]" for cid in c.get("chunk_ids") or [c["chunk_id"]])
+
+
+def build_context_block(contexts: List[Dict[str, Any]]) -> str:
+    return "\n\n---\n\n".join(f"{context_label(c)}\n{c['text']}" for c in contexts)
+
+
+def build_answer_prompt(
+    question: str,
+    user_context: str,
+    context_block: str,
+    subqueries: Optional[List[str]] = None,
+    extra_queries: Optional[List[str]] = None,
+) -> str:
+    parts = []
+
+    # Stable prefix first (cacheable across draft → final)
+    parts.append("CONTEXT:")
+    parts.append(context_block)
+
+    parts.append("\nUSER_CONTEXT:")
+    parts.append(user_context or "")
+
+    if subqueries:
+        parts.append("\nSUBQUERIES (used for retrieval):")
+        parts.append(str(subqueries))
+
+    if extra_queries:
+        parts.append("\nEXTRA_QUERIES (requested by evaluator):")
+        parts.append(str(extra_queries))
+
+    parts.append("\nQUESTION:")
+    parts.append(question)
+
+    parts.append("\n" + ANSWER_INSTRUCTION)
+    return "\n".join(parts).strip()
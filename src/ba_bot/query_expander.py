@@ -0,0 +1,143 @@
+"""
+LLM-free query planning by pseudo-relevance feedback.
+
+QueryExpander.plan() is a drop-in for PlannerAgent.plan(): it runs one
+first-pass search for the question, treats the top hits as relevant and
+mines them for
+
+- salient terms: words frequent in the hits but rare in the corpus
+  (hit-rank-weighted count x IDF), minus the question's own terms;
+- section headings: the policy sections the hits come from.
+
+Subqueries are the question itself, the question's key terms under each
+heading, and the key terms plus groups of salient terms. One query
+encoding and one index search instead of an LLM call: milliseconds.
+"""
+from collections import Counter, defaultdict
+from typing import Any, Dict, List, Optional
+
+from .text_utils import STOPWORDS, TOKEN_RE, normalize_term, terms
+
+# Question filler that is rare in policy text (high IDF) but says nothing
+# about the topic: "how *much* ...", "can I *still* ...".
+FILLER = {
+    "allowed", "anything", "bring", "carry", "many", "much", "pack", "part",
+    "rule", "still", "take", "taking", "want",
+}
+
+
+def clean_heading(section: str) -> str:
+    """'= Prohibited or controlled items =' -> 'Prohibited or controlled items'."""
+    return " ".join(section.strip().strip("=").split())
+
+
+class QueryExpander:
+    """
+    Pseudo-relevance-feedback planner. `retriever` is anything with
+    .search(query, k) (Retriever, QueryBatcher); `idf` is the corpus term
+    table (data/term_idf.json, as loaded by ReasonerAgent).
+    """
+
+    # No LLM call: TurnEngine doesn't count or time plan() as one.
+    uses_llm = False
+
+    def __init__(
+        self,
+        retriever,
+        idf: Optional[Dict[str, float]] = None,
+        max_subqueries: int = 5,
+        feedback_k: int = 5,
+        key_terms: int = 4,
+        terms_per_query: int = 3,
+        max_headings: int = 2,
+        min_idf: float = 1.5,
+    ):
+        self.retriever = retriever
+        self.idf = idf or {}
+        self.max_subqueries = max_subqueries
+        self.feedback_k = feedback_k
+        self.key_terms = key_terms
+        self.terms_per_query = terms_per_query
+        self.max_headings = max_headings
+        # Feedback terms at or below this IDF ("baggage", "checked") are in
+        # most chunks and add nothing to a query.
+        self.min_idf = min_idf
+
+    def _key_terms(self, question: str) -> List[str]:
+        """The question's rarest terms, in question order (surface form)."""
+        words: List[str] = []
+        seen = set()
+        for tok in TOKEN_RE.findall(question.lower()):
+            t = normalize_term(tok)
+            if tok in STOPWORDS or t in FILLER or len(tok) < 2 or t in seen:
+                continue
+            seen.add(t)
+            words.append(tok)
+        keep = set(sorted(words, key=lambda w: -self.idf.get(normalize_term(w), 1.0))[: self.key_terms])
+        return [w for w in words if w in keep]
+
+    def salient_terms(self, hits: List[Dict[str, Any]], exclude: set, n: int) -> List[str]:
+        """Top-n feedback terms, returned in their most common surface form."""
+        weight: Dict[str, float] = defaultdict(float)
+        surface: Dict[str, Counter] = defaultdict(Counter)
+        for rank, h in enumerate(hits):
+            w_hit = 1.0 / (rank + 1)
+            counts = Counter()
+            for tok in TOKEN_RE.findall((h.get("text") or "").lower()):
+                if tok in STOPWORDS or len(tok) < 3 or tok.isdigit():
+                    continue
+                t = normalize_term(tok)
+                if t in exclude or t in FILLER or self.idf.get(t, self.min_idf + 1) <= self.min_idf:
+                    continue
+                counts[t] += 1
+                surface[t][tok] += 1
+            for t, tf in counts.items():
+                # sublinear tf: one chunk repeating a word shouldn't dominate
+                weight[t] += w_hit * (1.0 + (tf - 1) ** 0.5)
+        # Terms the IDF table has never seen are treated as rare but not rarest.
+        default_idf = max(self.idf.values(), default=1.0) * 0.5
+        # idf squared: a term in one hit but almost nowhere else beats a
+        # mildly common term that happens to be in every hit.
+        scored = sorted(weight, key=lambda t: -weight[t] * self.idf.get(t, default_idf) ** 2)
+        return [surface[t].most_common(1)[0][0] for t in scored[:n]]
+
+    @staticmethod
+    def headings(hits: List[Dict[str, Any]]) -> List[str]:
+        out: List[str] = []
+        for h in hits:
+            heading = clean_heading(str(h.get("section") or ""))
+            if heading and heading.lower() not in {x.lower() for x in out}:
+                out.append(heading)
+        return out
+
+    def plan(self, question: str, user_context: str = "", timeout: Optional[float] = None) -> List[str]:
+        base = " ".join(question.strip().split())
+        if not base:
+            return []
+        try:
+            hits = self.retriever.search(base, k=self.feedback_k) or []
+        except RuntimeError:
+            hits = []  # e.g. query queue full; the question alone still works
+
+        key = self._key_terms(base)
+        key_text = " ".join(key) or base
+        exclude = set(terms(base)) | set(terms(user_context))
+
+        queries = [base]
+        if user_context.strip():
+            queries.append(f"{key_text} {user_context.strip()}")
+        for heading in self.headings(hits)[: self.max_headings]:
+            queries.append(f"{heading}: {key_text}")
+        n_groups = max(1, self.max_subqueries - len(queries))
+        extra = self.salient_terms(hits, exclude, n_groups * self.terms_per_query)
+        for i in range(0, len(extra), self.terms_per_query):
+            queries.append(f"{key_text} {' '.join(extra[i:i + self.terms_per_query])}")
+
+        out: List[str] = []
+        seen = set()
+        for q in queries:
+            k = q.lower()
+            if k not in seen:
+                seen.add(k)
+                out.append(q)
+        return out[: self.max_subqueries]
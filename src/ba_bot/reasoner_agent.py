@@ -1,36 +1,76 @@
-import re
+import json
+from pathlib import Path
+from typing import Any, Dict, List, Optional
+
+from .text_utils import sentence_spans, term_index, terms
+
+ROOT = Path(__file__).resolve().parents[2]
+IDF_PATH = ROOT / "data" / "term_idf.json"
+
 
 class ReasonerAgent:
+    """
+    Extractive (LLM-free) answer drafting.
+
+    Picks the sentences of each context chunk that best match the question
+    terms, weighted by corpus IDF. Uses the sentence spans and term index
+    stored by ingest.py when the chunk carries them, so a draft is a few
+    dict lookups per chunk rather than a regex split + scan.
+    """
+
+    def __init__(self, idf_path: Optional[Path] = None):
+        idf_path = idf_path or IDF_PATH
+        self.idf: Dict[str, float] = {}
+        if idf_path.exists():
+            self.idf = json.loads(idf_path.read_text(encoding="utf-8"))
+
+    def query_terms(self, question: str, memory_facts: Dict[str, Any]) -> Dict[str, float]:
+        """Question terms (plus string-valued memory facts like countries) → weight."""
+        words = terms(question)
+        for key in ("departure_country", "destination_country", "departure_place", "destination_place"):
+            v = memory_facts.get(key)
+            if isinstance(v, str):
+                words += terms(v)
+        # Unknown terms (not in the corpus) get a neutral weight.
+        return {t: self.idf.get(t, 1.0) for t in words}
+
+    @staticmethod
+    def pick_best_snippets(context: Dict[str, Any], weights: Dict[str, float]) -> List[str]:
+        text = context.get("text", "")
+        spans = context.get("sentences")
+        index = context.get("terms")
+        if spans is None or index is None:
+            spans = sentence_spans(text)
+            index = term_index(text, spans)
+        if not spans:
+            return []
+
+        scores: Dict[int, float] = {}
+        for t, w in weights.items():
+            for i in index.get(t, ()):
+                scores[i] = scores.get(i, 0.0) + w
+
+        if not scores:
+            best = list(range(min(2, len(spans))))
+        else:
+            ranked = sorted(scores, key=lambda i: (-scores[i], i))[:3]
+            best = sorted(ranked)  # keep document order for readability
+
+        return [text[spans[i][0] : spans[i][1]] for i in best]
+
     def draft(self, question: str, contexts, memory_facts=None):
         if not contexts:
             return "I couldn't find relevant policy text in the knowledge base."
 
         memory_facts = memory_facts or {}
-        q_lower = question.lower()
-
-        # Keywords to fish out relevant sentences
-        keywords = []
-        if "powder" in q_lower:
-            keywords += ["powder", "powders", "350g", "350ml"]
-        if memory_facts.get("departure_country") == "Australia":
-            keywords += ["australia", "inorganic"]
-
-        # Sentence extraction helper
-        def pick_best_snippets(text: str):
-            # split loosely into sentences / bullet-like segments
-            parts = re.split(r"(?<=[\.\!\?])\s+|\n+|•|\u2022|- ", text)
-            parts = [p.strip() for p in parts if p.strip()]
-            if not keywords:
-                return parts[:2]
-            hits = [p for p in parts if any(k in p.lower() for k in keywords)]
-            return hits[:3] if hits else parts[:2]
+        weights = self.query_terms(question, memory_facts)
 
         lines = []
         lines.append(f"**Question:** {question}\n")
         lines.append("**Answer (grounded in BA policy text):**")
 
         for c in contexts[:3]:
-            snippets = pick_best_snippets(c["text"])
+            snippets = self.pick_best_snippets(c, weights)
             joined = " ".join(snippets)
             joined = joined.replace("\n", " ").strip()
             if len(joined) > 280:
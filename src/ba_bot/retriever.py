@@ -1,24 +1,346 @@
+import heapq
 import json
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
-from typing import Any, Dict, List
+from typing import Any, Dict, Iterable, List, Optional, Tuple, Union
 
 import numpy as np
 
+from .index_store import INDEX_DIR, SHARDS_DIR, read_current, read_manifest, resolve
+from .stats import LatencyStats
+
 # Heavy imports inside init so the app can show a clear error if missing
 # (and avoids slow import at module import time in Streamlit)
 
 
 # repo root: .../ba-agentic-chatbot/
 ROOT = Path(__file__).resolve().parents[2]
-INDEX_DIR = ROOT / "data" / "index"
+
+# Chunk metadata fields that can be used to restrict a search.
+PARTITION_FIELDS = ("source", "section")
+
+# e.g. {"section": ["Bicycles", "Golf equipment"]}; values are OR-ed within a
+# field and fields are AND-ed.
+Filters = Dict[str, Iterable[str]]
+
+
+def build_partitions(
+    chunks: Iterable[Dict[str, Any]],
+    parts: Optional[Dict[str, Dict[str, List[int]]]] = None,
+    start_row: int = 0,
+) -> Dict[str, Dict[str, List[int]]]:
+    """
+    Map each partition field value to the index rows carrying it. Pass the
+    previous result and the row offset to extend it batch by batch. A chunk
+    that near-duplicates were folded into (ingest.py "aliases") is also
+    listed under their sections/sources.
+    """
+    if parts is None:
+        parts = {f: {} for f in PARTITION_FIELDS}
+    for row, c in enumerate(chunks, start=start_row):
+        for field in PARTITION_FIELDS:
+            for value in dict.fromkeys([c.get(field)] + [a.get(field) for a in c.get("aliases", [])]):
+                if value:
+                    parts[field].setdefault(str(value), []).append(row)
+    return parts
+
+
+def chunk_ids(chunk: Dict[str, Any]) -> List[str]:
+    """The chunk's own id plus the ids of near-duplicates folded into it."""
+    ids = [chunk["chunk_id"]] if chunk.get("chunk_id") else []
+    return ids + [a["chunk_id"] for a in chunk.get("aliases", []) if a.get("chunk_id")]
+
+
+def filter_key(filters: Optional[Filters]) -> Tuple:
+    """Canonical, hashable form of `filters` (empty tuple = no restriction)."""
+    if not filters:
+        return ()
+    return tuple(sorted((f, tuple(sorted(set(v)))) for f, v in filters.items() if v))
+
+
+class IndexSnapshot:
+    """
+    One loaded index version: the FAISS index, chunk metadata, partition map
+    and the filtered sub-indexes built from them. Never mutated after load
+    (apart from filling its own caches), so a search that grabbed a snapshot
+    can finish on it while a newer one is swapped in.
+    """
+
+    def __init__(
+        self,
+        faiss,
+        version: str,
+        index_path: Path,
+        meta_path: Path,
+        partitions_path: Optional[Path] = None,
+    ):
+        if not index_path.exists():
+            raise FileNotFoundError(f"FAISS index not found at: {index_path}")
+        if not meta_path.exists():
+            raise FileNotFoundError(f"Chunk metadata not found at: {meta_path}")
+
+        self._faiss = faiss
+        self.version = version
+        self.manifest = read_manifest(index_path.parent)
+        self.index = faiss.read_index(str(index_path))
+        self.chunks: List[Dict[str, Any]] = json.loads(meta_path.read_text(encoding="utf-8"))
+
+        # Partition map written by build_index.py; older index dirs don't have
+        # one, so derive it from the metadata instead.
+        partitions_path = partitions_path or (index_path.parent / "partitions.json")
+        if partitions_path.exists():
+            self.partitions = json.loads(partitions_path.read_text(encoding="utf-8"))
+        else:
+            self.partitions = build_partitions(self.chunks)
+
+        # filter key -> (sub-index over the selected rows, sub-row -> global row).
+        # Lives on the snapshot, so cached sub-indexes are per index version.
+        self._sub_indexes: Dict[Tuple, Tuple[Any, np.ndarray]] = {}
+        # Alias ids (folded near-duplicates) resolve to the chunk that kept them.
+        self._row_of: Dict[str, int] = {
+            cid: row for row, c in enumerate(self.chunks) for cid in chunk_ids(c)
+        }
+
+    @property
+    def dim(self) -> int:
+        return self.index.d
+
+    @property
+    def ntotal(self) -> int:
+        return self.index.ntotal
+
+    def partition_values(self, field: str) -> List[str]:
+        return sorted(self.partitions.get(field, {}))
+
+    def _rows_for(self, key: Tuple) -> List[int]:
+        rows: Optional[set] = None
+        for field, values in key:
+            field_rows = set()
+            for v in values:
+                field_rows.update(self.partitions.get(field, {}).get(v, []))
+            rows = field_rows if rows is None else rows & field_rows
+        return sorted(rows or [])
+
+    def sub_index(self, key: Tuple) -> Tuple[Any, np.ndarray]:
+        """Flat sub-index holding only the rows matching `key` (built once, cached)."""
+        if key not in self._sub_indexes:
+            rows = np.asarray(self._rows_for(key), dtype="int64")
+            sub = self._faiss.IndexFlatIP(self.index.d)
+            if len(rows):
+                sub.add(np.vstack([self.index.reconstruct(int(r)) for r in rows]))
+            self._sub_indexes[key] = (sub, rows)
+        return self._sub_indexes[key]
+
+    def warm_from(self, old: Any) -> None:
+        """Pre-build the filtered sub-indexes `old` had built."""
+        for key in list(getattr(old, "_sub_indexes", {})):
+            self.sub_index(key)
+
+    def search_vectors(
+        self,
+        q: np.ndarray,
+        k: int = 5,
+        filters: Optional[Filters] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        key = filter_key(filters)
+        if not key:
+            scores, idxs = self.index.search(q, k)
+        else:
+            sub, rows = self.sub_index(key)
+            if sub.ntotal == 0:
+                return [[] for _ in range(len(q))]
+            scores, sub_idxs = sub.search(q, min(k, sub.ntotal))
+            idxs = np.where(sub_idxs >= 0, rows[np.maximum(sub_idxs, 0)], -1)
+
+        return [
+            self._to_hits(row_scores, row_idxs)
+            for row_scores, row_idxs in zip(scores, idxs)
+        ]
+
+    def _hit(self, idx: int, score: float) -> Dict[str, Any]:
+        c = self.chunks[idx]
+        hit = {
+            "chunk_id": c.get("chunk_id", f"chunk_{idx}"),
+            "section": c.get("section"),
+            "score": score,
+            "text": c.get("text", ""),
+            "source": c.get("source"),
+        }
+        # Precomputed by ingest.py; ReasonerAgent falls back without them.
+        for field in ("sentences", "terms"):
+            if field in c:
+                hit[field] = c[field]
+        return hit
+
+    def _to_hits(self, scores, idxs) -> List[Dict[str, Any]]:
+        return [
+            self._hit(int(idx), float(score))
+            for score, idx in zip(scores, idxs)
+            if int(idx) != -1
+        ]
+
+    def get_chunk(self, chunk_id: str) -> Optional[Dict[str, Any]]:
+        row = self._row_of.get(chunk_id)
+        return None if row is None else self._hit(row, 0.0)
+
+    def chunk_vector(self, chunk_id: str) -> Optional[np.ndarray]:
+        row = self._row_of.get(chunk_id)
+        return None if row is None else self.index.reconstruct(row)
+
+
+class ShardedSnapshot:
+    """
+    An index version split into shards (build_index.py --shard-by), each an
+    IndexSnapshot with its own FAISS index and chunk store.
+
+    Shards are loaded on first use. A search fans out to every shard that
+    can hold matching rows (the manifest lists each shard's source/section
+    values, so filtered searches skip the rest) on a thread pool (FAISS
+    releases the GIL while searching) and the per-shard hits are merged by
+    score into one global top-k. Per-shard search latency is kept for stats.
+    """
+
+    def __init__(self, faiss, version: str, path: Path, manifest: Dict[str, Any], pool: ThreadPoolExecutor):
+        self._faiss = faiss
+        self.version = version
+        self.manifest = manifest
+        self._path = path
+        self._pool = pool
+        self.shard_info: List[Dict[str, Any]] = manifest["shards"]
+        self._shards: List[Optional[IndexSnapshot]] = [None] * len(self.shard_info)
+        self._load_ms: List[Optional[float]] = [None] * len(self.shard_info)
+        self.latency = [LatencyStats() for _ in self.shard_info]
+        self._lock = threading.Lock()
+        self._shard_of: Optional[Dict[str, str]] = None
+        self._shard_num = {info["name"]: i for i, info in enumerate(self.shard_info)}
+
+    @property
+    def dim(self) -> int:
+        return int(self.manifest["dim"])
+
+    @property
+    def ntotal(self) -> int:
+        return sum(int(s["chunks"]) for s in self.shard_info)
+
+    @property
+    def chunks(self) -> List[Dict[str, Any]]:
+        """All chunks in shard order (loads every shard)."""
+        return [c for i in range(len(self._shards)) for c in self.shard(i).chunks]
+
+    def shard(self, i: int) -> IndexSnapshot:
+        snap = self._shards[i]
+        if snap is None:
+            with self._lock:
+                snap = self._shards[i]
+                if snap is None:
+                    t0 = time.perf_counter()
+                    d = self._path / SHARDS_DIR / self.shard_info[i]["name"]
+                    snap = IndexSnapshot(self._faiss, self.version, d / "faiss.index", d / "chunk_meta.json")
+                    self._load_ms[i] = (time.perf_counter() - t0) * 1000.0
+                    self._shards[i] = snap
+        return snap
+
+    def partition_values(self, field: str) -> List[str]:
+        values = set()
+        for info in self.shard_info:
+            values.update(info.get("partition_values", {}).get(field, []))
+        return sorted(values)
+
+    def _may_match(self, i: int, key: Tuple) -> bool:
+        have = self.shard_info[i].get("partition_values", {})
+        return all(set(values) & set(have.get(field, [])) for field, values in key)
+
+    def search_vectors(
+        self,
+        q: np.ndarray,
+        k: int = 5,
+        filters: Optional[Filters] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        key = filter_key(filters)
+        targets = [i for i in range(len(self.shard_info)) if self._may_match(i, key)]
+        if not targets:
+            return [[] for _ in range(len(q))]
+
+        def run(i: int) -> List[List[Dict[str, Any]]]:
+            shard = self.shard(i)
+            t0 = time.perf_counter()
+            hits = shard.search_vectors(q, k, filters)
+            self.latency[i].record(time.perf_counter() - t0)
+            return hits
+
+        if len(targets) == 1:
+            per_shard = [run(targets[0])]
+        else:
+            per_shard = list(self._pool.map(run, targets))
+
+        return [
+            heapq.nlargest(k, (h for hits in per_shard for h in hits[row]), key=lambda h: h["score"])
+            for row in range(len(q))
+        ]
+
+    def _shard_for(self, chunk_id: str) -> Optional[int]:
+        if self._shard_of is None:
+            f = self._path / "chunk_shards.json"
+            self._shard_of = json.loads(f.read_text(encoding="utf-8")) if f.exists() else {}
+        return self._shard_num.get(self._shard_of.get(chunk_id, ""))
+
+    def get_chunk(self, chunk_id: str) -> Optional[Dict[str, Any]]:
+        i = self._shard_for(chunk_id)
+        return None if i is None else self.shard(i).get_chunk(chunk_id)
+
+    def chunk_vector(self, chunk_id: str) -> Optional[np.ndarray]:
+        i = self._shard_for(chunk_id)
+        return None if i is None else self.shard(i).chunk_vector(chunk_id)
+
+    def warm_from(self, old: Any) -> None:
+        """Load the shards `old` had loaded (and their filtered sub-indexes)."""
+        if not isinstance(old, ShardedSnapshot):
+            return
+        for j, shard in enumerate(old._shards):
+            i = self._shard_num.get(old.shard_info[j]["name"])
+            if shard is not None and i is not None:
+                self.shard(i).warm_from(shard)
+
+    def shard_stats(self) -> List[Dict[str, Any]]:
+        return [
+            {
+                "name": info["name"],
+                "chunks": info["chunks"],
+                "loaded": self._shards[i] is not None,
+                "load_ms": round(self._load_ms[i], 1) if self._load_ms[i] is not None else None,
+                "latency": self.latency[i].snapshot(),
+            }
+            for i, info in enumerate(self.shard_info)
+        ]
 
 
 class Retriever:
+    """
+    Embedding model + the live IndexSnapshot.
+
+    By default the index is read from the version published in
+    data/index/CURRENT (see index_store.py). With watch_interval_s > 0 a
+    background thread polls CURRENT and, when it changes, loads the new
+    version next to the old one and then swaps the snapshot reference;
+    searches already running keep the snapshot they started with, so a
+    reload never blocks or tears a search. Passing explicit index/meta
+    paths pins the retriever to those files (no reloads).
+
+    A sharded version is searched through ShardedSnapshot, fanning out over
+    up to `fanout_workers` threads.
+    """
+
     def __init__(
         self,
         model_name: str = "sentence-transformers/all-MiniLM-L6-v2",
         index_path: Path | None = None,
         meta_path: Path | None = None,
+        partitions_path: Path | None = None,
+        index_dir: Path | None = None,
+        watch_interval_s: float = 0.0,
+        fanout_workers: int = 8,
     ):
         try:
             from sentence_transformers import SentenceTransformer  # type: ignore
@@ -40,41 +362,158 @@ class Retriever:
         self._faiss = faiss
         self.model = SentenceTransformer(model_name)
 
-        index_path = index_path or (INDEX_DIR / "faiss.index")
-        meta_path = meta_path or (INDEX_DIR / "chunk_meta.json")
+        self.reloads = 0
+        self.last_reload_error: Optional[str] = None
+        self._reload_lock = threading.Lock()
+        self._stop = threading.Event()
+        self._watcher: Optional[threading.Thread] = None
+        self._fanout_workers = fanout_workers
+        self._fanout: Optional[ThreadPoolExecutor] = None
 
-        if not index_path.exists():
-            raise FileNotFoundError(f"FAISS index not found at: {index_path}")
-        if not meta_path.exists():
-            raise FileNotFoundError(f"Chunk metadata not found at: {meta_path}")
+        if index_path or meta_path:
+            self._index_dir: Optional[Path] = None
+            index_path = index_path or (INDEX_DIR / "faiss.index")
+            meta_path = meta_path or (index_path.parent / "chunk_meta.json")
+            self._snap = IndexSnapshot(faiss, "pinned", index_path, meta_path, partitions_path)
+        else:
+            self._index_dir = index_dir or INDEX_DIR
+            self._snap = self._load(*resolve(self._index_dir))
 
-        self.index = self._faiss.read_index(str(index_path))
-        self.chunks: List[Dict[str, Any]] = json.loads(meta_path.read_text(encoding="utf-8"))
+        if watch_interval_s > 0 and self._index_dir is not None:
+            self._watcher = threading.Thread(
+                target=self._watch, args=(watch_interval_s,), name="index-watcher", daemon=True
+            )
+            self._watcher.start()
+
+    # ---------- snapshot / hot reload ----------
 
-    def search(self, query: str, k: int = 5) -> List[Dict[str, Any]]:
+    def _load(self, version: str, path: Path) -> Union[IndexSnapshot, ShardedSnapshot]:
+        manifest = read_manifest(path)
+        if manifest.get("shards"):
+            if self._fanout is None:
+                self._fanout = ThreadPoolExecutor(
+                    max_workers=self._fanout_workers, thread_name_prefix="shard-search"
+                )
+            return ShardedSnapshot(self._faiss, version, path, manifest, self._fanout)
+        return IndexSnapshot(self._faiss, version, path / "faiss.index", path / "chunk_meta.json")
+
+    @property
+    def snapshot(self) -> Union[IndexSnapshot, ShardedSnapshot]:
+        return self._snap
+
+    @property
+    def version(self) -> str:
+        return self._snap.version
+
+    # Read-only views of the live snapshot (kept for existing callers;
+    # index/partitions exist for single-index versions only).
+    @property
+    def index(self):
+        return self._snap.index
+
+    @property
+    def chunks(self) -> List[Dict[str, Any]]:
+        return self._snap.chunks
+
+    @property
+    def partitions(self) -> Dict[str, Dict[str, List[int]]]:
+        return self._snap.partitions
+
+    def reload_if_changed(self) -> bool:
+        """Swap in the published version if it differs from the live one."""
+        if self._index_dir is None:
+            return False
+        with self._reload_lock:
+            version = read_current(self._index_dir)
+            if version is None or version == self._snap.version:
+                return False
+
+            old = self._snap
+            new = self._load(*resolve(self._index_dir))
+            if new.dim != old.dim:
+                raise RuntimeError(
+                    f"Index version {version} has dim {new.dim}, expected {old.dim} "
+                    "(built with a different embedding model?)"
+                )
+            # Pre-build the shards/sub-indexes in use so the first searches
+            # after the swap don't pay for them.
+            new.warm_from(old)
+
+            self._snap = new  # single reference assignment = atomic swap
+            self.reloads += 1
+            self.last_reload_error = None
+            return True
+
+    def _watch(self, interval_s: float) -> None:
+        while not self._stop.wait(interval_s):
+            try:
+                self.reload_if_changed()
+            except Exception as e:
+                # Keep serving the old version; retried on the next poll.
+                self.last_reload_error = f"{type(e).__name__}: {e}"
+
+    def close(self) -> None:
+        self._stop.set()
+        if self._watcher is not None:
+            self._watcher.join(timeout=2)
+            self._watcher = None
+        if self._fanout is not None:
+            self._fanout.shutdown(wait=False)
+
+    def index_info(self) -> Dict[str, Any]:
+        snap = self._snap
+        info = {
+            "version": snap.version,
+            "chunks": snap.ntotal,
+            "created_at": snap.manifest.get("created_at"),
+            "reloads": self.reloads,
+            "watching": self._watcher is not None,
+            "last_reload_error": self.last_reload_error,
+        }
+        if isinstance(snap, ShardedSnapshot):
+            info["shard_by"] = snap.manifest.get("shard_by")
+            info["shards"] = snap.shard_stats()
+        return info
+
+    # ---------- search ----------
+
+    def encode(self, queries: List[str]) -> np.ndarray:
+        """Embed a batch of queries in one forward pass (normalized, float32)."""
+        q = self.model.encode(list(queries), normalize_embeddings=True)
+        return np.asarray(q, dtype="float32")
+
+    def partition_values(self, field: str) -> List[str]:
+        return self._snap.partition_values(field)
+
+    def search_vectors(
+        self,
+        q: np.ndarray,
+        k: int = 5,
+        filters: Optional[Filters] = None,
+    ) -> List[List[Dict[str, Any]]]:
+        """Search pre-encoded query vectors; returns one hit list per row."""
+        return self._snap.search_vectors(q, k, filters)
+
+    def get_chunk(self, chunk_id: str) -> Optional[Dict[str, Any]]:
+        """Chunk by id, shaped like a search hit (score 0.0); None if unknown."""
+        return self._snap.get_chunk(chunk_id)
+
+    def chunk_vectors(self, chunk_ids: List[str]) -> Optional[np.ndarray]:
+        """Stored (normalized) embeddings of `chunk_ids`; None if any is unknown."""
+        snap = self._snap
+        vecs = [snap.chunk_vector(cid) for cid in chunk_ids]
+        if not vecs or any(v is None for v in vecs):
+            return None
+        return np.vstack(vecs).astype("float32")
+
+    def search(
+        self,
+        query: str,
+        k: int = 5,
+        filters: Optional[Filters] = None,
+    ) -> List[Dict[str, Any]]:
         query = (query or "").strip()
         if not query:
             return []
 
-        q = self.model.encode([query], normalize_embeddings=True)
-        q = np.asarray(q, dtype="float32")
-
-        scores, idxs = self.index.search(q, k)
-
-        results: List[Dict[str, Any]] = []
-        for score, idx in zip(scores[0], idxs[0]):
-            if int(idx) == -1:
-                continue
-
-            c = self.chunks[int(idx)]
-            results.append(
-                {
-                    "chunk_id": c.get("chunk_id", f"chunk_{idx}"),
-                    "section": c.get("section"),
-                    "score": float(score),
-                    "text": c.get("text", ""),
-                    "source": c.get("source"),
-                }
-            )
-
-        return results
+        return self.search_vectors(self.encode([query]), k, filters)[0]
@@ -1,23 +1,106 @@
-from typing import Any, Dict, List, Union
+from typing import Any, Dict, List, Optional, Union
 
 # If your Retriever lives in the same ba_bot package, use relative import:
 from .retriever import Retriever # type: ignore
 
+# Memory fact -> keywords matched against section names. When a fact is set,
+# hits from the matching sections get a score boost (the liquids sections
+# are included for medical questions because liquid medicines are covered
+# there). Topic facts last for the whole session, so the full index is
+# always searched too: a later question on another topic still finds its
+# sections.
+TOPIC_SECTION_KEYWORDS: Dict[str, List[str]] = {
+    "topic_medical": [
+        "medic", "pregnan", "oxygen", "thermometer", "allerg", "infectious",
+        "thrombosis", "broken bones", "wheelchair", "mobility", "liquids",
+    ],
+    "traveller_pregnant": ["pregnan", "medical clearance", "thrombosis"],
+    "topic_sports_equipment": [
+        "sport", "bicycle", "diving", "golf", "ski", "surf", "racket",
+        "avalanche", "firearm",
+    ],
+}
+
 
 class RetrieverAgent:
-    def __init__(self, top_k: int = 5):
-        self.retriever = Retriever()
+    def __init__(
+        self,
+        top_k: int = 5,
+        retriever=None,
+        use_partitions: bool = True,
+        partition_boost: float = 0.05,
+    ):
+        # Pass a shared Retriever (or anything with .search(query, k)) to avoid
+        # loading the embedding model and index once per agent.
+        self.retriever = retriever or Retriever()
         self.top_k = top_k
+        self.use_partitions = use_partitions
+        self.partition_boost = partition_boost
+
+    def partitions_for(self, facts: Optional[Dict[str, Any]]) -> Optional[Dict[str, List[str]]]:
+        """Section filter implied by memory facts, or None to search everything."""
+        if not self.use_partitions or not facts:
+            return None
+
+        keywords = [
+            kw
+            for fact, kws in TOPIC_SECTION_KEYWORDS.items()
+            if facts.get(fact)
+            for kw in kws
+        ]
+        if not keywords:
+            return None
+
+        sections = [
+            s for s in self.retriever.partition_values("section")
+            if any(kw in s.lower() for kw in keywords)
+        ]
+        return {"section": sections} if sections else None
+
+    def get_chunk(self, chunk_id: str) -> Optional[Dict[str, Any]]:
+        """Chunk lookup for neighbour expansion; None if the retriever has none."""
+        get = getattr(self.retriever, "get_chunk", None)
+        return get(chunk_id) if get else None
 
-    def retrieve(self, subqueries: Union[List[str], str]) -> List[Dict[str, Any]]:
+    def _search_with_topic(self, q: str, filters: Dict[str, List[str]]) -> List[List[Dict[str, Any]]]:
+        """(topic-section hits, full-index hits) for q, encoding it once."""
+        submit = getattr(self.retriever, "submit", None)
+        if submit is not None:
+            # QueryBatcher: both land in one micro-batch and share an embedding row.
+            futures = [submit(q, self.top_k, filters), submit(q, self.top_k)]
+            return [f.result() or [] for f in futures]
+        if hasattr(self.retriever, "encode") and hasattr(self.retriever, "search_vectors"):
+            vec = self.retriever.encode([q])
+            return [
+                self.retriever.search_vectors(vec, self.top_k, filters)[0],
+                self.retriever.search_vectors(vec, self.top_k)[0],
+            ]
+        return [
+            self.retriever.search(q, k=self.top_k, filters=filters) or [],
+            self.retriever.search(q, k=self.top_k) or [],
+        ]
+
+    def retrieve(
+        self,
+        subqueries: Union[List[str], str],
+        facts: Optional[Dict[str, Any]] = None,
+    ) -> List[Dict[str, Any]]:
         # Normalize input
         if isinstance(subqueries, str):
             subqueries = [subqueries]
         if not subqueries:
             return []
 
+        filters = self.partitions_for(facts)
+
         all_hits: List[Dict[str, Any]] = []
         seen = set()
+        # chunk_id -> sort key; topic-section hits rank as if boosted, but the
+        # reported score stays the retriever's.
+        rank: Dict[str, float] = {}
+
+        def sort_key(h: Dict[str, Any]) -> float:
+            return rank.get(h.get("chunk_id"), float(h.get("score", 0.0)))
 
         for q in subqueries:
             if not isinstance(q, str):
@@ -26,7 +109,22 @@ class RetrieverAgent:
             if not q:
                 continue
 
-            hits = self.retriever.search(q, k=self.top_k) or []
+            if filters:
+                # Topic sections first (boosted), but a better match anywhere
+                # in the index still wins a slot.
+                topic_hits, full_hits = self._search_with_topic(q, filters)
+                merged: Dict[str, Dict[str, Any]] = {}
+                for h in topic_hits:
+                    cid = h.get("chunk_id")
+                    merged[cid] = h
+                    boosted = float(h.get("score", 0.0)) + self.partition_boost
+                    rank[cid] = max(rank.get(cid, boosted), boosted)
+                for h in full_hits:
+                    merged.setdefault(h.get("chunk_id"), h)
+                hits = sorted(merged.values(), key=sort_key, reverse=True)[: self.top_k]
+            else:
+                hits = self.retriever.search(q, k=self.top_k) or []
+
             for h in hits:
                 if not isinstance(h, dict):
                     continue
@@ -44,5 +142,5 @@ class RetrieverAgent:
                 all_hits.append(h)
 
         # Sort by score (descending) safely
-        all_hits.sort(key=lambda x: float(x.get("score", 0.0)), reverse=True)
+        all_hits.sort(key=sort_key, reverse=True)
         return all_hits
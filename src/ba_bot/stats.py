@@ -0,0 +1,50 @@
+import threading
+import time
+from collections import deque
+from typing import Any, Deque, Dict
+
+
+class LatencyStats:
+    """
+    Thread-safe latency + throughput counters.
+
+    Keeps the last `window` samples for percentiles; counts are cumulative.
+    """
+
+    def __init__(self, window: int = 2048):
+        self._lock = threading.Lock()
+        self._samples: Deque[float] = deque(maxlen=window)
+        self.started_at = time.monotonic()
+        self.count = 0
+        self.errors = 0
+
+    def record(self, seconds: float, ok: bool = True) -> None:
+        with self._lock:
+            self.count += 1
+            if not ok:
+                self.errors += 1
+            self._samples.append(seconds)
+
+    @staticmethod
+    def _percentile(sorted_vals, pct: float) -> float:
+        if not sorted_vals:
+            return 0.0
+        idx = min(len(sorted_vals) - 1, int(round(pct / 100.0 * (len(sorted_vals) - 1))))
+        return sorted_vals[idx]
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            vals = sorted(self._samples)
+            count, errors = self.count, self.errors
+        elapsed = max(1e-9, time.monotonic() - self.started_at)
+
+        return {
+            "count": count,
+            "errors": errors,
+            "throughput_per_s": round(count / elapsed, 3),
+            "mean_ms": round(1000 * sum(vals) / len(vals), 2) if vals else 0.0,
+            "p50_ms": round(1000 * self._percentile(vals, 50), 2),
+            "p95_ms": round(1000 * self._percentile(vals, 95), 2),
+            "p99_ms": round(1000 * self._percentile(vals, 99), 2),
+            "max_ms": round(1000 * vals[-1], 2) if vals else 0.0,
+        }
@@ -0,0 +1,166 @@
+"""
+Merge retrieved chunks that are consecutive windows of the same section.
+
+ingest.chunk_text() overlaps windows by 200 characters, so hits like
+ba_lr_004 + ba_lr_005 repeat that text in the prompt. Runs of consecutive
+chunk ids from one section are merged into a single span with the overlap
+removed; the span keeps every original id in "chunk_ids" so citations of
+any of them still resolve.
+"""
+import re
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+CHUNK_ID_RE = re.compile(r"^(.*?)(\d+)$")
+
+# Shorter shared text is treated as coincidence, not window overlap.
+MIN_OVERLAP = 20
+MAX_OVERLAP = 400
+
+
+def parse_chunk_id(chunk_id: str) -> Optional[Tuple[str, int, int]]:
+    """'ba_lr_004' -> ('ba_lr_', 4, 3); None if the id has no numeric suffix."""
+    m = CHUNK_ID_RE.match(chunk_id or "")
+    if not m:
+        return None
+    return m.group(1), int(m.group(2)), len(m.group(2))
+
+
+def neighbour_id(chunk_id: str, step: int) -> Optional[str]:
+    parsed = parse_chunk_id(chunk_id)
+    if not parsed:
+        return None
+    prefix, n, width = parsed
+    if n + step < 0:
+        return None
+    return f"{prefix}{n + step:0{width}d}"
+
+
+def overlap_len(a: str, b: str) -> int:
+    """Length of the longest suffix of `a` that is a prefix of `b`."""
+    for k in range(min(len(a), len(b), MAX_OVERLAP), MIN_OVERLAP - 1, -1):
+        if a.endswith(b[:k]):
+            return k
+    return 0
+
+
+def window_overlap(a: str, b: str) -> int:
+    """
+    overlap_len(a, b), or all of `b` when the next window lies entirely in
+    the tail of `a` (a final window shorter than MIN_OVERLAP, e.g. "rged a
+    fee." after a window ending "...be charged a fee.").
+    """
+    if b and (a.endswith(b) or b in a[-MAX_OVERLAP:]):
+        return len(b)
+    return overlap_len(a, b)
+
+
+def _same_run(a: Dict[str, Any], b: Dict[str, Any]) -> bool:
+    return (
+        a.get("section") == b.get("section")
+        and a.get("source") == b.get("source")
+        and neighbour_id(a["chunk_id"], 1) == b["chunk_id"]
+    )
+
+
+def stitch_contexts(
+    contexts: Sequence[Dict[str, Any]],
+    prior: Sequence[Dict[str, Any]] = (),
+) -> List[Dict[str, Any]]:
+    """
+    Merge consecutive same-section chunks of `contexts` into spans, ordered
+    by their best-ranked member.
+
+    `prior` are chunks already placed earlier in the prompt (e.g. the draft's
+    contexts when stitching the evaluator's extra hits). They are not
+    re-emitted; a new span that continues or precedes one of them only has
+    the overlapping text trimmed, so the earlier prompt prefix stays intact.
+    """
+    prior_by_id = {c["chunk_id"]: c for c in prior if c.get("chunk_id")}
+    rank = {c["chunk_id"]: i for i, c in enumerate(contexts) if c.get("chunk_id")}
+    chunks = [c for c in contexts if c.get("chunk_id") and c["chunk_id"] not in prior_by_id]
+
+    # Sort by id so consecutive windows are adjacent, then cut into runs.
+    def id_key(c: Dict[str, Any]) -> Tuple[str, int]:
+        parsed = parse_chunk_id(c["chunk_id"])
+        return (parsed[0], parsed[1]) if parsed else (c["chunk_id"], -1)
+
+    runs: List[List[Dict[str, Any]]] = []
+    for c in sorted(chunks, key=id_key):
+        if runs and _same_run(runs[-1][-1], c):
+            runs[-1].append(c)
+        else:
+            runs.append([c])
+
+    spans = []
+    for run in runs:
+        text = run[0].get("text", "")
+        for prev, cur in zip(run, run[1:]):
+            cur_text = cur.get("text", "")
+            k = window_overlap(prev.get("text", ""), cur_text)
+            text = text + cur_text[k:] if k else text + "\n" + cur_text
+
+        before = prior_by_id.get(neighbour_id(run[0]["chunk_id"], -1) or "")
+        if before is not None and _same_run(before, run[0]):
+            text = text[window_overlap(before.get("text", ""), text):]
+            if not text.strip():
+                continue  # the earlier chunk already holds all of it
+        after = prior_by_id.get(neighbour_id(run[-1]["chunk_id"], 1) or "")
+        if after is not None and _same_run(run[-1], after):
+            k = overlap_len(run[-1].get("text", ""), after.get("text", ""))
+            text = text[: len(text) - k] if k else text
+
+        best = min(run, key=lambda c: rank[c["chunk_id"]])
+        span = dict(best)
+        span.update(
+            {
+                "chunk_id": run[0]["chunk_id"],
+                "chunk_ids": [c["chunk_id"] for c in run],
+                "score": max(float(c.get("score", 0.0)) for c in run),
+                "text": text.strip(),
+            }
+        )
+        # Precomputed sentence/term offsets don't apply to the merged text.
+        span.pop("sentences", None)
+        span.pop("terms", None)
+        spans.append((rank[best["chunk_id"]], span))
+
+    spans.sort(key=lambda x: x[0])
+    return [s for _, s in spans]
+
+
+def expand_neighbours(
+    contexts: Sequence[Dict[str, Any]],
+    get_chunk: Callable[[str], Optional[Dict[str, Any]]],
+    max_chars: int,
+) -> List[Dict[str, Any]]:
+    """
+    Add the previous/next window of the best hits while the total context
+    stays under `max_chars` (counted after overlap removal). Neighbours are
+    inserted right after the hit they extend, with a slightly lower score.
+    """
+    out = list(contexts)
+    have = {c.get("chunk_id") for c in out}
+    total = sum(len(c.get("text", "")) for c in out)
+
+    for c in contexts:
+        for step in (1, -1):
+            nid = neighbour_id(c.get("chunk_id", ""), step)
+            if not nid or nid in have:
+                continue
+            n = get_chunk(nid)
+            if not n or n.get("section") != c.get("section") or n.get("source") != c.get("source"):
+                continue
+
+            a, b = (c, n) if step == 1 else (n, c)
+            added = len(n.get("text", "")) - window_overlap(a.get("text", ""), b.get("text", ""))
+            if total + added > max_chars:
+                continue
+
+            n = dict(n)
+            n["score"] = float(c.get("score", 0.0)) - 1e-3
+            n["neighbour_of"] = c["chunk_id"]
+            out.insert(out.index(c) + 1, n)
+            have.add(nid)
+            total += added
+
+    return out
@@ -0,0 +1,80 @@
+import math
+import re
+from typing import Dict, Iterable, List, Tuple
+
+# Same segmentation the ReasonerAgent used to do on the fly: sentence ends,
+# line breaks and bullet markers.
+SENT_SPLIT_RE = re.compile(r"(?<=[\.\!\?])\s+|\n+|•|\u2022|- ")
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+STOPWORDS = {
+    "a", "about", "after", "all", "also", "am", "an", "and", "any", "are", "as",
+    "at", "be", "been", "before", "but", "by", "can", "could", "do", "does",
+    "for", "from", "get", "had", "has", "have", "how", "i", "if", "in", "into",
+    "is", "it", "its", "just", "may", "me", "must", "my", "need", "no", "not",
+    "of", "on", "or", "our", "please", "should", "so", "some", "such", "than",
+    "that", "the", "their", "them", "then", "there", "these", "they", "this",
+    "to", "up", "us", "was", "we", "what", "when", "where", "which", "while",
+    "who", "will", "with", "would", "you", "your",
+}
+
+
+def normalize_term(tok: str) -> str:
+    """Crude plural folding so 'powders'/'powder' and 'batteries'/'battery' match."""
+    if len(tok) > 4 and tok.endswith("ies"):
+        return tok[:-3] + "y"
+    if len(tok) > 3 and tok.endswith("s") and not tok.endswith("ss"):
+        return tok[:-1]
+    return tok
+
+
+def terms(text: str) -> List[str]:
+    """Lowercased, stopword-free, plural-folded terms (duplicates kept)."""
+    out = []
+    for tok in TOKEN_RE.findall((text or "").lower()):
+        if tok in STOPWORDS or (len(tok) < 2 and not tok.isdigit()):
+            continue
+        out.append(normalize_term(tok))
+    return out
+
+
+def sentence_spans(text: str) -> List[Tuple[int, int]]:
+    """[start, end) character spans of the non-empty sentences in `text`."""
+    spans: List[Tuple[int, int]] = []
+
+    def add(start: int, end: int) -> None:
+        while start < end and text[start].isspace():
+            start += 1
+        while end > start and text[end - 1].isspace():
+            end -= 1
+        if end > start:
+            spans.append((start, end))
+
+    pos = 0
+    for m in SENT_SPLIT_RE.finditer(text):
+        add(pos, m.start())
+        pos = m.end()
+    add(pos, len(text))
+    return spans
+
+
+def term_index(text: str, spans: Iterable[Tuple[int, int]]) -> Dict[str, List[int]]:
+    """term -> indices of the sentences (in `spans`) that contain it."""
+    index: Dict[str, List[int]] = {}
+    for i, (start, end) in enumerate(spans):
+        # dict.fromkeys, not set(): first-occurrence order keeps the output
+        # (and chunks.jsonl) identical across runs whatever PYTHONHASHSEED is.
+        for t in dict.fromkeys(terms(text[start:end])):
+            index.setdefault(t, []).append(i)
+    return index
+
+
+def idf_table(term_indexes: Iterable[Dict[str, List[int]]]) -> Dict[str, float]:
+    """Smoothed inverse document frequency, one document per chunk."""
+    df: Dict[str, int] = {}
+    n = 0
+    for idx in term_indexes:
+        n += 1
+        for t in idx:
+            df[t] = df.get(t, 0) + 1
+    return {t: round(math.log(1 + n / c), 4) for t, c in df.items()}
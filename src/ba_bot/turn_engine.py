@@ -0,0 +1,361 @@
+"""
+One user turn: facts → plan → retrieve → draft → evaluate → (re-retrieve) →
+final answer. Shared by the CLI (chat.py), the Streamlit app (app.py), the
+HTTP service (serve.py) and batch_answer.py so they all use the same
+prompts and the same LLM-call savings:
+
+- stage outputs are memoized within a turn: a query the evaluator asks for
+  again is not re-retrieved, and an identical prompt is never sent twice;
+- the draft is reused as the final answer when re-retrieval found no new
+  context (the final prompt would carry the same evidence);
+- every turn reports (and logs) how many LLM calls it actually made.
+"""
+import logging
+import re
+import time
+from typing import Any, Dict, List, Optional
+
+from .citation_aligner import CitationAligner
+from .deadline import Deadline, StageEstimates
+from .fact_extractor_agent import FactExtractorAgent
+from .llm_client import LLMTimeout
+from .memory import MemoryStore
+from .prompts import build_answer_prompt, build_context_block
+from .reasoner_agent import ReasonerAgent
+from .stitching import expand_neighbours, stitch_contexts
+
+logger = logging.getLogger(__name__)
+
+SYSTEM_PROMPT = """
+You are a helpful assistant.
+Use ONLY the provided CONTEXT to answer.
+
+Rules:
+- Every sentence or bullet MUST end with at least one citation like [chunk_id].
+- If a sentence cannot be supported by the CONTEXT, do not include it.
+- If rules depend on route/country and USER_CONTEXT is missing details,
+  ask ONE clarifying question and state what you can and cannot confirm.
+""".strip()
+
+CONTEXT_ONLY_REPLY = "Got it — I’ll keep that context in mind. [user_context]"
+
+# Prompt context size (chars) up to which hits are widened with their
+# neighbouring windows before stitching.
+CONTEXT_CHAR_BUDGET = 6000
+
+
+def dedupe_contexts(contexts: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+    seen = set()
+    out = []
+    for c in contexts:
+        cid = c.get("chunk_id")
+        if not cid or cid in seen:
+            continue
+        seen.add(cid)
+        out.append(c)
+    return out
+
+
+def extract_citations(text: str) -> List[str]:
+    # Extract bracketed ids like [abc_123] and dedupe preserving order.
+    found = re.findall(r"\[([^\[\]]+)\]", text)
+    deduped = []
+    seen = set()
+    for x in found:
+        x = x.strip()
+        if x and x not in seen:
+            seen.add(x)
+            deduped.append(x)
+    return deduped
+
+
+def has_any_citation(text: str) -> bool:
+    return bool(re.search(r"\[[^\[\]]+\]", text))
+
+
+class TurnEngine:
+    """
+    Runs turns against shared agents. One engine can serve many sessions
+    and threads; per-turn state lives in run(), and the stage latency
+    estimates used for budget decisions are shared across turns.
+    """
+
+    def __init__(
+        self,
+        llm,
+        retriever,
+        planner,
+        evaluator,
+        fact_extractor: Optional[FactExtractorAgent] = None,
+        reasoner: Optional[ReasonerAgent] = None,
+        estimates: Optional[StageEstimates] = None,
+        context_char_budget: int = CONTEXT_CHAR_BUDGET,
+        aligner: Optional[CitationAligner] = None,
+    ):
+        self.llm = llm
+        self.retriever = retriever
+        self.planner = planner
+        self.evaluator = evaluator
+        self.fact_extractor = fact_extractor or FactExtractorAgent()
+        self.reasoner = reasoner or ReasonerAgent()
+        self.estimates = estimates or StageEstimates()
+        self.context_char_budget = context_char_budget
+        if aligner is None:
+            # Reuse the loaded embedding model and stored chunk vectors.
+            base = getattr(retriever, "retriever", retriever)
+            aligner = CitationAligner(
+                encoder=getattr(base, "encode", None),
+                chunk_vectors=getattr(base, "chunk_vectors", None),
+                idf=self.reasoner.idf,
+            )
+        self.aligner = aligner
+
+    def is_context_only(self, text: str, matched: Optional[bool] = None) -> bool:
+        """
+        True for pure context messages ("I'm flying from Sydney"). The patterns
+        are the context_only rules in data/fact_rules.json; pass `matched` when
+        the message was already scanned by the fact extractor.
+        """
+        # If the user is asking a question, treat it as a question turn, not pure context.
+        # (Even if they add context inside.)
+        if "?" in text:
+            return False
+        if matched is None:
+            _, matched = self.fact_extractor.extract(text)
+        return matched
+
+    def run(self, q: str, memory: MemoryStore, budget_s: Optional[float] = None) -> Dict[str, Any]:
+        """
+        Run one user turn through plan → retrieve → draft → evaluate → answer.
+
+        Records both turns in memory and returns the answer plus the
+        intermediate outputs (subqueries, chunk ids, evaluator verdict),
+        per-stage wall-clock timings in seconds, per-call LLM stats
+        ("llm_stats"), the number of LLM calls made ("llm_calls") and the
+        stages answered from within-turn memos instead of a call ("reused").
+        Uncited answer sentences are cited by the CitationAligner; the ones
+        no chunk supports are listed under "unsupported".
+
+        With a budget_s, every stage draws down one per-turn deadline: the
+        optional stages (planner, evaluator, re-retrieval, final rewrite) are
+        skipped when their estimated cost no longer fits, and if the draft LLM
+        call cannot finish in time the extractive ReasonerAgent answer is
+        returned instead, with degraded=True.
+
+        Answer prompts are laid out context-first (see ba_bot.prompts) and the
+        turn's LLM calls share a backend affinity so Ollama can reuse the
+        evaluated prefix. Consecutive overlapping chunks are stitched into one
+        span per run (see ba_bot.stitching); "chunk_ids" lists every chunk the
+        prompt contained.
+        """
+        llm, est = self.llm, self.estimates
+        deadline = Deadline(budget_s)
+        timings: Dict[str, float] = {}
+        llm_stats: Dict[str, Any] = {}
+        skipped: List[str] = []
+        reused: List[str] = []
+        affinity = memory.session_id
+        t_start = time.perf_counter()
+
+        # Within-turn memos: query -> hits, prompt -> answer
+        retrieved: Dict[str, List[Dict[str, Any]]] = {}
+        answers: Dict[str, str] = {}
+        calls = 0
+
+        def mark(stage: str, t0: float) -> float:
+            now = time.perf_counter()
+            timings[stage] = round(now - t0, 4)
+            return now
+
+        def retrieve(queries: List[str], facts: Dict[str, Any]) -> List[Dict[str, Any]]:
+            hits: List[Dict[str, Any]] = []
+            for query in queries:
+                if not isinstance(query, str) or not query.strip():
+                    continue
+                key = query.strip()
+                if key not in retrieved:
+                    retrieved[key] = self.retriever.retrieve([key], facts=facts) or []
+                hits.extend(retrieved[key])
+            # Same order RetrieverAgent gives a multi-query call: best score first
+            hits.sort(key=lambda h: float(h.get("score", 0.0)), reverse=True)
+            return dedupe_contexts(hits)
+
+        def answer(stage: str, prompt: str) -> str:
+            nonlocal calls
+            if prompt in answers:
+                reused.append(stage)
+                return answers[prompt]
+            if deadline.expired():
+                # Counted only when a request is actually attempted.
+                raise LLMTimeout(f"No time left in the turn budget for the {stage} call")
+            calls += 1
+            out = llm.chat(SYSTEM_PROMPT, prompt, timeout=deadline.timeout(), affinity=affinity, role=stage)
+            answers[prompt] = out
+            llm_stats[stage] = llm.last_call_stats()
+            return out
+
+        def finish(result: Dict[str, Any]) -> Dict[str, Any]:
+            mark("total", t_start)
+            result.update(
+                {"timings": timings, "llm_stats": llm_stats, "llm_calls": calls, "reused": reused}
+            )
+            logger.info(
+                "turn session=%s llm_calls=%d reused=%s skipped=%s total=%.2fs",
+                memory.session_id, calls, reused, result.get("skipped", []), timings["total"],
+            )
+            return result
+
+        memory.add_turn("user", q)
+        # One scan yields the topic/route facts (which steer retrieval towards
+        # the relevant sections) and the context-only verdict.
+        new_facts, context_rule_matched = self.fact_extractor.extract(q)
+        context_only = self.is_context_only(q, matched=context_rule_matched)
+        if context_only:
+            new_facts["user_context"] = q
+        memory.set_facts(new_facts)
+
+        # Context-only turn: store it, acknowledge with a special citation token.
+        if context_only:
+            memory.add_turn("assistant", CONTEXT_ONLY_REPLY, citations=["user_context"])
+            return finish(
+                {"answer": CONTEXT_ONLY_REPLY, "citations": ["user_context"], "context_only": True}
+            )
+
+        facts = memory.get_facts()
+        user_context = facts.get("user_context", "")
+
+        # 1) PLAN → subqueries (optional: the question itself is a usable query)
+        t = time.perf_counter()
+        # (a planner with uses_llm=False, e.g. QueryExpander, costs no LLM call)
+        planner_llm = getattr(self.planner, "uses_llm", True)
+        if deadline.allows(est.get("plan") + est.get("draft")):
+            calls += int(planner_llm)
+            subqueries = self.planner.plan(
+                q, user_context=user_context, timeout=deadline.timeout(reserve=est.get("draft"))
+            ) or []
+            if isinstance(subqueries, str):
+                subqueries = [subqueries]
+            t = mark("plan", t)
+            est.observe("plan", timings["plan"])
+            if planner_llm:
+                llm_stats["plan"] = llm.last_call_stats()
+        else:
+            subqueries = [q]
+            skipped.append("plan")
+
+        # 2) RETRIEVE initial contexts
+        contexts = retrieve(subqueries, facts)
+        contexts = expand_neighbours(contexts, self.retriever.get_chunk, self.context_char_budget)
+        spans = stitch_contexts(contexts)
+        t = mark("retrieve", t)
+
+        # 3) DRAFT answer
+        context_block = build_context_block(spans)
+        draft_prompt = build_answer_prompt(
+            question=q,
+            user_context=user_context,
+            context_block=context_block,
+            subqueries=subqueries,
+        )
+        try:
+            draft = answer("draft", draft_prompt)
+        except RuntimeError as e:
+            # LLM too slow (or down): fall back to the extractive answer.
+            extractive = self.reasoner.draft(q, contexts, memory_facts=facts)
+            citations = [c["chunk_id"] for c in contexts[:5]]
+            memory.add_turn("assistant", extractive, citations=citations)
+            mark("draft", t)
+            return finish({
+                "answer": extractive,
+                "citations": citations,
+                "context_only": False,
+                "subqueries": subqueries,
+                "chunk_ids": [c["chunk_id"] for c in contexts],
+                "degraded": True,
+                "degraded_reason": str(e).splitlines()[0],
+                "skipped": skipped + ["evaluate", "final"],
+            })
+        t = mark("draft", t)
+        est.observe("draft", timings["draft"])
+
+        # 4) EVALUATE → maybe retrieve extra, then answer with merged context
+        retrieved_ids_initial = [c["chunk_id"] for c in contexts]
+        needs_more, extra_queries, reason = False, [], ""
+        if deadline.allows(est.get("evaluate") + est.get("final")):
+            calls += 1
+            needs_more, extra_queries, reason = self.evaluator.evaluate(
+                question=q,
+                user_context=user_context,
+                answer=draft,
+                context_chunk_ids=retrieved_ids_initial,
+                timeout=deadline.timeout(reserve=est.get("final")),
+            )
+            t = mark("evaluate", t)
+            est.observe("evaluate", timings["evaluate"])
+            llm_stats["evaluate"] = llm.last_call_stats()
+        else:
+            skipped.append("evaluate")
+
+        all_contexts = list(contexts)
+        final_context_block = context_block
+        if needs_more and extra_queries:
+            if deadline.allows(est.get("retrieve") + est.get("final")):
+                all_contexts = dedupe_contexts(all_contexts + retrieve(extra_queries, facts))
+                # Extra evidence is stitched on its own and appended, trimmed
+                # against the draft's chunks, so the cached prefix is unchanged.
+                extra_spans = stitch_contexts(all_contexts[len(contexts):], prior=contexts)
+                if extra_spans:
+                    final_context_block += "\n\n---\n\n" + build_context_block(extra_spans)
+                t = mark("re_retrieve", t)
+            else:
+                skipped.append("re_retrieve")
+
+        extra = extra_queries if (needs_more and extra_queries) else None
+
+        # 5) FINAL answer. With no new evidence the final prompt would only
+        # differ from the draft's by the query list, so the draft stands.
+        # Otherwise the draft is still a complete answer, kept when the
+        # rewrite doesn't fit or doesn't finish in time.
+        final_answer = draft
+        if final_context_block == context_block:
+            reused.append("final")
+        elif deadline.allows(est.get("final")):
+            try:
+                final_answer = answer("final", build_answer_prompt(
+                    question=q,
+                    user_context=user_context,
+                    context_block=final_context_block,
+                    subqueries=subqueries,
+                    extra_queries=extra,
+                ))
+                est.observe("final", time.perf_counter() - t)
+            except RuntimeError:
+                skipped.append("final")
+        else:
+            skipped.append("final")
+
+        mark("final", t)
+
+        # Cite uncited sentences from the turn's chunks locally (no LLM call);
+        # sentences nothing supports are left uncited and reported.
+        t = time.perf_counter()
+        final_answer, alignment = self.aligner.align(final_answer, all_contexts)
+        mark("align", t)
+
+        used_citations = extract_citations(final_answer)
+        memory.add_turn("assistant", final_answer, citations=used_citations)
+
+        return finish({
+            "answer": final_answer,
+            "citations": used_citations,
+            "context_only": False,
+            "subqueries": subqueries,
+            "chunk_ids": [c["chunk_id"] for c in all_contexts],
+            "needs_more": needs_more,
+            "extra_queries": extra_queries,
+            "reason": reason,
+            "unsupported": [a["sentence"] for a in alignment if not a["supported"]],
+            "aligned": sum(1 for a in alignment if a["supported"]),
+            "degraded": False,
+            "skipped": skipped,
+        })
@@ -0,0 +1,252 @@
+"""
+Bulk offline question answering.
+
+    python src/batch_answer.py questions.jsonl answers.jsonl --workers 4
+
+Input: one JSON object per line, e.g.
+    {"id": "T-1001", "question": "Can I take powder in hand baggage?",
+     "context": "I'm flying from Australia"}
+Only "question" is required; "id" defaults to the line number and the
+optional "context" is stored as user_context before the question is asked.
+
+Each answered item is appended to the output JSONL as soon as it finishes
+(answer, citations, chunk ids, per-stage timings). The output file doubles
+as the checkpoint: re-running the same command skips every id that already
+has a successful record, so an interrupted run resumes where it stopped.
+"""
+import argparse
+import json
+import os
+import sys
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from pathlib import Path
+from typing import Any, Dict, Iterator, Set, Tuple
+
+from ba_bot.batching import QueryBatcher
+from ba_bot.evaluator_agent import EvaluatorAgent
+from ba_bot.llm_client import ROUTES_PATH, LLMClient, load_routes
+from ba_bot.memory import MemoryStore
+from ba_bot.planner_agent import PlannerAgent
+from ba_bot.query_expander import QueryExpander
+from ba_bot.reasoner_agent import ReasonerAgent
+from ba_bot.retriever import Retriever
+from ba_bot.retriever_agent import RetrieverAgent
+from ba_bot.stats import LatencyStats
+from ba_bot.turn_engine import TurnEngine
+
+
+def load_done_ids(out_path: Path) -> Set[str]:
+    """Ids with a successful record in a previous (possibly interrupted) run."""
+    done: Set[str] = set()
+    if not out_path.exists():
+        return done
+    with out_path.open("r", encoding="utf-8") as f:
+        for line in f:
+            try:
+                rec = json.loads(line)
+            except ValueError:
+                # A run killed mid-write can leave one truncated last line.
+                continue
+            if "error" not in rec and rec.get("id") is not None:
+                done.add(str(rec["id"]))
+    return done
+
+
+def drop_partial_tail(out_path: Path) -> None:
+    """
+    Cut a truncated last line (run killed mid-write) so the next appended
+    record starts on a line of its own instead of being glued to it.
+    """
+    if not out_path.exists():
+        return
+    with out_path.open("rb+") as f:
+        end = f.seek(0, os.SEEK_END)
+        pos = end
+        while pos > 0:
+            step = min(pos, 4096)
+            f.seek(pos - step)
+            cut = f.read(step).rfind(b"\n")
+            if cut != -1:
+                pos = pos - step + cut + 1
+                break
+            pos -= step
+        if pos < end:
+            f.truncate(pos)
+
+
+def iter_items(in_path: Path) -> Iterator[Tuple[str, Dict[str, Any]]]:
+    with in_path.open("r", encoding="utf-8") as f:
+        for lineno, line in enumerate(f, start=1):
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                item = json.loads(line)
+            except ValueError:
+                print(f"⚠️  Skipping malformed line {lineno}", file=sys.stderr)
+                continue
+            if isinstance(item, str):
+                item = {"question": item}
+            elif not isinstance(item, dict):
+                print(f"⚠️  Skipping line {lineno}: expected an object or a string", file=sys.stderr)
+                continue
+            yield str(item.get("id", f"line_{lineno}")), item
+
+
+def answer_item(
+    item_id: str,
+    item: Dict[str, Any],
+    engine: TurnEngine,
+    budget_s: float = 0,
+) -> Dict[str, Any]:
+    question = str(item.get("question") or "").strip()
+    if not question:
+        raise ValueError("missing 'question'")
+
+    # Items are independent: fresh in-memory session, nothing written to data/memory.
+    memory = MemoryStore(session_id=f"batch_{item_id}", persist=False)
+    if item.get("context"):
+        memory.set_fact("user_context", str(item["context"]))
+
+    result = engine.run(question, memory, budget_s=budget_s)
+    return {
+        "id": item_id,
+        "question": question,
+        "answer": result["answer"],
+        "citations": result.get("citations", []),
+        "chunk_ids": result.get("chunk_ids", []),
+        "degraded": result.get("degraded", False),
+        "skipped": result.get("skipped", []),
+        "llm_calls": result.get("llm_calls", 0),
+        "timings": result.get("timings", {}),
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Answer a JSONL file of questions through the chat pipeline")
+    ap.add_argument("input", type=Path)
+    ap.add_argument("output", type=Path)
+    ap.add_argument("--workers", type=int, default=4)
+    ap.add_argument("--model", default="llama3.2:3b", help="default model (roles without a routed model)")
+    ap.add_argument(
+        "--routes", default=str(ROUTES_PATH),
+        help="JSON file mapping planner/evaluator/draft/final to model, temperature, num_predict ('' = no routing)",
+    )
+    ap.add_argument("--top-k", type=int, default=5)
+    ap.add_argument("--budget", type=float, default=0, help="per-item latency budget in seconds (0 = none)")
+    ap.add_argument("--limit", type=int, default=0, help="stop after N new items (0 = all)")
+    ap.add_argument("--fresh", action="store_true", help="ignore existing output and start over")
+    ap.add_argument(
+        "--planner", choices=["llm", "prf"], default="llm",
+        help="subquery planner: the LLM, or pseudo-relevance feedback from a first search (no LLM call)",
+    )
+    args = ap.parse_args()
+
+    if not args.input.exists():
+        raise FileNotFoundError(f"Missing input file: {args.input}")
+
+    if args.fresh and args.output.exists():
+        args.output.unlink()
+    done = load_done_ids(args.output)
+    if done:
+        print(f"↻ Resuming: {len(done)} items already answered in {args.output}")
+
+    # One Retriever for all workers; their query encodings are micro-batched.
+    # No index watcher: the whole run answers from one index version.
+    batcher = QueryBatcher(Retriever()).start()
+    print(f"Index version: {batcher.version}")
+    llm = LLMClient(model=args.model, routes=load_routes(Path(args.routes)) if args.routes else {})
+    retriever = RetrieverAgent(top_k=args.top_k, retriever=batcher)
+    reasoner = ReasonerAgent()
+    if args.planner == "prf":
+        planner = QueryExpander(batcher, idf=reasoner.idf, max_subqueries=5)
+    else:
+        planner = PlannerAgent(llm, max_subqueries=5)
+    engine = TurnEngine(llm, retriever, planner, EvaluatorAgent(llm, max_extra=4), reasoner=reasoner)
+
+    latency = LatencyStats()
+    stage_stats: Dict[str, LatencyStats] = {}
+    n_ok = n_err = n_skipped = 0
+    llm_calls = 0
+    t_run = time.perf_counter()
+
+    args.output.parent.mkdir(parents=True, exist_ok=True)
+    drop_partial_tail(args.output)
+    max_pending = max(1, args.workers) * 2  # bounded read-ahead keeps memory flat
+
+    with args.output.open("a", encoding="utf-8") as out, ThreadPoolExecutor(max_workers=args.workers) as pool:
+        pending = {}
+
+        def drain(block: bool) -> None:
+            nonlocal n_ok, n_err, llm_calls
+            if not pending:
+                return
+            finished, _ = wait(list(pending), timeout=None if block else 0, return_when=FIRST_COMPLETED)
+            for fut in finished:
+                item_id, t0 = pending.pop(fut)
+                elapsed = time.perf_counter() - t0
+                try:
+                    rec = fut.result()
+                    n_ok += 1
+                    llm_calls += rec["llm_calls"]
+                    for stage, secs in rec["timings"].items():
+                        stage_stats.setdefault(stage, LatencyStats()).record(secs)
+                except Exception as e:
+                    rec = {"id": item_id, "error": f"{type(e).__name__}: {e}"}
+                    n_err += 1
+                latency.record(elapsed, ok="error" not in rec)
+
+                out.write(json.dumps(rec, ensure_ascii=False) + "\n")
+                out.flush()
+                os.fsync(out.fileno())
+
+                total = n_ok + n_err
+                if total % 25 == 0:
+                    print(f"… {total} answered ({n_err} errors)")
+
+        submitted = 0
+        try:
+            for item_id, item in iter_items(args.input):
+                if item_id in done:
+                    n_skipped += 1
+                    continue
+                if args.limit and submitted >= args.limit:
+                    break
+
+                while len(pending) >= max_pending:
+                    drain(block=True)
+
+                done.add(item_id)  # guards against duplicate ids within the input
+                fut = pool.submit(
+                    answer_item, item_id, item, engine, args.budget
+                )
+                pending[fut] = (item_id, time.perf_counter())
+                submitted += 1
+
+            while pending:
+                drain(block=True)
+        except KeyboardInterrupt:
+            print("\n⏸  Interrupted — finishing in-flight items; re-run to resume.")
+            for fut in list(pending):
+                fut.cancel()
+            while pending:
+                pending = {f: v for f, v in pending.items() if not f.cancelled()}
+                drain(block=True)
+        finally:
+            batcher.stop()
+
+    wall = time.perf_counter() - t_run
+    print(f"✅ {n_ok} answered, {n_err} errors, {n_skipped} skipped (already done) in {wall:.1f}s → {args.output}")
+    summary = {
+        "index_version": batcher.version,
+        "llm_calls_per_item": round(llm_calls / n_ok, 2) if n_ok else 0.0,
+        "items": latency.snapshot(),
+        "stages": {s: st.snapshot() for s, st in stage_stats.items()},
+        "llm_roles": llm.role_stats(),
+    }
+    print(json.dumps(summary, indent=2))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,35 +1,262 @@
+"""
+Embed data/chunks.jsonl into a new FAISS index version and publish it.
+
+    python src/build_index.py --workers 4 --batch-size 256
+
+Chunks are streamed from chunks.jsonl in fixed-size batches. Each batch is
+encoded (in this process, or on a pool of --workers processes that each
+load the model once), added to the index, and its metadata appended to
+chunk_meta.json, so memory stays flat apart from the index itself. At most
+2 x workers batches are in flight and results are consumed in file order,
+keeping index rows aligned with chunk_meta.json.
+
+    python src/build_index.py --shard-by hash --shards 8
+    python src/build_index.py --shard-by source
+
+splits the corpus into shards (by chunk_id hash, or one per source), each
+with its own index and chunk store; Retriever searches them in parallel.
+"""
+import argparse
 import json
+import multiprocessing as mp
+import os
+import time
+import zlib
+from collections import deque
+from typing import Any, Dict, Iterator, List
+
 import numpy as np
 from sentence_transformers import SentenceTransformer
 import faiss
 from pathlib import Path
 
+from ba_bot.index_store import (
+    SHARDS_DIR, file_digest, new_version_dir, prune, publish, write_manifest,
+)
+from ba_bot.retriever import build_partitions, chunk_ids
+
 CHUNKS_PATH = Path("data/chunks.jsonl")
 OUT_DIR = Path("data/index")
-OUT_DIR.mkdir(parents=True, exist_ok=True)
+MODEL_NAME = "all-MiniLM-L6-v2"
 
-def load_chunks():
-    chunks = []
-    with CHUNKS_PATH.open("r", encoding="utf-8") as f:
+# Set per worker process by _init_worker.
+_worker_model = None
+
+
+def iter_batches(path: Path, batch_size: int) -> Iterator[List[Dict[str, Any]]]:
+    batch: List[Dict[str, Any]] = []
+    with path.open("r", encoding="utf-8") as f:
         for line in f:
-            chunks.append(json.loads(line))
-    return chunks
+            if not line.strip():
+                continue
+            batch.append(json.loads(line))
+            if len(batch) >= batch_size:
+                yield batch
+                batch = []
+    if batch:
+        yield batch
+
+
+def _init_worker(model_name: str, threads: int) -> None:
+    global _worker_model
+    try:
+        import torch  # type: ignore
+        # N processes x all cores each would oversubscribe the CPU.
+        torch.set_num_threads(threads)
+    except Exception:
+        pass
+    _worker_model = SentenceTransformer(model_name)
+
+
+def _encode(model, texts: List[str]) -> np.ndarray:
+    emb = model.encode(texts, normalize_embeddings=True, show_progress_bar=False)
+    return np.asarray(emb, dtype="float32")
+
+
+def _encode_in_worker(texts: List[str]) -> np.ndarray:
+    return _encode(_worker_model, texts)
+
+
+class MetaWriter:
+    """Writes chunk_meta.json as a JSON list, one chunk per line, as batches arrive."""
+
+    def __init__(self, path: Path):
+        self.f = path.open("w", encoding="utf-8")
+        self.f.write("[")
+        self.n = 0
+
+    def write(self, chunks: List[Dict[str, Any]]) -> None:
+        for c in chunks:
+            self.f.write(("\n" if self.n == 0 else ",\n") + json.dumps(c, ensure_ascii=False))
+            self.n += 1
+
+    def close(self) -> None:
+        self.f.write("\n]\n")
+        self.f.close()
+
+
+class ShardWriter:
+    """One index + chunk store being built (the whole corpus, or one shard)."""
+
+    def __init__(self, out: Path, name: str = ""):
+        out.mkdir(parents=True, exist_ok=True)
+        self.out, self.name = out, name
+        self.index = None
+        self.parts = None
+        self.meta = MetaWriter(out / "chunk_meta.json")
+
+    @property
+    def ntotal(self) -> int:
+        return self.index.ntotal if self.index is not None else 0
+
+    def add(self, chunks: List[Dict[str, Any]], emb: np.ndarray) -> None:
+        if self.index is None:
+            self.index = faiss.IndexFlatIP(emb.shape[1])
+        # source/section -> index rows, used by Retriever for filtered search
+        self.parts = build_partitions(chunks, self.parts, start_row=self.index.ntotal)
+        self.index.add(emb)
+        self.meta.write(chunks)
+
+    def close(self) -> None:
+        self.meta.close()
+        if self.index is not None:
+            faiss.write_index(self.index, str(self.out / "faiss.index"))
+            (self.out / "partitions.json").write_text(json.dumps(self.parts), encoding="utf-8")
+
+    def info(self) -> Dict[str, Any]:
+        return {
+            "name": self.name,
+            "chunks": self.ntotal,
+            # lets Retriever skip shards for filtered searches without loading them
+            "partition_values": {f: sorted(v) for f, v in (self.parts or {}).items()},
+        }
+
+
+class ShardRouter:
+    """Assigns chunks to shards: crc32(chunk_id) % n, or one shard per source."""
+
+    def __init__(self, out: Path, shard_by: str, n: int):
+        self.out, self.shard_by, self.n = out, shard_by, n
+        self.writers: Dict[str, ShardWriter] = {}
+        self._by_source: Dict[str, str] = {}
+        self.shard_of: Dict[str, str] = {}
+
+    def _name(self, chunk: Dict[str, Any]) -> str:
+        if self.shard_by == "hash":
+            return f"shard_{zlib.crc32(chunk['chunk_id'].encode('utf-8')) % self.n:03d}"
+        source = str(chunk.get("source") or "")
+        if source not in self._by_source:
+            self._by_source[source] = f"shard_{len(self._by_source):03d}"
+        return self._by_source[source]
+
+    def add(self, chunks: List[Dict[str, Any]], emb: np.ndarray) -> None:
+        groups: Dict[str, List[int]] = {}
+        for row, c in enumerate(chunks):
+            groups.setdefault(self._name(c), []).append(row)
+        for name, rows in groups.items():
+            if name not in self.writers:
+                self.writers[name] = ShardWriter(self.out / SHARDS_DIR / name, name)
+            self.writers[name].add([chunks[r] for r in rows], emb[rows])
+            for r in rows:
+                for cid in chunk_ids(chunks[r]):
+                    self.shard_of[cid] = name
+
+    def close(self) -> None:
+        for w in self.writers.values():
+            w.close()
+        (self.out / "chunk_shards.json").write_text(json.dumps(self.shard_of), encoding="utf-8")
+
+    @property
+    def dim(self) -> int:
+        return next(w.index.d for w in self.writers.values() if w.index is not None)
+
+    @property
+    def ntotal(self) -> int:
+        return sum(w.ntotal for w in self.writers.values())
+
+    def info(self) -> List[Dict[str, Any]]:
+        return [self.writers[name].info() for name in sorted(self.writers)]
+
+
+def embed_batches(batches, workers: int) -> Iterator[tuple]:
+    """Yield (chunks, embeddings) per batch, in input order."""
+    if workers <= 1:
+        model = SentenceTransformer(MODEL_NAME)
+        for chunks in batches:
+            yield chunks, _encode(model, [c["text"] for c in chunks])
+        return
+
+    threads = max(1, (os.cpu_count() or 1) // workers)
+    # spawn: forking a process that already holds torch threads can deadlock
+    ctx = mp.get_context("spawn")
+    with ctx.Pool(workers, initializer=_init_worker, initargs=(MODEL_NAME, threads)) as pool:
+        pending: deque = deque()
+        for chunks in batches:
+            pending.append((chunks, pool.apply_async(_encode_in_worker, ([c["text"] for c in chunks],))))
+            if len(pending) >= 2 * workers:
+                head, res = pending.popleft()
+                yield head, res.get()
+        while pending:
+            head, res = pending.popleft()
+            yield head, res.get()
+
 
 def main():
-    chunks = load_chunks()
-    texts = [c["text"] for c in chunks]
+    ap = argparse.ArgumentParser(description="Build a new FAISS index version and publish it")
+    ap.add_argument("--keep", type=int, default=3, help="index versions to keep on disk")
+    ap.add_argument("--batch-size", type=int, default=256, help="chunks read and encoded per batch")
+    ap.add_argument("--workers", type=int, default=1, help="encoder processes (1 = encode in this process)")
+    ap.add_argument(
+        "--shard-by", choices=["none", "hash", "source"], default="none",
+        help="split the index into shards by chunk_id hash or by source",
+    )
+    ap.add_argument("--shards", type=int, default=4, help="number of shards for --shard-by hash")
+    args = ap.parse_args()
+
+    # Everything goes into a fresh version dir; running Retrievers only see
+    # it once CURRENT is switched below.
+    t0 = time.perf_counter()
+    digest = file_digest(CHUNKS_PATH)
+    version, out = new_version_dir(OUT_DIR, digest)
+
+    if args.shard_by == "none":
+        writer = ShardWriter(out)
+    else:
+        writer = ShardRouter(out, args.shard_by, max(1, args.shards))
+    try:
+        for i, (chunks, emb) in enumerate(
+            embed_batches(iter_batches(CHUNKS_PATH, args.batch_size), args.workers), start=1
+        ):
+            writer.add(chunks, emb)
+            if i % 20 == 0:
+                print(f"… {writer.ntotal} chunks embedded")
+    finally:
+        writer.close()
 
-    model = SentenceTransformer("all-MiniLM-L6-v2")
-    emb = model.encode(texts, normalize_embeddings=True, show_progress_bar=True)
-    emb = np.array(emb, dtype="float32")
+    if writer.ntotal == 0:
+        raise RuntimeError(f"No chunks found in {CHUNKS_PATH} (run ingest.py first)")
 
-    index = faiss.IndexFlatIP(emb.shape[1])
-    index.add(emb)
+    manifest = {
+        "version": version,
+        "created_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "model": MODEL_NAME,
+        "dim": int(writer.index.d if isinstance(writer, ShardWriter) else writer.dim),
+        "chunks": int(writer.ntotal),
+        "chunks_sha256": digest,
+    }
+    if isinstance(writer, ShardRouter):
+        manifest["shard_by"] = args.shard_by
+        manifest["shards"] = writer.info()
+    write_manifest(out, manifest)
 
-    faiss.write_index(index, str(OUT_DIR / "faiss.index"))
-    (OUT_DIR / "chunk_meta.json").write_text(json.dumps(chunks, indent=2), encoding="utf-8")
+    publish(OUT_DIR, version)
+    removed = prune(OUT_DIR, keep=args.keep)
 
-    print(f"✅ Built index with {len(chunks)} chunks → {OUT_DIR}")
+    wall = time.perf_counter() - t0
+    shards = f" in {len(manifest['shards'])} shards" if "shards" in manifest else ""
+    print(f"✅ Built index version {version} with {writer.ntotal} chunks{shards} in {wall:.1f}s → {out}")
+    if removed:
+        print(f"   removed old versions: {', '.join(removed)}")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,110 @@
+"""
+Compare subquery planners by retrieval recall.
+
+    python src/eval_expansion.py                      # question-only vs PRF
+    python src/eval_expansion.py --llm --model llama3.2:3b
+
+For every question in data/eval_questions.jsonl ({"question", "relevant":
+[chunk_id, ...]}) each planner produces subqueries, which are retrieved the
+way TurnEngine does (RetrieverAgent, top_k per query, deduped union).
+Reported per planner: mean recall of the relevant chunks, mean number of
+chunks retrieved (the prompt cost of that recall) and planning latency.
+
+The relevant ids were labelled against the current data/chunks.jsonl; re-run
+the labelling if ingest.py changes how chunks are cut.
+"""
+import argparse
+import json
+import time
+from pathlib import Path
+from typing import Any, Dict, List
+
+from ba_bot.llm_client import LLMClient
+from ba_bot.planner_agent import PlannerAgent
+from ba_bot.query_expander import QueryExpander
+from ba_bot.reasoner_agent import ReasonerAgent
+from ba_bot.retriever import Retriever
+from ba_bot.retriever_agent import RetrieverAgent
+from ba_bot.stats import LatencyStats
+
+QUESTIONS_PATH = Path("data/eval_questions.jsonl")
+
+
+class QuestionOnly:
+    """Baseline: retrieve with the question alone."""
+
+    uses_llm = False
+
+    def plan(self, question: str, user_context: str = "", timeout=None) -> List[str]:
+        return [question]
+
+
+def load_questions(path: Path) -> List[Dict[str, Any]]:
+    with path.open("r", encoding="utf-8") as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def evaluate(planner, agent: RetrieverAgent, questions: List[Dict[str, Any]]) -> Dict[str, Any]:
+    latency = LatencyStats()
+    recall: List[float] = []
+    retrieved: List[int] = []
+    per_question = []
+    for item in questions:
+        t0 = time.perf_counter()
+        subqueries = planner.plan(item["question"]) or [item["question"]]
+        latency.record(time.perf_counter() - t0)
+
+        ids = {h["chunk_id"] for h in agent.retrieve(subqueries)}
+        relevant = set(item["relevant"])
+        r = len(ids & relevant) / len(relevant) if relevant else 1.0
+        recall.append(r)
+        retrieved.append(len(ids))
+        per_question.append({"id": item.get("id"), "recall": round(r, 3), "subqueries": subqueries})
+
+    snap = latency.snapshot()
+    return {
+        "recall": round(sum(recall) / len(recall), 3),
+        "chunks": round(sum(retrieved) / len(retrieved), 1),
+        "plan_p50_ms": snap["p50_ms"],
+        "plan_p95_ms": snap["p95_ms"],
+        "questions": per_question,
+    }
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Retrieval recall of question-only, PRF and LLM planning")
+    ap.add_argument("--questions", type=Path, default=QUESTIONS_PATH)
+    ap.add_argument("--top-k", type=int, default=5)
+    ap.add_argument("--llm", action="store_true", help="also evaluate the LLM planner (needs Ollama)")
+    ap.add_argument("--model", default="llama3.2:3b")
+    ap.add_argument("--verbose", action="store_true", help="print per-question recall and subqueries")
+    args = ap.parse_args()
+
+    if not args.questions.exists():
+        raise FileNotFoundError(f"Missing questions file: {args.questions}")
+    questions = load_questions(args.questions)
+
+    retriever = Retriever()
+    agent = RetrieverAgent(top_k=args.top_k, retriever=retriever)
+    planners: Dict[str, Any] = {
+        "question": QuestionOnly(),
+        "prf": QueryExpander(retriever, idf=ReasonerAgent().idf, max_subqueries=5),
+    }
+    if args.llm:
+        planners["llm"] = PlannerAgent(LLMClient(model=args.model), max_subqueries=5)
+
+    print(f"Index version: {retriever.version}, {len(questions)} questions, top_k={args.top_k}")
+    print(f"{'planner':<10}{'recall':>8}{'chunks':>8}{'plan p50':>11}{'plan p95':>11}")
+    for name, planner in planners.items():
+        res = evaluate(planner, agent, questions)
+        print(
+            f"{name:<10}{res['recall']:>8.3f}{res['chunks']:>8.1f}"
+            f"{res['plan_p50_ms']:>9.1f}ms{res['plan_p95_ms']:>9.1f}ms"
+        )
+        if args.verbose:
+            for q in res["questions"]:
+                print(f"   {q['id']}: recall={q['recall']:.2f} {q['subqueries']}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,9 +1,14 @@
+import argparse
 import json
 import re
 from pathlib import Path
 
+from ba_bot.dedupe import near_duplicate_groups
+from ba_bot.text_utils import idf_table, sentence_spans, term_index
+
 SRC = Path("data/sources/ba_liquids_and_restrictions.txt")
 OUT = Path("data/chunks.jsonl")
+IDF_OUT = Path("data/term_idf.json")
 
 SOURCE_URL = "https://www.britishairways.com/content/information/baggage-essentials/liquids-and-restrictions"
 CAPTURED_ON = "2025-12-14"
@@ -23,7 +28,40 @@ def chunk_text(text: str, max_chars=1200, overlap=200):
         i += max(1, max_chars - overlap)
     return chunks
 
+def collapse_near_duplicates(chunks, threshold: float, cross_threshold: float = 0.9):
+    """
+    Keep the first chunk of each near-duplicate cluster (MinHash/LSH, see
+    ba_bot.dedupe) and list the dropped chunks under its "aliases", so
+    their ids and sections still resolve to it in the Retriever.
+    """
+    groups = near_duplicate_groups(
+        [c["text"] for c in chunks],
+        threshold=threshold,
+        # stricter across sections/sources, never two overlapping windows
+        groups=[(c["source"], c["section"]) for c in chunks],
+        cross_threshold=cross_threshold if cross_threshold > 0 else None,
+    )
+    dropped = set()
+    for g in groups:
+        chunks[g[0]]["aliases"] = [
+            {"chunk_id": chunks[i]["chunk_id"], "section": chunks[i]["section"], "source": chunks[i]["source"]}
+            for i in g[1:]
+        ]
+        dropped.update(g[1:])
+    return [c for i, c in enumerate(chunks) if i not in dropped], len(groups)
+
 def main():
+    ap = argparse.ArgumentParser(description="Parse the policy source into chunks.jsonl")
+    ap.add_argument(
+        "--dedupe-threshold", type=float, default=0.8,
+        help="shingle Jaccard at which chunks count as near-duplicates (0 = keep all)",
+    )
+    ap.add_argument(
+        "--cross-section-threshold", type=float, default=0.9,
+        help="stricter Jaccard for near-duplicates in different sections/sources (0 = never merge those)",
+    )
+    args = ap.parse_args()
+
     if not SRC.exists():
         raise FileNotFoundError(f"Missing source file: {SRC}")
 
@@ -60,26 +98,50 @@ def main():
     if buffer:
         sections.append((current_section, "\n".join(buffer)))
 
+    chunks = []
+    for section_name, section_text in sections:
+        section_text = section_text.strip()
+        if not section_text:
+            continue
+
+        for ch in chunk_text(section_text):
+            text = ch.strip()
+            # Precomputed for ReasonerAgent: sentence spans + term -> sentence ids
+            spans = sentence_spans(text)
+            chunks.append({
+                "chunk_id": f"ba_lr_{len(chunks):03d}",
+                "section": section_name,
+                "source": SOURCE_URL,
+                "captured_on": CAPTURED_ON,
+                "text": text,
+                "sentences": spans,
+                "terms": term_index(text, spans),
+            })
+
+    # Ids are assigned before deduplication, so a kept chunk's id doesn't
+    # depend on whether its neighbours were duplicates.
+    total, total_chars = len(chunks), sum(len(c["text"]) for c in chunks)
+    clusters = 0
+    if args.dedupe_threshold > 0:
+        chunks, clusters = collapse_near_duplicates(chunks, args.dedupe_threshold, args.cross_section_threshold)
+
     OUT.parent.mkdir(parents=True, exist_ok=True)
     with OUT.open("w", encoding="utf-8") as f:
-        chunk_id = 0
-        for section_name, section_text in sections:
-            section_text = section_text.strip()
-            if not section_text:
-                continue
-
-            for ch in chunk_text(section_text):
-                obj = {
-                    "chunk_id": f"ba_lr_{chunk_id:03d}",
-                    "section": section_name,
-                    "source": SOURCE_URL,
-                    "captured_on": CAPTURED_ON,
-                    "text": ch.strip()
-                }
-                f.write(json.dumps(obj, ensure_ascii=False) + "\n")
-                chunk_id += 1
-
-    print(f"✅ Wrote {chunk_id} chunks to {OUT}")
+        for obj in chunks:
+            f.write(json.dumps(obj, ensure_ascii=False) + "\n")
+
+    IDF_OUT.write_text(json.dumps(idf_table(c["terms"] for c in chunks), ensure_ascii=False), encoding="utf-8")
+
+    print(f"✅ Wrote {len(chunks)} chunks to {OUT} (+ term weights → {IDF_OUT})")
+    if args.dedupe_threshold > 0 and total:
+        removed = total - len(chunks)
+        saved_chars = total_chars - sum(len(c["text"]) for c in chunks)
+        print(
+            f"   near-duplicates (Jaccard ≥ {args.dedupe_threshold}, across sections ≥ {args.cross_section_threshold}): "
+            f"{removed} of {total} chunks folded "
+            f"into {clusters} canonical chunks ({removed / total:.1%} smaller, {saved_chars} chars); "
+            f"{removed} fewer vectors to embed"
+        )
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,413 @@
+"""
+Concurrent-user load test for the chat pipeline.
+
+    python src/load_test.py --levels 1,2,4,8,16
+    python src/load_test.py --backend ollama --levels 1,2,4 --model llama3.2:3b
+
+Each simulated user holds conversations like a Streamlit session: a context
+message ("I'm flying from ..."), then --turns questions replayed from a
+question file (data/eval_questions.jsonl by default), all through
+TurnEngine with a shared Retriever behind a QueryBatcher, as in serve.py.
+Concurrency is ramped through --levels; at each level that many users run
+--conversations conversations each, and the level reports question-turn
+throughput, p50/p95/p99 latency, RSS growth per user and the deepest LLM
+queue seen.
+
+--backend stub (the default) starts a local fake Ollama server that models
+one GPU/CPU: --stub-parallel requests are served at a time (like
+OLLAMA_NUM_PARALLEL), each taking prompt_tokens / --stub-prompt-tps +
+output_tokens / --stub-gen-tps seconds, and the rest queue. Requests go
+through the real LLMClient over HTTP. --backend ollama uses the real server.
+--stub-speed llama3.2:1b=3 makes a (routed) model that much faster and
+--stub-missing llama3.2:1b answers 404 for it, to exercise the fallback.
+
+Saturation is reported at the first level where adding users raised
+throughput by less than --min-gain (latency grows, throughput doesn't).
+"""
+import argparse
+import json
+import random
+import re
+import resource
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence
+
+from ba_bot.batching import QueryBatcher
+from ba_bot.evaluator_agent import EvaluatorAgent
+from ba_bot.llm_client import ROUTES_PATH, LLMClient, load_routes
+from ba_bot.memory import MemoryStore
+from ba_bot.planner_agent import PlannerAgent
+from ba_bot.reasoner_agent import ReasonerAgent
+from ba_bot.retriever import Retriever
+from ba_bot.retriever_agent import RetrieverAgent
+from ba_bot.stats import LatencyStats
+from ba_bot.turn_engine import TurnEngine
+
+QUESTIONS_PATH = Path("data/eval_questions.jsonl")
+
+# Opening messages; each matches a context_only rule in data/fact_rules.json.
+CONTEXT_MESSAGES = [
+    "I'm flying from London to New York",
+    "I'm flying from Sydney",
+    "Travelling from Heathrow with two kids",
+    "I am carrying medication for my trip",
+    "Route: Manchester to Dubai",
+]
+
+CHUNK_ID_RE = re.compile(r"^\[([^\[\]]+)\]", re.MULTILINE)
+
+
+class StubOllama:
+    """Fake /api/chat server with a fixed number of slots and token-rate latency."""
+
+    def __init__(
+        self,
+        parallel: int = 1,
+        prompt_tps: float = 2000.0,
+        gen_tps: float = 60.0,
+        answer_tokens: int = 120,
+        more_evidence: float = 0.3,
+        seed: int = 0,
+        speed: Optional[Dict[str, float]] = None,
+        missing: Sequence[str] = (),
+    ):
+        self.prompt_tps, self.gen_tps = prompt_tps, gen_tps
+        self.speed = speed or {}
+        self.missing = set(missing)
+        self.answer_tokens = answer_tokens
+        self.more_evidence = more_evidence
+        self.slots = threading.Semaphore(max(1, parallel))
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.waiting = 0
+        self.max_waiting = 0
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, payload, status=200):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._send({"models": []})
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                if body.get("model") in stub.missing:
+                    return self._send({"error": f"model '{body['model']}' not found"}, status=404)
+                self._send(stub.reply(body))
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.server.daemon_threads = True
+        self.host = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, name="stub-ollama", daemon=True).start()
+
+    def _content(self, body: Dict[str, Any]) -> str:
+        messages = body.get("messages") or []
+        user = messages[-1]["content"] if messages else ""
+        schema = body.get("format")
+        props = schema.get("properties", {}) if isinstance(schema, dict) else {}
+        if "subqueries" in props:
+            q = user.rsplit("QUESTION:", 1)[-1].strip()
+            return json.dumps({"subqueries": [q, f"{q} rules", f"{q} hand baggage"]})
+        if "needs_more_evidence" in props:
+            with self.lock:
+                more = self.rng.random() < self.more_evidence
+            extra = ["liquids and powders limits"] if more else []
+            return json.dumps({"needs_more_evidence": more, "extra_queries": extra, "reason": "stub"})
+        ids = CHUNK_ID_RE.findall(user)[:2]
+        cites = "".join(f"[{cid}]" for cid in ids)
+        return f"According to the policy this item is allowed with conditions. {cites}".strip()
+
+    def reply(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        content = self._content(body)
+        prompt_tokens = sum(len(m.get("content", "")) for m in body.get("messages") or []) // 4
+        cap = (body.get("options") or {}).get("num_predict")
+        gen_tokens = max(len(content) // 4, 0 if body.get("format") else self.answer_tokens)
+        if cap:
+            gen_tokens = min(gen_tokens, int(cap))
+
+        with self.lock:
+            self.waiting += 1
+            self.max_waiting = max(self.max_waiting, self.waiting)
+        with self.slots:
+            with self.lock:
+                self.waiting -= 1
+            speed = self.speed.get(body.get("model"), 1.0)
+            prompt_s = prompt_tokens / (self.prompt_tps * speed)
+            gen_s = gen_tokens / (self.gen_tps * speed)
+            time.sleep(prompt_s + gen_s)
+        return {
+            "model": body.get("model", "stub"),
+            "created_at": "2025-01-01T00:00:00Z",
+            "message": {"role": "assistant", "content": content},
+            "done": True,
+            "done_reason": "stop",
+            "prompt_eval_count": prompt_tokens,
+            "prompt_eval_duration": int(prompt_s * 1e9),
+            "eval_count": gen_tokens,
+            "eval_duration": int(gen_s * 1e9),
+            "total_duration": int((prompt_s + gen_s) * 1e9),
+        }
+
+    def take_max_waiting(self) -> int:
+        with self.lock:
+            n, self.max_waiting = self.max_waiting, self.waiting
+        return n
+
+    def stop(self) -> None:
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def rss_mb() -> float:
+    """Current resident set size (peak RSS where /proc is unavailable)."""
+    try:
+        with open("/proc/self/statm") as f:
+            pages = int(f.read().split()[1])
+        return pages * resource.getpagesize() / 2**20
+    except OSError:
+        # ru_maxrss is KB on Linux, bytes on macOS
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+        return peak / 2**20 if peak > 2**32 else peak / 2**10
+
+
+class RssSampler:
+    """Samples RSS in the background and keeps the peak."""
+
+    def __init__(self, interval_s: float = 0.05):
+        self.interval = interval_s
+        self.peak = rss_mb()
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="rss-sampler", daemon=True)
+
+    def _run(self) -> None:
+        while not self._stop.wait(self.interval):
+            self.peak = max(self.peak, rss_mb())
+
+    def __enter__(self) -> "RssSampler":
+        self._thread.start()
+        return self
+
+    def __exit__(self, *exc) -> None:
+        self._stop.set()
+        self._thread.join()
+        self.peak = max(self.peak, rss_mb())
+
+
+def load_questions(path: Path) -> List[str]:
+    with path.open("r", encoding="utf-8") as f:
+        items = [json.loads(line) for line in f if line.strip()]
+    out = [str(x["question"] if isinstance(x, dict) else x).strip() for x in items]
+    return [q for q in out if q]
+
+
+def run_level(
+    users: int,
+    args: argparse.Namespace,
+    engine_for: Callable[[], TurnEngine],
+    questions: List[str],
+    stub: Optional[StubOllama],
+) -> Dict[str, Any]:
+    latency = LatencyStats()
+    lock = threading.Lock()
+    counts = {"degraded": 0, "llm_calls": 0}
+
+    def user(uid: int) -> None:
+        rng = random.Random(args.seed * 1000 + users * 100 + uid)
+        for c in range(args.conversations):
+            engine = engine_for()
+            memory = MemoryStore(session_id=f"load_{users}_{uid}_{c}", persist=False)
+            engine.run(rng.choice(CONTEXT_MESSAGES), memory)
+            for _ in range(args.turns):
+                t0 = time.perf_counter()
+                try:
+                    res = engine.run(rng.choice(questions), memory, budget_s=args.budget)
+                    ok = True
+                except Exception:
+                    res, ok = {}, False
+                latency.record(time.perf_counter() - t0, ok=ok)
+                with lock:
+                    counts["degraded"] += int(bool(res.get("degraded")))
+                    counts["llm_calls"] += res.get("llm_calls", 0)
+                if args.think_ms:
+                    time.sleep(rng.uniform(0, 2 * args.think_ms) / 1000.0)
+
+    rss_before = rss_mb()
+    if stub is not None:
+        stub.take_max_waiting()
+    t0 = time.perf_counter()
+    with RssSampler() as rss, ThreadPoolExecutor(max_workers=users, thread_name_prefix="user") as pool:
+        list(pool.map(user, range(users)))
+    wall = time.perf_counter() - t0
+
+    snap = latency.snapshot()
+    return {
+        "users": users,
+        "turns": snap["count"],
+        "errors": snap["errors"],
+        "degraded": counts["degraded"],
+        "wall_s": round(wall, 2),
+        "turns_per_s": round(snap["count"] / wall, 3) if wall else 0.0,
+        "p50_ms": snap["p50_ms"],
+        "p95_ms": snap["p95_ms"],
+        "p99_ms": snap["p99_ms"],
+        "llm_calls_per_turn": round(counts["llm_calls"] / snap["count"], 2) if snap["count"] else 0.0,
+        "rss_mb": round(rss.peak, 1),
+        "mb_per_user": round(max(0.0, rss.peak - rss_before) / users, 2),
+        "llm_queue_max": stub.take_max_waiting() if stub is not None else None,
+    }
+
+
+def find_saturation(rows: List[Dict[str, Any]], min_gain: float) -> Optional[Dict[str, Any]]:
+    """First level whose throughput grew by less than min_gain over the previous one."""
+    for prev, row in zip(rows, rows[1:]):
+        if row["turns_per_s"] < prev["turns_per_s"] * (1.0 + min_gain):
+            return {
+                "users": row["users"],
+                "from_users": prev["users"],
+                "throughput_gain": round(row["turns_per_s"] / prev["turns_per_s"] - 1.0, 3)
+                if prev["turns_per_s"] else 0.0,
+                "p95_ms": [prev["p95_ms"], row["p95_ms"]],
+            }
+    return None
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Ramp concurrent conversations through the chat pipeline")
+    ap.add_argument("--levels", default="1,2,4,8", help="comma-separated concurrent-user counts")
+    ap.add_argument("--conversations", type=int, default=2, help="conversations per user per level")
+    ap.add_argument("--turns", type=int, default=3, help="questions per conversation (after the context message)")
+    ap.add_argument("--think-ms", type=float, default=0, help="mean pause between a user's turns")
+    ap.add_argument("--questions", type=Path, default=QUESTIONS_PATH)
+    ap.add_argument("--budget", type=float, default=0, help="per-turn latency budget in seconds (0 = none)")
+    ap.add_argument("--top-k", type=int, default=5)
+    ap.add_argument(
+        "--engine-per-session", action="store_true",
+        help="build agents per conversation instead of sharing one TurnEngine",
+    )
+    ap.add_argument("--backend", choices=["stub", "ollama"], default="stub")
+    ap.add_argument("--model", default="llama3.2:3b", help="default model (roles without a routed model)")
+    ap.add_argument(
+        "--routes", default=str(ROUTES_PATH),
+        help="JSON file mapping planner/evaluator/draft/final to model, temperature, num_predict ('' = no routing)",
+    )
+    ap.add_argument("--stub-parallel", type=int, default=1, help="requests the stub serves at once")
+    ap.add_argument("--stub-prompt-tps", type=float, default=2000.0, help="stub prompt evaluation tokens/s")
+    ap.add_argument("--stub-gen-tps", type=float, default=60.0, help="stub generation tokens/s")
+    ap.add_argument(
+        "--stub-speed", default="", help="per-model speed factors for the stub, e.g. llama3.2:1b=3"
+    )
+    ap.add_argument("--stub-missing", default="", help="comma-separated models the stub answers 404 for")
+    ap.add_argument("--stub-more", type=float, default=0.3, help="share of turns the stub evaluator asks for more evidence")
+    ap.add_argument("--min-gain", type=float, default=0.1, help="throughput gain below which a level counts as saturated")
+    ap.add_argument("--seed", type=int, default=0)
+    ap.add_argument("--out", type=Path, default=None, help="also write the results as JSON")
+    args = ap.parse_args()
+
+    levels = [int(x) for x in args.levels.split(",") if x.strip()]
+    if not levels or min(levels) < 1:
+        raise ValueError("--levels needs positive user counts, e.g. 1,2,4,8")
+    if not args.questions.exists():
+        raise FileNotFoundError(f"Missing questions file: {args.questions}")
+    questions = load_questions(args.questions)
+
+    routes = load_routes(Path(args.routes)) if args.routes else {}
+    stub = None
+    if args.backend == "stub":
+        stub = StubOllama(
+            parallel=args.stub_parallel,
+            prompt_tps=args.stub_prompt_tps,
+            gen_tps=args.stub_gen_tps,
+            more_evidence=args.stub_more,
+            seed=args.seed,
+            speed={
+                m.strip(): float(f)
+                for m, f in (x.rsplit("=", 1) for x in args.stub_speed.split(",") if "=" in x)
+            },
+            missing=[m.strip() for m in args.stub_missing.split(",") if m.strip()],
+        )
+        llm = LLMClient(model=args.model, hosts=[stub.host], max_retries=0, routes=routes)
+    else:
+        llm = LLMClient(model=args.model, routes=routes)
+
+    rss_start = rss_mb()
+    batcher = QueryBatcher(Retriever()).start()
+    reasoner = ReasonerAgent()
+
+    def build_engine() -> TurnEngine:
+        return TurnEngine(
+            llm,
+            RetrieverAgent(top_k=args.top_k, retriever=batcher),
+            PlannerAgent(llm, max_subqueries=5),
+            EvaluatorAgent(llm, max_extra=4),
+            reasoner=reasoner,
+        )
+
+    shared = build_engine()
+    engine_for = build_engine if args.engine_per_session else (lambda: shared)
+    # Warm-up turn: model weights, index and first-call allocations aren't per-user cost.
+    shared.run(questions[0], MemoryStore(session_id="load_warmup", persist=False))
+    print(
+        f"Index version: {batcher.version}, backend: {args.backend}, {len(questions)} questions, "
+        f"base RSS {rss_start:.0f} MB → {rss_mb():.0f} MB after loading"
+    )
+
+    print(
+        f"{'users':>5}{'turns':>7}{'err':>5}{'turns/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}"
+        f"{'MB/user':>9}{'LLM q':>7}"
+    )
+    rows: List[Dict[str, Any]] = []
+    try:
+        for users in levels:
+            row = run_level(users, args, engine_for, questions, stub)
+            rows.append(row)
+            print(
+                f"{row['users']:>5}{row['turns']:>7}{row['errors']:>5}{row['turns_per_s']:>9.2f}"
+                f"{row['p50_ms']:>9.0f}{row['p95_ms']:>9.0f}{row['p99_ms']:>9.0f}"
+                f"{row['mb_per_user']:>9.2f}{row['llm_queue_max'] if stub else '-':>7}"
+            )
+    except KeyboardInterrupt:
+        print("\n⏸  Interrupted — reporting completed levels.")
+    finally:
+        batcher.stop()
+        llm.close()
+        if stub is not None:
+            stub.stop()
+
+    saturation = find_saturation(rows, args.min_gain)
+    if saturation:
+        print(
+            f"✅ Saturation begins at ~{saturation['users']} users: throughput "
+            f"{saturation['throughput_gain']:+.0%} vs {saturation['from_users']} users, "
+            f"p95 {saturation['p95_ms'][0]:.0f} → {saturation['p95_ms'][1]:.0f} ms"
+        )
+    elif rows:
+        print(f"✅ No saturation up to {rows[-1]['users']} users")
+
+    roles = llm.role_stats()
+    for role, st in roles.items():
+        print(f"   {role:<10} {st['model']:<16} p50 {st['p50_ms']:>7.0f} ms  p95 {st['p95_ms']:>7.0f} ms")
+    if args.out:
+        args.out.write_text(
+            json.dumps(
+                {"levels": rows, "saturation": saturation, "batcher": batcher.stats(), "llm_roles": roles},
+                indent=2,
+            ),
+            encoding="utf-8",
+        )
+
+
+if __name__ == "__main__":
+    main()
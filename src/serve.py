@@ -0,0 +1,389 @@
+"""
+Local HTTP answer service.
+
+    python src/serve.py --port 8080
+
+Endpoints (JSON in / JSON out):
+    POST /search  {"query": "...", "k": 5}
+    POST /ask     {"question": "...", "session_id": "...", "mode": "llm" | "extractive",
+                   "budget_s": 20}
+    GET  /stats   throughput + latency per endpoint, batcher stats, index version
+    GET  /health
+
+With --watch-index N the Retriever polls data/index/CURRENT every N seconds
+and hot-swaps to a newly published index version (see build_index.py)
+without interrupting in-flight requests.
+
+All requests share one Retriever. Query embeddings from concurrent requests
+are coalesced into micro-batches by QueryBatcher. When more than
+--max-inflight requests are running (or the batcher queue is full) the
+server answers 503 instead of queueing without bound.
+"""
+import argparse
+import asyncio
+import json
+import re
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from pathlib import Path
+from typing import Any, Dict, Tuple
+
+from ba_bot.batching import BatcherFull, QueryBatcher
+from ba_bot.evaluator_agent import EvaluatorAgent
+from ba_bot.llm_client import ROUTES_PATH, LLMClient, load_routes
+from ba_bot.memory import MemoryStore
+from ba_bot.planner_agent import PlannerAgent
+from ba_bot.query_expander import QueryExpander
+from ba_bot.reasoner_agent import ReasonerAgent
+from ba_bot.retriever import Retriever
+from ba_bot.retriever_agent import RetrieverAgent
+from ba_bot.stats import LatencyStats
+from ba_bot.turn_engine import TurnEngine
+
+SESSION_RE = re.compile(r"^[A-Za-z0-9_\-]{1,64}$")
+MAX_BODY = 64 * 1024
+
+REASONS = {
+    200: "OK",
+    400: "Bad Request",
+    404: "Not Found",
+    405: "Method Not Allowed",
+    413: "Payload Too Large",
+    500: "Internal Server Error",
+    503: "Service Unavailable",
+}
+
+
+class HTTPError(Exception):
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status = status
+
+
+class AnswerService:
+    def __init__(
+        self,
+        retriever: Retriever,
+        llm: LLMClient,
+        top_k: int = 5,
+        window_ms: float = 5.0,
+        max_batch: int = 32,
+        max_queue: int = 256,
+        max_inflight: int = 64,
+        workers: int = 8,
+        budget_s: float | None = None,
+        planner: str = "llm",
+        max_sessions: int = 1024,
+    ):
+        self.batcher = QueryBatcher(
+            retriever, window_ms=window_ms, max_batch=max_batch, max_queue=max_queue
+        ).start()
+        self.llm = llm
+        self.top_k = top_k
+        self.budget_s = budget_s
+        self.retriever_agent = RetrieverAgent(top_k=top_k, retriever=self.batcher)
+        self.evaluator = EvaluatorAgent(llm, max_extra=4)
+        self.reasoner = ReasonerAgent()
+        if planner == "prf":
+            self.planner = QueryExpander(self.batcher, idf=self.reasoner.idf, max_subqueries=5)
+        else:
+            self.planner = PlannerAgent(llm, max_subqueries=5)
+        self.engine = TurnEngine(
+            llm, self.retriever_agent, self.planner, self.evaluator, reasoner=self.reasoner
+        )
+
+        # /ask runs the blocking pipeline (LLM calls) on a worker pool
+        self.pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="ask")
+        self.max_inflight = max_inflight
+        self.inflight = 0
+        self.rejected = 0
+
+        self.stats_by_route: Dict[str, LatencyStats] = {
+            "/search": LatencyStats(),
+            "/ask": LatencyStats(),
+        }
+
+        # LRU of open sessions. Evicted ones are reloaded from data/memory on
+        # their next turn.
+        self._sessions: "OrderedDict[str, Tuple[MemoryStore, threading.Lock]]" = OrderedDict()
+        self._sessions_lock = threading.Lock()
+        self.max_sessions = max(1, max_sessions)
+
+    # ---------- sessions ----------
+
+    def _session(self, session_id: str) -> Tuple[MemoryStore, threading.Lock]:
+        with self._sessions_lock:
+            if session_id in self._sessions:
+                self._sessions.move_to_end(session_id)
+                return self._sessions[session_id]
+            entry = self._sessions[session_id] = (MemoryStore(session_id=session_id), threading.Lock())
+            if len(self._sessions) > self.max_sessions:
+                # Oldest first; a session with a turn running stays, or a second
+                # store for it could interleave turns.
+                for sid, (_, lock) in self._sessions.items():
+                    if sid != session_id and not lock.locked():
+                        del self._sessions[sid]
+                        break
+            return entry
+
+    def _ask_blocking(self, question: str, session_id: str, budget_s: float | None) -> Dict[str, Any]:
+        memory, lock = self._session(session_id)
+        # Turns of one session must not interleave (memory is a single JSON file).
+        with lock:
+            return self.engine.run(question, memory, budget_s=budget_s)
+
+    # ---------- routes ----------
+
+    async def handle_search(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        query = str(body.get("query") or "").strip()
+        if not query:
+            raise HTTPError(400, "Missing 'query'")
+        try:
+            k = max(1, min(50, int(body.get("k", self.top_k))))
+        except (TypeError, ValueError):
+            raise HTTPError(400, "'k' must be an integer")
+
+        try:
+            fut = self.batcher.submit(query, k)
+        except BatcherFull as e:
+            raise HTTPError(503, str(e))
+        hits = await asyncio.wrap_future(fut)
+        return {"query": query, "index_version": self.batcher.version, "hits": hits}
+
+    async def handle_ask(self, body: Dict[str, Any]) -> Dict[str, Any]:
+        question = str(body.get("question") or "").strip()
+        if not question:
+            raise HTTPError(400, "Missing 'question'")
+        session_id = str(body.get("session_id") or "api")
+        if not SESSION_RE.match(session_id):
+            raise HTTPError(400, "Invalid 'session_id' (use letters, digits, _ or -)")
+
+        mode = str(body.get("mode") or "llm")
+        if mode == "extractive":
+            result = await self._ask_extractive(question, session_id)
+            return {"question": question, "session_id": session_id, **result}
+        if mode != "llm":
+            raise HTTPError(400, "'mode' must be 'llm' or 'extractive'")
+
+        try:
+            budget_s = float(body.get("budget_s") or self.budget_s or 0)
+        except (TypeError, ValueError):
+            raise HTTPError(400, "'budget_s' must be a number")
+
+        loop = asyncio.get_running_loop()
+        try:
+            result = await loop.run_in_executor(
+                self.pool, self._ask_blocking, question, session_id, budget_s
+            )
+        except BatcherFull as e:
+            raise HTTPError(503, str(e))
+        return {"question": question, "session_id": session_id, **result}
+
+    async def _ask_extractive(self, question: str, session_id: str) -> Dict[str, Any]:
+        """No-LLM answer: one retrieval + ReasonerAgent sentence extraction."""
+        # Opening a session reads its file: keep that off the event loop.
+        loop = asyncio.get_running_loop()
+        memory, _ = await loop.run_in_executor(self.pool, self._session, session_id)
+        facts = memory.get_facts()
+        try:
+            fut = self.batcher.submit(question, self.top_k, self.retriever_agent.partitions_for(facts))
+        except BatcherFull as e:
+            raise HTTPError(503, str(e))
+        contexts = await asyncio.wrap_future(fut)
+        answer = self.reasoner.draft(question, contexts, memory_facts=facts)
+        return {
+            "answer": answer,
+            "citations": [c["chunk_id"] for c in contexts[:5]],
+            "mode": "extractive",
+        }
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "inflight": self.inflight,
+            "max_inflight": self.max_inflight,
+            "rejected": self.rejected,
+            "routes": {r: s.snapshot() for r, s in self.stats_by_route.items()},
+            "batcher": self.batcher.stats(),
+            "index": self.batcher.index_info(),
+            "llm_backends": self.llm.backend_stats(),
+            "llm_usage": dict(self.llm.usage),
+            "llm_roles": self.llm.role_stats(),
+        }
+
+    async def dispatch(self, method: str, path: str, body: bytes) -> Tuple[int, Dict[str, Any]]:
+        if path == "/health":
+            return 200, {"status": "ok"}
+        if path == "/stats":
+            return 200, self.stats()
+
+        handlers = {"/search": self.handle_search, "/ask": self.handle_ask}
+        if path not in handlers:
+            return 404, {"error": f"Unknown path: {path}"}
+        if method != "POST":
+            return 405, {"error": "Use POST"}
+
+        # Backpressure: refuse instead of letting latency grow without bound.
+        if self.inflight >= self.max_inflight:
+            self.rejected += 1
+            return 503, {"error": "Server busy, retry later"}
+
+        try:
+            payload = json.loads(body.decode("utf-8") or "{}")
+            if not isinstance(payload, dict):
+                raise ValueError
+        except ValueError:
+            return 400, {"error": "Body must be a JSON object"}
+
+        self.inflight += 1
+        t0 = time.monotonic()
+        ok = False
+        try:
+            result = await handlers[path](payload)
+            ok = True
+            return 200, result
+        except HTTPError as e:
+            if e.status == 503:
+                self.rejected += 1
+            return e.status, {"error": str(e)}
+        except Exception as e:
+            return 500, {"error": f"{type(e).__name__}: {e}"}
+        finally:
+            self.inflight -= 1
+            self.stats_by_route[path].record(time.monotonic() - t0, ok=ok)
+
+    # ---------- HTTP plumbing ----------
+
+    async def handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+
+                try:
+                    method, target, version = request_line.decode("latin-1").split()
+                except ValueError:
+                    await self._write(writer, 400, {"error": "Malformed request line"}, False)
+                    break
+
+                headers: Dict[str, str] = {}
+                while True:
+                    line = await reader.readline()
+                    if line in (b"\r\n", b"\n", b""):
+                        break
+                    name, _, value = line.decode("latin-1").partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                try:
+                    length = int(headers.get("content-length") or 0)
+                    if length < 0:
+                        raise ValueError
+                except ValueError:
+                    await self._write(writer, 400, {"error": "Invalid Content-Length"}, False)
+                    break
+                if length > MAX_BODY:
+                    await self._write(writer, 413, {"error": "Body too large"}, False)
+                    break
+                body = await reader.readexactly(length) if length else b""
+
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                status, payload = await self.dispatch(method.upper(), target.split("?", 1)[0], body)
+                await self._write(writer, status, payload, keep_alive)
+                if not keep_alive:
+                    break
+        except (asyncio.IncompleteReadError, ConnectionResetError):
+            pass
+        finally:
+            writer.close()
+
+    @staticmethod
+    async def _write(writer: asyncio.StreamWriter, status: int, payload: Dict[str, Any], keep_alive: bool):
+        data = json.dumps(payload, ensure_ascii=False).encode("utf-8")
+        head = (
+            f"HTTP/1.1 {status} {REASONS.get(status, '')}\r\n"
+            "Content-Type: application/json; charset=utf-8\r\n"
+            f"Content-Length: {len(data)}\r\n"
+            f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n"
+        )
+        if status == 503:
+            head += "Retry-After: 1\r\n"
+        writer.write(head.encode("latin-1") + b"\r\n" + data)
+        await writer.drain()
+
+    def close(self) -> None:
+        self.batcher.stop()
+        self.llm.close()
+        self.pool.shutdown(wait=False)
+
+
+async def serve(service: AnswerService, host: str, port: int) -> None:
+    server = await asyncio.start_server(service.handle_connection, host, port)
+    print(f"✅ Serving on http://{host}:{port}  (POST /ask, POST /search, GET /stats)")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    ap = argparse.ArgumentParser(description="Local HTTP answer service")
+    ap.add_argument("--host", default="127.0.0.1")
+    ap.add_argument("--port", type=int, default=8080)
+    ap.add_argument("--model", default="llama3.2:3b", help="default model (roles without a routed model)")
+    ap.add_argument(
+        "--routes", default=str(ROUTES_PATH),
+        help="JSON file mapping planner/evaluator/draft/final to model, temperature, num_predict ('' = no routing)",
+    )
+    ap.add_argument(
+        "--ollama-hosts",
+        default="",
+        help="comma-separated Ollama endpoints to load-balance across (default: $OLLAMA_HOSTS or local)",
+    )
+    ap.add_argument("--top-k", type=int, default=5)
+    ap.add_argument("--window-ms", type=float, default=5.0, help="micro-batch window for query encoding")
+    ap.add_argument("--max-batch", type=int, default=32)
+    ap.add_argument("--max-queue", type=int, default=256, help="pending queries before /search returns 503")
+    ap.add_argument("--max-inflight", type=int, default=64, help="concurrent requests before 503")
+    ap.add_argument("--workers", type=int, default=8, help="threads running /ask pipelines")
+    ap.add_argument("--budget", type=float, default=0, help="default per-turn latency budget in seconds (0 = none)")
+    ap.add_argument("--max-sessions", type=int, default=1024, help="chat sessions kept open (least recently used are closed)")
+    ap.add_argument(
+        "--watch-index", type=float, default=5.0,
+        help="seconds between checks for a newly published index version (0 = never reload)",
+    )
+    ap.add_argument(
+        "--planner", choices=["llm", "prf"], default="llm",
+        help="subquery planner: the LLM, or pseudo-relevance feedback from a first search (no LLM call)",
+    )
+    args = ap.parse_args()
+
+    retriever = Retriever(watch_interval_s=args.watch_index)
+    service = AnswerService(
+        retriever,
+        LLMClient(
+            model=args.model,
+            hosts=[h.strip() for h in args.ollama_hosts.split(",") if h.strip()] or None,
+            health_interval_s=10.0,
+            routes=load_routes(Path(args.routes)) if args.routes else {},
+        ),
+        top_k=args.top_k,
+        window_ms=args.window_ms,
+        max_batch=args.max_batch,
+        max_queue=args.max_queue,
+        max_inflight=args.max_inflight,
+        workers=args.workers,
+        budget_s=args.budget,
+        planner=args.planner,
+        max_sessions=args.max_sessions,
+    )
+    try:
+        asyncio.run(serve(service, args.host, args.port))
+    except KeyboardInterrupt:
+        pass
+    finally:
+        service.close()
+        retriever.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,47 @@
+"""
+Resuming an interrupted batch_answer.py run from its output file.
+
+    python -m pytest src/test_batch_answer.py
+"""
+import json
+
+from batch_answer import drop_partial_tail, iter_items, load_done_ids
+
+
+def test_resume_after_partial_last_line(tmp_path):
+    out = tmp_path / "answers.jsonl"
+    full = json.dumps({"id": "T-1", "answer": "ok"}) + "\n" + json.dumps({"id": "T-2", "error": "timeout"}) + "\n"
+    out.write_text(full + '{"id": "T-3", "answ', encoding="utf-8")
+
+    assert load_done_ids(out) == {"T-1"}  # failed and truncated records are redone
+    drop_partial_tail(out)
+    assert out.read_text(encoding="utf-8") == full
+
+    with out.open("a", encoding="utf-8") as f:
+        f.write(json.dumps({"id": "T-3", "answer": "ok"}) + "\n")
+    assert load_done_ids(out) == {"T-1", "T-3"}
+
+
+def test_drop_partial_tail_keeps_complete_files(tmp_path):
+    out = tmp_path / "answers.jsonl"
+    drop_partial_tail(out)  # no previous run
+    assert not out.exists()
+    out.write_text('{"id": "T-1"}\n', encoding="utf-8")
+    drop_partial_tail(out)
+    assert out.read_text(encoding="utf-8") == '{"id": "T-1"}\n'
+    out.write_text('{"id": "T-1", "answ', encoding="utf-8")  # killed during the first write
+    drop_partial_tail(out)
+    assert out.read_text(encoding="utf-8") == ""
+
+
+def test_iter_items_skips_lines_that_are_not_questions(tmp_path, capsys):
+    src = tmp_path / "questions.jsonl"
+    src.write_text(
+        '{"id": "T-1", "question": "Can I take powder?"}\n42\n[1, 2]\nnull\n{not json\n\n"Can I take a knife?"\n',
+        encoding="utf-8",
+    )
+    items = list(iter_items(src))
+    assert [i for i, _ in items] == ["T-1", "line_7"]
+    assert items[1][1] == {"question": "Can I take a knife?"}
+    err = capsys.readouterr().err
+    assert all(f"line {n}" in err for n in (2, 3, 4, 5))
@@ -0,0 +1,93 @@
+"""
+Micro-batching of retrieval queries (ba_bot.batching).
+
+    python -m pytest src/test_batching.py
+"""
+import threading
+
+import numpy as np
+import pytest
+
+from ba_bot.batching import BatcherFull, QueryBatcher
+
+
+class StubRetriever:
+    """Encodes each query to one row; `gate` (if set) holds encode() until released."""
+
+    version = "v_test"
+
+    def __init__(self, gate=None):
+        self.gate = gate
+        self.entered = threading.Event()
+        self.encoded = []
+
+    def encode(self, queries):
+        self.encoded.append(list(queries))
+        self.entered.set()
+        if self.gate is not None:
+            self.gate.wait(5)
+        return np.arange(len(queries), dtype="float32").reshape(-1, 1)
+
+    def search_vectors(self, vecs, k, filters=None):
+        return [[{"chunk_id": f"c{int(v[0])}_{i}", "score": 1.0} for i in range(k)] for v in vecs]
+
+
+def test_concurrent_queries_share_one_batch():
+    retriever = StubRetriever()
+    batcher = QueryBatcher(retriever, window_ms=200)
+    futures = [batcher.submit(q, k) for q, k in (("liquids", 2), ("knives", 1), ("liquids", 3))]
+    results = [f.result(timeout=5) for f in futures]
+    batcher.stop()
+
+    assert retriever.encoded == [["liquids", "knives"]]  # duplicates share a row
+    assert [len(r) for r in results] == [2, 1, 3]
+    assert results[0] == results[2][:2]
+    assert batcher.stats()["batches"] == 1 and batcher.stats()["mean_batch_size"] == 3.0
+    assert batcher.version == "v_test"  # not batched: passed through to the Retriever
+
+
+def test_full_queue_is_rejected():
+    gate = threading.Event()
+    retriever = StubRetriever(gate)
+    batcher = QueryBatcher(retriever, window_ms=0, max_queue=1)
+    first = batcher.submit("liquids")
+    assert retriever.entered.wait(5)  # worker busy with the first query
+    second = batcher.submit("knives")
+    with pytest.raises(BatcherFull):
+        batcher.submit("golf clubs")
+    assert batcher.rejected == 1
+
+    gate.set()
+    assert first.result(timeout=5) and second.result(timeout=5)
+    batcher.stop()
+
+
+def test_stop_fails_queued_queries_and_refuses_new_ones():
+    gate = threading.Event()
+    retriever = StubRetriever(gate)
+    batcher = QueryBatcher(retriever, window_ms=0)
+    first = batcher.submit("liquids")
+    assert retriever.entered.wait(5)
+    queued = batcher.submit("knives")
+
+    threading.Timer(0.1, gate.set).start()
+    batcher.stop()
+    assert first.result(timeout=5)
+    with pytest.raises(RuntimeError, match="stopped"):
+        queued.result(timeout=5)
+    with pytest.raises(RuntimeError, match="stopped"):
+        batcher.submit("golf clubs")
+    assert batcher.submit("").result() == []  # empty queries never reach the queue
+
+
+def test_cancelled_query_does_not_kill_the_worker():
+    gate = threading.Event()
+    retriever = StubRetriever(gate)
+    batcher = QueryBatcher(retriever, window_ms=0)
+    first = batcher.submit("liquids")
+    assert retriever.entered.wait(5)
+    assert first.cancel()  # e.g. the HTTP client disconnected
+    gate.set()
+    # The worker survives and keeps answering.
+    assert batcher.submit("knives").result(timeout=5)
+    batcher.stop()
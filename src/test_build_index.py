@@ -0,0 +1,68 @@
+"""
+Streaming index build (build_index.py) against a one-shot build of the same
+chunks.
+
+    python -m pytest src/test_build_index.py
+"""
+import json
+import sys
+import zlib
+
+import numpy as np
+import pytest
+
+faiss = pytest.importorskip("faiss")
+pytest.importorskip("sentence_transformers")
+
+import build_index  # noqa: E402
+from ba_bot.index_store import read_manifest, resolve  # noqa: E402
+from ba_bot.retriever import build_partitions  # noqa: E402
+
+CHUNKS = [
+    {"chunk_id": f"ba_lr_{i:03d}", "source": f"doc_{i % 3}", "section": f"Section {i % 4}",
+     "text": f"Rule number {i} about {'liquids' if i % 2 else 'sharp objects'} in hand baggage."}
+    for i in range(11)
+]
+
+
+class FakeModel:
+    """Deterministic stand-in for SentenceTransformer: one seeded vector per text."""
+
+    def __init__(self, name=None):
+        pass
+
+    def encode(self, texts, normalize_embeddings=True, show_progress_bar=False):
+        emb = np.stack([
+            np.random.default_rng(zlib.crc32(t.encode("utf-8"))).standard_normal(16) for t in texts
+        ])
+        return emb / np.linalg.norm(emb, axis=1, keepdims=True)
+
+
+def build(tmp_path, monkeypatch, batch_size):
+    chunks_path = tmp_path / "chunks.jsonl"
+    chunks_path.write_text("".join(json.dumps(c) + "\n" for c in CHUNKS), encoding="utf-8")
+    out_dir = tmp_path / f"index_{batch_size}"
+    monkeypatch.setattr(build_index, "SentenceTransformer", FakeModel)
+    monkeypatch.setattr(build_index, "CHUNKS_PATH", chunks_path)
+    monkeypatch.setattr(build_index, "OUT_DIR", out_dir)
+    monkeypatch.setattr(sys, "argv", ["build_index.py", "--batch-size", str(batch_size)])
+    build_index.main()
+    return resolve(out_dir)[1]
+
+
+def test_streaming_build_equals_one_shot_build(tmp_path, monkeypatch):
+    streamed = build(tmp_path, monkeypatch, batch_size=3)  # 4 batches, the last one short
+    one_shot = build(tmp_path, monkeypatch, batch_size=len(CHUNKS))
+
+    index = faiss.read_index(str(streamed / "faiss.index"))
+    expected = build_index._encode(FakeModel(), [c["text"] for c in CHUNKS])
+    np.testing.assert_array_equal(index.reconstruct_n(0, index.ntotal), expected)
+
+    for name in ("faiss.index", "chunk_meta.json", "partitions.json"):
+        assert (streamed / name).read_bytes() == (one_shot / name).read_bytes()
+    assert json.loads((streamed / "chunk_meta.json").read_text(encoding="utf-8")) == CHUNKS
+    assert json.loads((streamed / "partitions.json").read_text(encoding="utf-8")) == build_partitions(CHUNKS)
+
+    manifest, reference = read_manifest(streamed), read_manifest(one_shot)
+    assert manifest["chunks"] == reference["chunks"] == len(CHUNKS)
+    assert manifest["chunks_sha256"] == reference["chunks_sha256"]
@@ -0,0 +1,49 @@
+"""
+Local citation attachment (ba_bot.citation_aligner).
+
+    python -m pytest src/test_citation_aligner.py
+"""
+import numpy as np
+
+from ba_bot.citation_aligner import CitationAligner
+
+CONTEXTS = [
+    {"chunk_id": "ba_lr_002", "text": "Powders over 350g in hand baggage may need extra screening at security."},
+    {"chunk_id": "ba_lr_010", "text": "Liquid medicines over 100ml need a prescription or doctor's letter."},
+]
+
+ANSWER = (
+    "Powders over 350g may need extra screening at security.\n"
+    "- Medicines over 100ml need a doctor's letter. [ba_lr_010]\n"
+    "Paris has lovely weather every spring season."
+)
+
+
+def test_lexical_cites_supported_and_flags_unsupported():
+    out, report = CitationAligner().align(ANSWER, CONTEXTS)
+    assert "security [ba_lr_002]." in out
+    # Already cited sentence is left as is
+    assert out.count("[ba_lr_010]") == 1
+    assert [(r["supported"], r["chunk_ids"]) for r in report] == [(True, ["ba_lr_002"]), (False, [])]
+    assert "Paris has lovely weather every spring season." in out
+
+
+def test_citation_after_punctuation_counts_as_cited():
+    answer = "Powders over 350g may need extra screening. [ba_lr_002]"
+    assert CitationAligner().align(answer, CONTEXTS) == (answer, [])
+
+
+def test_embedding_scores_use_stored_chunk_vectors():
+    vecs = {"ba_lr_002": [1.0, 0.0], "ba_lr_010": [0.0, 1.0]}
+
+    def encoder(texts):
+        return np.array([[0.0, 1.0] if "medicine" in t.lower() else [0.6, 0.8] for t in texts], dtype="float32")
+
+    aligner = CitationAligner(
+        encoder=encoder,
+        chunk_vectors=lambda ids: np.array([vecs[i] for i in ids], dtype="float32"),
+        threshold=0.5,
+    )
+    out, report = aligner.align("Liquid medicine rules apply to larger bottles.", CONTEXTS)
+    assert out == "Liquid medicine rules apply to larger bottles [ba_lr_010]."
+    assert report[0]["method"] == "embedding"
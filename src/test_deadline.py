@@ -0,0 +1,39 @@
+"""
+Per-turn latency budget and stage estimates (ba_bot.deadline).
+
+    python -m pytest src/test_deadline.py
+"""
+import math
+import time
+
+from ba_bot.deadline import Deadline, StageEstimates
+
+
+def test_no_budget_is_unbounded():
+    for budget in (None, 0, -1):
+        d = Deadline(budget)
+        assert d.remaining() == math.inf and d.timeout() is None
+        assert d.allows(1e9) and not d.expired()
+
+
+def test_budget_draws_down_and_keeps_reserve():
+    d = Deadline(10.0)
+    assert d.allows(9.0) and not d.allows(11.0)
+    assert 6.0 < d.timeout(reserve=3.0) <= 7.0
+    assert d.timeout(reserve=20.0) == 0.0
+
+
+def test_used_up_budget_allows_nothing():
+    d = Deadline(0.001)
+    time.sleep(0.005)
+    assert d.expired() and d.remaining() == 0.0 and d.timeout() == 0.0
+    assert not d.allows(0.0)
+
+
+def test_stage_estimates_are_an_ema():
+    est = StageEstimates(alpha=0.5, defaults={"draft": 8.0})
+    assert est.get("draft") == 8.0 and est.get("unknown") == 0.0
+    est.observe("draft", 2.0)
+    assert est.get("draft") == 5.0
+    est.observe("plan", 1.0)  # first observation of a stage is taken as is
+    assert est.snapshot() == {"draft": 5.0, "plan": 1.0}
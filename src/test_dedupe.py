@@ -0,0 +1,74 @@
+"""
+Near-duplicate chunk detection (ba_bot.dedupe).
+
+    python -m pytest src/test_dedupe.py
+"""
+import json
+from pathlib import Path
+
+from ba_bot.dedupe import jaccard, near_duplicate_groups, shingles
+
+CHUNKS_PATH = Path(__file__).resolve().parents[1] / "data" / "chunks.jsonl"
+
+BOILERPLATE = (
+    "Please check with the UK Civil Aviation Authority (CAA) and the US Transport "
+    "Security Administration (TSA) before you travel, as rules at your departure "
+    "airport may differ from ours and local security staff make the final decision "
+    "on whether an item can be carried through the checkpoint."
+)
+
+TEXTS = [
+    "Liquids in hand baggage must be in containers of 100ml or less. " + BOILERPLATE,
+    "Golf clubs can be checked in as part of your baggage allowance if packed in a golf bag.",
+    "Liquids in hand baggage must be in containers of 100ml or less! " + BOILERPLATE + " Thanks.",
+    "Bicycles must be packed in a bike box with the pedals removed and tyres deflated.",
+    BOILERPLATE,
+]
+
+
+def test_near_duplicates_cluster_under_the_first_chunk():
+    assert jaccard(shingles(TEXTS[0]), shingles(TEXTS[2])) > 0.8
+    assert near_duplicate_groups(TEXTS, threshold=0.8) == [[0, 2]]
+
+
+def test_lower_threshold_folds_contained_boilerplate():
+    # The bare boilerplate shares most shingles with the two long versions.
+    groups = near_duplicate_groups(TEXTS, threshold=0.6)
+    assert groups == [[0, 2, 4]]
+    assert near_duplicate_groups(TEXTS, threshold=1.01) == []
+
+
+def test_groups_keep_sections_apart_and_skip_adjacent_windows():
+    texts = [TEXTS[0], TEXTS[2], TEXTS[1], TEXTS[0] + " See also."]
+    # 0 and 1 are consecutive windows of one section: overlapping, not duplicates.
+    assert near_duplicate_groups(texts, groups=["liquids", "liquids", "golf", "liquids"]) == [[0, 3]]
+    # Same text under another section stays: section-filtered search needs it.
+    assert near_duplicate_groups(texts, groups=["liquids", "liquids", "golf", "medicines"]) == []
+
+
+# The closing notice repeated across many sections of the source document.
+SAFETY_NOTICE = (
+    "If you require additional information regarding your item, or you require approval to bring "
+    "your item on a flight, please contact our Safety Team. Please allow two UK working days for a "
+    "reply and remember to supply us with your booking reference."
+)
+
+
+def test_cross_section_boilerplate_folds_only_at_the_stricter_threshold():
+    chunks = {c["chunk_id"]: c for c in map(json.loads, CHUNKS_PATH.read_text(encoding="utf-8").splitlines())}
+    chemicals, cases = chunks["ba_lr_081"], chunks["ba_lr_086"]
+    assert SAFETY_NOTICE in chemicals["text"] and SAFETY_NOTICE in cases["text"]
+    assert chemicals["section"] != cases["section"]
+
+    texts = [
+        chemicals["text"],
+        cases["text"],
+        SAFETY_NOTICE,  # the notice on its own, as a section's last window
+        SAFETY_NOTICE.replace(", or", " or").replace(".", ".\n"),  # same notice, reformatted
+    ]
+    groups = [chemicals["section"], cases["section"], "Tools", "Flammable items"]
+    # Same notice, different sections: folded.
+    assert near_duplicate_groups(texts, groups=groups, cross_threshold=0.9) == [[2, 3]]
+    # Sharing the notice isn't enough: each section keeps its own rule.
+    assert near_duplicate_groups(texts[:2], groups=groups[:2], cross_threshold=0.9) == []
+    assert near_duplicate_groups(texts, groups=groups) == []  # cross-section off
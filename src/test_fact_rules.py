@@ -0,0 +1,79 @@
+"""
+Single-pass fact and context-only rules (ba_bot.fact_rules) against the
+naive one-regex-per-rule extraction they replaced.
+
+    python -m pytest src/test_fact_rules.py
+"""
+import json
+import re
+
+import pytest
+
+from ba_bot.fact_rules import RULES_PATH, FactRuleEngine
+
+SPEC = json.loads(RULES_PATH.read_text(encoding="utf-8"))
+ENGINE = FactRuleEngine()
+
+MESSAGES = [
+    "",
+    "Can I take powder in hand baggage?",
+    # Overlapping rules: place and country from the same words
+    "I'm flying from Australia",
+    "flying from australia to america.",
+    "I am flying to the United States, flying from Sydney and then home",
+    # Several facts in one message
+    "I'm pregnant and flying to New York with my golf clubs and CPAP.",
+    "Can I bring my medication and a surfboard on a flight to the US?",
+    "Traveling from Australia with skis; my partner is pregnant. Flying to Boston.",
+    "route: Australia -> America",
+    "I have a medical oxygen concentrator",
+    "I am carrying dialysis fluid, travelling from Perth to USA",
+    # Near misses
+    "Australian medicines? A bikes shop? Skiing in America?",
+    "Is scuba diving gear allowed? Flying from.",
+]
+
+
+def naive_scan(text):
+    """The pre-engine behaviour: each rule searched on its own, one rule per fact."""
+    facts = {}
+    for rule in SPEC["facts"]:
+        m = re.search(rule["pattern"], text, flags=re.IGNORECASE)
+        if m is None or rule["fact"] in facts:
+            continue
+        if "value" in rule:
+            facts[rule["fact"]] = rule["value"]
+        elif m.group("value").strip():
+            facts[rule["fact"]] = m.group("value").strip()
+    context_only = any(re.search(p, text, flags=re.IGNORECASE) for p in SPEC["context_only"])
+    return facts, context_only
+
+
+@pytest.mark.parametrize("text", MESSAGES)
+def test_single_pass_matches_per_rule_search(text):
+    assert ENGINE.scan(text) == naive_scan(text)
+
+
+def test_overlapping_and_multi_fact_messages():
+    facts, context_only = ENGINE.scan("flying from australia to america.")
+    assert facts == {
+        "departure_place": "australia to america",
+        "departure_country": "Australia",
+        "destination_country": "USA",
+    }
+    assert not context_only
+    facts, context_only = ENGINE.scan("I'm pregnant and flying to New York with my golf clubs and CPAP.")
+    assert facts == {
+        "destination_place": "New York with my golf clubs",
+        "traveller_pregnant": True,
+        "topic_sports_equipment": True,
+        "topic_medical": True,
+    }
+    assert context_only
+
+
+def test_bad_rule_is_reported_on_its_own(tmp_path):
+    path = tmp_path / "rules.json"
+    path.write_text(json.dumps({"facts": [{"fact": "x", "value": 1, "pattern": "(unclosed"}]}), encoding="utf-8")
+    with pytest.raises(ValueError, match="Invalid fact rule #0"):
+        FactRuleEngine(path)
@@ -0,0 +1,144 @@
+"""
+Versioned index snapshots (ba_bot.index_store) and Retriever hot reload.
+
+    python -m pytest src/test_index_versions.py
+"""
+import json
+import time
+
+import numpy as np
+import pytest
+
+from ba_bot.index_store import (
+    UNVERSIONED, new_version_dir, prune, publish, read_current, resolve, write_manifest,
+)
+
+faiss = pytest.importorskip("faiss")
+
+
+def write_version(index_dir, n_chunks, tag, dim=8):
+    version, out = new_version_dir(index_dir, tag * 8)
+    rng = np.random.default_rng(n_chunks)
+    emb = rng.standard_normal((n_chunks, dim)).astype("float32")
+    emb /= np.linalg.norm(emb, axis=1, keepdims=True)
+    index = faiss.IndexFlatIP(dim)
+    index.add(emb)
+    faiss.write_index(index, str(out / "faiss.index"))
+    chunks = [{"chunk_id": f"{tag}_{i:03d}", "section": "S", "text": f"chunk {i}"} for i in range(n_chunks)]
+    (out / "chunk_meta.json").write_text(json.dumps(chunks), encoding="utf-8")
+    write_manifest(out, {"version": version, "chunks": n_chunks})
+    return version
+
+
+def test_publish_switches_current_and_prune_keeps_it(tmp_path):
+    assert resolve(tmp_path) == (UNVERSIONED, tmp_path)
+
+    versions = [write_version(tmp_path, 4, t) for t in "abc"]
+    assert len(set(versions)) == 3
+    publish(tmp_path, versions[0])
+    assert read_current(tmp_path) == versions[0]
+
+    removed = prune(tmp_path, keep=1)
+    # newest is kept by age, the published one is never removed
+    assert versions[0] not in removed and versions[2] not in removed
+    assert versions[1] in removed
+
+
+def test_unfinished_version_cannot_be_published(tmp_path):
+    version, _ = new_version_dir(tmp_path, "deadbeef")
+    with pytest.raises(RuntimeError):
+        publish(tmp_path, version)
+    assert read_current(tmp_path) is None
+
+
+def test_retriever_hot_reloads_new_version(tmp_path):
+    pytest.importorskip("sentence_transformers")
+    from ba_bot.retriever import Retriever
+
+    # The default model embeds to 384 dims.
+    publish(tmp_path, write_version(tmp_path, 5, "a", dim=384))
+    r = Retriever(index_dir=tmp_path, watch_interval_s=0.05)
+    old = r.snapshot
+    assert len(r.chunks) == 5
+
+    v2 = write_version(tmp_path, 7, "b", dim=384)
+    publish(tmp_path, v2)
+    for _ in range(100):
+        if r.version == v2:
+            break
+        time.sleep(0.02)
+    r.close()
+
+    assert r.version == v2 and len(r.chunks) == 7 and r.reloads == 1
+    # A search that grabbed the old snapshot still sees consistent old data.
+    assert len(old.chunks) == 5 and old.index.ntotal == 5
+
+
+def test_sharded_search_matches_single_index(tmp_path):
+    from concurrent.futures import ThreadPoolExecutor
+    from ba_bot.retriever import IndexSnapshot, ShardedSnapshot
+
+    rng = np.random.default_rng(0)
+    emb = rng.standard_normal((40, 8)).astype("float32")
+    chunks = [
+        {"chunk_id": f"c_{i:03d}", "section": f"S{i % 5}", "source": "ba", "text": str(i)}
+        for i in range(40)
+    ]
+
+    def write(d, rows):
+        d.mkdir(parents=True)
+        index = faiss.IndexFlatIP(8)
+        index.add(emb[rows])
+        faiss.write_index(index, str(d / "faiss.index"))
+        (d / "chunk_meta.json").write_text(json.dumps([chunks[r] for r in rows]), encoding="utf-8")
+
+    write(tmp_path / "single", list(range(40)))
+    shards = [list(range(i, 40, 3)) for i in range(3)]
+    for n, rows in enumerate(shards):
+        write(tmp_path / "v" / "shards" / f"shard_{n:03d}", rows)
+    (tmp_path / "v" / "chunk_shards.json").write_text(
+        json.dumps({chunks[r]["chunk_id"]: f"shard_{n:03d}" for n, rows in enumerate(shards) for r in rows})
+    )
+    manifest = {"dim": 8, "shards": [
+        {"name": f"shard_{n:03d}", "chunks": len(rows),
+         "partition_values": {"section": sorted({chunks[r]["section"] for r in rows}), "source": ["ba"]}}
+        for n, rows in enumerate(shards)
+    ]}
+
+    single = IndexSnapshot(faiss, "v", tmp_path / "single" / "faiss.index", tmp_path / "single" / "chunk_meta.json")
+    with ThreadPoolExecutor(4) as pool:
+        sharded = ShardedSnapshot(faiss, "v", tmp_path / "v", manifest, pool)
+        assert not any(s["loaded"] for s in sharded.shard_stats())
+
+        q = rng.standard_normal((3, 8)).astype("float32")
+        for filters in (None, {"section": ["S1", "S3"]}):
+            want = [[h["chunk_id"] for h in row] for row in single.search_vectors(q, 6, filters)]
+            got = [[h["chunk_id"] for h in row] for row in sharded.search_vectors(q, 6, filters)]
+            assert got == want
+
+        assert sharded.get_chunk("c_007")["text"] == "7"
+        assert all(s["latency"]["count"] == 2 for s in sharded.shard_stats())
+
+
+def test_alias_ids_and_sections_resolve_to_the_kept_chunk(tmp_path):
+    from ba_bot.retriever import IndexSnapshot
+
+    emb = np.eye(2, dtype="float32")
+    chunks = [
+        {"chunk_id": "ba_lr_040", "section": "Tools", "source": "ba", "text": "Safety Team notice",
+         "aliases": [{"chunk_id": "ba_lr_090", "section": "Flammable items", "source": "ba"}]},
+        {"chunk_id": "ba_lr_041", "section": "Tools", "source": "ba", "text": "Tools over 6cm"},
+    ]
+    index = faiss.IndexFlatIP(2)
+    index.add(emb)
+    faiss.write_index(index, str(tmp_path / "faiss.index"))
+    (tmp_path / "chunk_meta.json").write_text(json.dumps(chunks), encoding="utf-8")
+
+    snap = IndexSnapshot(faiss, "v", tmp_path / "faiss.index", tmp_path / "chunk_meta.json")
+    # A citation of the folded chunk still finds the text it was folded into.
+    assert snap.get_chunk("ba_lr_090")["chunk_id"] == "ba_lr_040"
+    np.testing.assert_array_equal(snap.chunk_vector("ba_lr_090"), emb[0])
+    # ...and a search restricted to its section still finds that text.
+    assert snap.partition_values("section") == ["Flammable items", "Tools"]
+    hits = snap.search_vectors(emb[1:], 5, {"section": ["Flammable items"]})[0]
+    assert [h["chunk_id"] for h in hits] == ["ba_lr_040"]
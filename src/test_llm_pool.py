@@ -0,0 +1,231 @@
+"""
+LLMClient backend pool against local stub Ollama servers.
+
+    python -m pytest src/test_llm_pool.py
+"""
+import json
+import socket
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from ba_bot.llm_client import LLMClient, LLMTimeout
+from ba_bot.planner_agent import PlannerAgent
+
+
+class StubOllama:
+    """Minimal /api/chat + /api/tags server. mode: 'ok' | 'error'; `missing` models get a 404."""
+
+    def __init__(self, name: str, delay: float = 0.0, mode: str = "ok", missing=()):
+        self.name, self.delay, self.mode = name, delay, mode
+        self.missing = set(missing)
+        self.hits = 0
+        self.last_body = None
+        stub = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                pass
+
+            def _send(self, status, payload):
+                data = json.dumps(payload).encode()
+                self.send_response(status)
+                self.send_header("Content-Type", "application/json")
+                self.send_header("Content-Length", str(len(data)))
+                self.end_headers()
+                self.wfile.write(data)
+
+            def do_GET(self):
+                self._send(200, {"models": []})
+
+            def do_POST(self):
+                stub.last_body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                stub.hits += 1
+                if stub.mode == "error":
+                    return self._send(500, {"error": "stub failure"})
+                if stub.last_body.get("model") in stub.missing:
+                    return self._send(404, {"error": f"model '{stub.last_body['model']}' not found"})
+                time.sleep(stub.delay)
+                self._send(200, {
+                    "model": "stub",
+                    "created_at": "2025-01-01T00:00:00Z",
+                    "message": {"role": "assistant", "content": f"answer from {stub.name}"},
+                    "done": True,
+                })
+
+        self.server = ThreadingHTTPServer(("127.0.0.1", 0), Handler)
+        self.host = f"http://127.0.0.1:{self.server.server_address[1]}"
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def stop(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+
+def test_routes_to_least_loaded_backend():
+    fast, slow = StubOllama("fast"), StubOllama("slow", delay=0.3)
+    llm = LLMClient(model="stub", hosts=[fast.host, slow.host])
+    with ThreadPoolExecutor(max_workers=4) as pool:
+        list(pool.map(lambda _: llm.chat("sys", "hi"), range(24)))
+    assert fast.hits > slow.hits
+    fast.stop(), slow.stop()
+
+
+def test_fails_over_and_ejects_broken_backend():
+    good, bad = StubOllama("good"), StubOllama("bad", mode="error")
+    llm = LLMClient(model="stub", hosts=[bad.host, good.host], failure_threshold=1, cooldown_s=60)
+    answers = [llm.chat("sys", "hi") for _ in range(6)]
+    assert all(a == "answer from good" for a in answers)
+    # Ejected after its first failure; no more traffic while the circuit is open.
+    assert bad.hits == 1
+    assert {s["host"]: s["circuit"] for s in llm.backend_stats()}[bad.host] == "open"
+    good.stop(), bad.stop()
+
+
+def test_retries_are_bounded():
+    stubs = [StubOllama(f"bad{i}", mode="error") for i in range(3)]
+    llm = LLMClient(model="stub", hosts=[s.host for s in stubs], max_retries=1)
+    try:
+        llm.chat("sys", "hi")
+        raise AssertionError("expected RuntimeError")
+    except RuntimeError:
+        pass
+    assert sum(s.hits for s in stubs) == 2
+    for s in stubs:
+        s.stop()
+
+
+def test_health_check_ejects_dead_backend():
+    alive, dead = StubOllama("alive"), StubOllama("dead")
+    dead.stop()
+    llm = LLMClient(model="stub", hosts=[alive.host, dead.host])
+    assert llm.check_health() == {alive.host: True, dead.host: False}
+    assert llm.chat("sys", "hi") == "answer from alive"
+    alive.stop()
+
+
+def test_timeout_is_not_retried():
+    slow = StubOllama("slow", delay=1.0)
+    llm = LLMClient(model="stub", hosts=[slow.host])
+    t0 = time.monotonic()
+    try:
+        llm.chat("sys", "hi", timeout=0.2)
+        raise AssertionError("expected LLMTimeout")
+    except LLMTimeout:
+        pass
+    assert time.monotonic() - t0 < 0.9
+    slow.stop()
+
+
+def blackhole():
+    """A listening socket that never accepts, with its backlog full: connects hang."""
+    srv = socket.socket()
+    srv.bind(("127.0.0.1", 0))
+    srv.listen(0)
+    port = srv.getsockname()[1]
+    fillers = []
+    for _ in range(3):
+        c = socket.socket()
+        c.setblocking(False)
+        try:
+            c.connect(("127.0.0.1", port))
+        except BlockingIOError:
+            pass
+        fillers.append(c)
+    return f"http://127.0.0.1:{port}", [srv] + fillers
+
+
+def test_connect_timeout_fails_over_and_ejects_backend():
+    dead_host, socks = blackhole()
+    good = StubOllama("good")
+    llm = LLMClient(model="stub", hosts=[dead_host, good.host], timeout=1, failure_threshold=1)
+    # Ties go to the first backend, so the unreachable one is tried first.
+    assert llm.chat("sys", "hi") == "answer from good"
+    dead = llm.backend_stats()[0]
+    assert dead["circuit"] == "open" and dead["failures"] == 1
+    t0 = time.monotonic()
+    assert llm.chat("sys", "hi") == "answer from good"
+    assert time.monotonic() - t0 < 0.5  # ejected: not waited on again
+    good.stop()
+    for sock in socks:
+        sock.close()
+
+
+def test_per_call_timeout_clients_are_closed():
+    stub = StubOllama("s")
+    llm = LLMClient(model="stub", hosts=[stub.host])
+    backend = llm.backends[0]
+    real, opened = backend.ollama, []
+
+    class RecordingOllama:
+        def Client(self, **kw):
+            opened.append(real.Client(**kw))
+            return opened[-1]
+
+    backend.ollama = RecordingOllama()
+    llm.chat("sys", "hi", timeout=5.0)
+    llm.check_health()
+    assert len(opened) == 2 and all(c._client.is_closed for c in opened)
+    llm.chat("sys", "hi")  # no per-call timeout: the shared client, kept open
+    assert len(opened) == 2 and not backend.client._client.is_closed
+    stub.stop()
+
+
+def test_schema_and_num_predict_are_sent():
+    stub = StubOllama("s")
+    llm = LLMClient(model="stub", hosts=[stub.host])
+    schema = {"type": "object", "properties": {"subqueries": {"type": "array"}}}
+    llm.chat("sys", "hi", format=schema, num_predict=64)
+    assert stub.last_body["format"] == schema
+    assert stub.last_body["options"]["num_predict"] == 64
+    llm.chat("sys", "hi")
+    assert "format" not in stub.last_body and "num_predict" not in stub.last_body["options"]
+    stub.stop()
+
+
+def test_role_routes_set_model_temperature_and_cap():
+    stub = StubOllama("s")
+    routes = {"planner": {"model": "small", "temperature": 0.0, "num_predict": 32}}
+    llm = LLMClient(model="stub", hosts=[stub.host], routes=routes)
+    llm.chat("sys", "hi", role="planner")
+    assert stub.last_body["model"] == "small"
+    assert stub.last_body["options"] == {"temperature": 0.0, "num_predict": 32}
+    llm.chat("sys", "hi", num_predict=64, role="draft")  # no route: client defaults
+    assert stub.last_body["model"] == "stub" and stub.last_body["options"]["num_predict"] == 64
+    assert set(llm.role_stats()) == {"planner", "draft"}
+    stub.stop()
+
+
+def test_explicit_cap_overrides_route_cap():
+    stub = StubOllama("s")
+    llm = LLMClient(model="stub", hosts=[stub.host], routes={"planner": {"num_predict": 32}})
+    llm.chat("sys", "hi", num_predict=64, role="planner")
+    assert stub.last_body["options"]["num_predict"] == 64
+    llm.chat("sys", "hi", role="planner")
+    assert stub.last_body["options"]["num_predict"] == 32
+    # Planner and evaluator pass no cap of their own by default, so the route's applies.
+    PlannerAgent(llm).plan("Can I bring a knife?")
+    assert stub.last_body["options"]["num_predict"] == 32
+    stub.stop()
+
+
+def test_missing_routed_model_falls_back_to_default():
+    stub = StubOllama("s", missing={"small"})
+    llm = LLMClient(model="stub", hosts=[stub.host], routes={"planner": {"model": "small"}}, failure_threshold=1)
+    assert llm.chat("sys", "hi", role="planner") == "answer from s"
+    assert stub.hits == 2  # 404 for "small", then the default model
+    # Not retried during the cooldown, and the backend itself was not ejected.
+    llm.chat("sys", "hi", role="planner")
+    assert stub.hits == 3 and stub.last_body["model"] == "stub"
+    assert llm.backend_stats()[0]["circuit"] == "closed"
+    stats = llm.role_stats()["planner"]
+    assert stats["model"] == "small" and not stats["available"] and stats["fallbacks"] == 1
+    stub.stop()
+
+
+if __name__ == "__main__":
+    for name, fn in list(globals().items()):
+        if name.startswith("test_"):
+            fn()
+            print("ok", name)
@@ -0,0 +1,47 @@
+"""
+LLM-free query planning (ba_bot.query_expander).
+
+    python -m pytest src/test_query_expander.py
+"""
+from ba_bot.query_expander import QueryExpander
+
+HITS = [
+    {"chunk_id": "ba_lr_003", "section": "Hand baggage requirements for liquids and powders",
+     "text": "Powders over 350g such as protein powder or coffee need extra screening. Powders go in checked baggage."},
+    {"chunk_id": "ba_lr_020", "section": "= Infant milk and baby food =",
+     "text": "Baby food and infant milk powder are exempt in reasonable quantities."},
+]
+
+IDF = {"powder": 2.5, "protein": 4.0, "screening": 3.5, "infant": 3.8, "exempt": 4.2,
+       "baggage": 0.9, "checked": 1.0, "hand": 1.3}
+
+
+class StubRetriever:
+    def __init__(self):
+        self.queries = []
+
+    def search(self, query, k=5):
+        self.queries.append(query)
+        return HITS[:k]
+
+
+def test_plan_mines_headings_and_salient_terms():
+    retriever = StubRetriever()
+    sq = QueryExpander(retriever, idf=IDF, max_subqueries=6).plan("Can I take protein powder in hand baggage?")
+
+    assert retriever.queries == ["Can I take protein powder in hand baggage?"]  # one first-pass search
+    assert sq[0] == "Can I take protein powder in hand baggage?"
+    assert "Infant milk and baby food: protein powder hand baggage" in sq  # '=' decoration stripped
+    expansions = " ".join(sq[3:]).split()
+    assert "screening" in expansions and "exempt" in expansions
+    assert "checked" not in expansions  # common in the corpus: no help to a query
+    assert len({q.lower() for q in sq}) == len(sq)
+
+
+def test_plan_without_hits_falls_back_to_question():
+    class Empty:
+        def search(self, query, k=5):
+            return []
+
+    assert QueryExpander(Empty(), idf=IDF).plan("  Can I take  powder? ") == ["Can I take powder?"]
+    assert QueryExpander.uses_llm is False
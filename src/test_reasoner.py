@@ -0,0 +1,66 @@
+"""
+Extractive answers (ba_bot.reasoner_agent) and the precomputed term index
+ingest.py stores for them (ba_bot.text_utils).
+
+    python -m pytest src/test_reasoner.py
+"""
+import os
+import subprocess
+import sys
+from pathlib import Path
+
+from ba_bot.reasoner_agent import ReasonerAgent
+from ba_bot.text_utils import sentence_spans, term_index
+
+TEXT = (
+    "Liquids must be in containers of 100ml or less. "
+    "Powders over 350g may need extra screening at security. "
+    "Medicines over 100ml need a doctor's letter."
+)
+
+
+def chunk(cid: str, text: str, precomputed: bool = True):
+    c = {"chunk_id": cid, "text": text}
+    if precomputed:
+        spans = sentence_spans(text)
+        c.update({"sentences": spans, "terms": term_index(text, spans)})
+    return c
+
+
+def test_term_index_keeps_first_occurrence_order():
+    spans = sentence_spans("Powders and liquids. Liquids, gels and powders.")
+    assert list(term_index("Powders and liquids. Liquids, gels and powders.", spans)) == ["powder", "liquid", "gel"]
+
+
+def test_term_index_is_independent_of_hash_seed():
+    code = (
+        "import json; from ba_bot.text_utils import sentence_spans, term_index; "
+        f"t = {TEXT!r}; print(json.dumps(term_index(t, sentence_spans(t))))"
+    )
+    src = str(Path(__file__).resolve().parent)
+    outs = {
+        subprocess.run(
+            [sys.executable, "-c", code], capture_output=True, text=True, check=True,
+            env={**os.environ, "PYTHONHASHSEED": seed, "PYTHONPATH": src},
+        ).stdout
+        for seed in ("1", "2", "3")
+    }
+    assert len(outs) == 1
+
+
+def test_snippets_same_with_and_without_precomputed_index():
+    r = ReasonerAgent()
+    weights = r.query_terms("Can I take powder in hand baggage?", {})
+    with_index = r.pick_best_snippets(chunk("a", TEXT), weights)
+    on_the_fly = r.pick_best_snippets(chunk("a", TEXT, precomputed=False), weights)
+    assert with_index == on_the_fly
+    assert with_index[0] == "Powders over 350g may need extra screening at security."
+
+
+def test_draft_cites_each_context():
+    r = ReasonerAgent()
+    contexts = [chunk("ba_lr_003", TEXT), chunk("ba_lr_010", "Medicines over 100ml need a doctor's letter.")]
+    out = r.draft("Can I bring medicines over 100ml?", contexts)
+    assert "- Medicines over 100ml need a doctor's letter. [ba_lr_010]" in out
+    assert "[ba_lr_003]" in out and "**Citations:** [ba_lr_003], [ba_lr_010]" in out
+    assert "couldn't find" in r.draft("anything", [])
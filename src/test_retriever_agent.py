@@ -0,0 +1,87 @@
+"""
+Topic partitions in RetrieverAgent (ba_bot.retriever_agent).
+
+    python -m pytest src/test_retriever_agent.py
+"""
+from ba_bot.fact_extractor_agent import FactExtractorAgent
+from ba_bot.memory import MemoryStore
+from ba_bot.retriever_agent import RetrieverAgent
+from ba_bot.text_utils import terms
+
+CHUNKS = [
+    {"chunk_id": "ba_lr_010", "section": "Travelling with medicines and medical supplies",
+     "text": "Medication and liquid medicines over 100ml need a doctor's letter."},
+    {"chunk_id": "ba_lr_011", "section": "Medical equipment",
+     "text": "Portable oxygen concentrators must be approved before travel."},
+    {"chunk_id": "ba_lr_012", "section": "Hand baggage requirements for liquids and powders",
+     "text": "Liquids in hand baggage must be in containers of 100ml or less."},
+    {"chunk_id": "ba_lr_083", "section": "Sharp objects",
+     "text": "A knife with a blade longer than 6cm must go in checked baggage."},
+]
+
+
+class StubRetriever:
+    """Scores chunks by term overlap with the query; supports section filters."""
+
+    def partition_values(self, field):
+        return sorted({c[field] for c in CHUNKS})
+
+    def search(self, query, k=5, filters=None):
+        q = set(terms(query))
+        hits = []
+        for c in CHUNKS:
+            if filters and c["section"] not in filters.get("section", []):
+                continue
+            score = len(q & set(terms(c["text"]))) / (len(q) or 1)
+            hits.append({**c, "score": score})
+        hits.sort(key=lambda h: h["score"], reverse=True)
+        return hits[:k]
+
+
+def test_topic_switch_within_a_session_reaches_other_sections():
+    memory = MemoryStore(session_id="t_topic_switch", persist=False)
+    facts, _ = FactExtractorAgent().extract("I need to bring my medication")
+    memory.set_facts(facts)
+    assert memory.get_facts().get("topic_medical")
+
+    agent = RetrieverAgent(top_k=2, retriever=StubRetriever())
+    assert agent.partitions_for(memory.get_facts())  # topic is still set
+
+    # Medical question: the topic sections come first.
+    hits = agent.retrieve(["medication over 100ml"], facts=memory.get_facts())
+    assert hits[0]["chunk_id"] == "ba_lr_010"
+
+    # Later question on another topic: the sticky medical fact must not hide it.
+    hits = agent.retrieve(["Can I bring a knife?"], facts=memory.get_facts())
+    assert hits[0]["chunk_id"] == "ba_lr_083"
+    assert hits[0]["section"] == "Sharp objects"
+
+
+class VectorStubRetriever(StubRetriever):
+    """Adds encode()/search_vectors(); the "vector" is the query itself."""
+
+    def __init__(self):
+        self.encoded = []
+
+    def encode(self, queries):
+        self.encoded.extend(queries)
+        return list(queries)
+
+    def search_vectors(self, vecs, k=5, filters=None):
+        return [StubRetriever.search(self, v, k, filters) for v in vecs]
+
+    def search(self, query, k=5, filters=None):
+        raise AssertionError("topic search should reuse the query encoding")
+
+
+def test_topic_boost_encodes_once_and_keeps_scores():
+    retriever = VectorStubRetriever()
+    agent = RetrieverAgent(top_k=2, retriever=retriever, partition_boost=0.5)
+    hits = agent.retrieve(["liquid medication 100ml"], facts={"topic_medical": True})
+    assert retriever.encoded == ["liquid medication 100ml"]
+    assert [h["chunk_id"] for h in hits] == ["ba_lr_010", "ba_lr_012"]
+    # Both come from topic sections and were ranked boosted; the reported
+    # scores are still the retriever's own.
+    q = set(terms("liquid medication 100ml"))
+    for h in hits:
+        assert h["score"] == len(q & set(terms(h["text"]))) / len(q)
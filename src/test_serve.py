@@ -0,0 +1,129 @@
+"""
+HTTP answer service routing (serve.AnswerService) with a stub Retriever and
+LLM.
+
+    python -m pytest src/test_serve.py
+"""
+import asyncio
+import json
+
+import numpy as np
+import pytest
+
+from ba_bot import memory
+from serve import AnswerService
+
+CHUNK = {
+    "chunk_id": "ba_lr_012", "score": 0.9,
+    "section": "Hand baggage requirements for liquids and powders",
+    "text": "Liquids in hand baggage must be in containers of 100ml or less.",
+}
+
+
+class StubRetriever:
+    version = "v_test"
+
+    def encode(self, queries):
+        return np.zeros((len(queries), 1), dtype="float32")
+
+    def search_vectors(self, vecs, k, filters=None):
+        return [[dict(CHUNK)] for _ in vecs]
+
+    def partition_values(self, field):
+        return [CHUNK["section"]]
+
+    def index_info(self):
+        return {"version": self.version}
+
+
+class StubLLM:
+    usage = {}
+
+    def backend_stats(self):
+        return []
+
+    def role_stats(self):
+        return {}
+
+    def close(self):
+        pass
+
+
+@pytest.fixture(autouse=True)
+def session_dir(tmp_path, monkeypatch):
+    # AnswerService opens persisted sessions; keep them out of data/memory.
+    monkeypatch.setattr(memory, "MEM_DIR", tmp_path)
+    return tmp_path
+
+
+def service(**kw):
+    return AnswerService(StubRetriever(), StubLLM(), **kw)
+
+
+def dispatch(svc, method, path, body=b""):
+    return asyncio.run(svc.dispatch(method, path, body))
+
+
+def test_dispatch_routes_and_rejects():
+    svc = service()
+    try:
+        assert dispatch(svc, "GET", "/health") == (200, {"status": "ok"})
+        assert dispatch(svc, "GET", "/nope")[0] == 404
+        assert dispatch(svc, "GET", "/ask")[0] == 405
+        assert dispatch(svc, "POST", "/ask", b"[1, 2]")[0] == 400
+        assert dispatch(svc, "POST", "/search", b"{}")[0] == 400
+        assert dispatch(svc, "POST", "/ask", b'{"question": "hi", "session_id": "../x"}')[0] == 400
+
+        status, out = dispatch(svc, "POST", "/search", json.dumps({"query": "liquids", "k": 3}).encode())
+        assert status == 200 and out["index_version"] == "v_test"
+        assert [h["chunk_id"] for h in out["hits"]] == ["ba_lr_012"]
+
+        body = {"question": "Can I bring liquids?", "session_id": "t_serve", "mode": "extractive"}
+        status, out = dispatch(svc, "POST", "/ask", json.dumps(body).encode())
+        assert status == 200 and out["mode"] == "extractive"
+        assert out["citations"] == ["ba_lr_012"] and "[ba_lr_012]" in out["answer"]
+
+        svc.max_inflight = 0
+        assert dispatch(svc, "POST", "/search", b'{"query": "liquids"}')[0] == 503
+        stats = dispatch(svc, "GET", "/stats")[1]
+        assert stats["rejected"] == 1 and stats["routes"]["/search"]["count"] >= 1
+    finally:
+        svc.close()
+
+
+def test_malformed_content_length_is_a_bad_request():
+    svc = service()
+
+    async def roundtrip(header: bytes) -> bytes:
+        server = await asyncio.start_server(svc.handle_connection, "127.0.0.1", 0)
+        port = server.sockets[0].getsockname()[1]
+        reader, writer = await asyncio.open_connection("127.0.0.1", port)
+        writer.write(b"POST /search HTTP/1.1\r\n" + header + b"\r\n")
+        await writer.drain()
+        data = await reader.read()
+        writer.close()
+        server.close()
+        await server.wait_closed()
+        return data
+
+    try:
+        for header in (b"Content-Length: abc\r\n", b"Content-Length: -5\r\n"):
+            assert asyncio.run(roundtrip(header)).startswith(b"HTTP/1.1 400 ")
+    finally:
+        svc.close()
+
+
+def test_sessions_are_bounded_lru():
+    svc = service(max_sessions=2)
+    try:
+        svc._session("t_a"), svc._session("t_b")
+        svc._session("t_a")  # now most recent
+        svc._session("t_c")
+        assert list(svc._sessions) == ["t_a", "t_c"]
+
+        _, lock = svc._session("t_a")
+        with lock:  # a turn is running: t_a stays open
+            svc._session("t_d")
+        assert list(svc._sessions) == ["t_a", "t_d"]
+    finally:
+        svc.close()
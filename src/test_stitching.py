@@ -0,0 +1,52 @@
+"""
+Adjacent-chunk stitching (ba_bot.stitching).
+
+    python -m pytest src/test_stitching.py
+"""
+from ba_bot.prompts import build_context_block
+from ba_bot.stitching import expand_neighbours, stitch_contexts
+
+SHARED = "Liquids must be in containers of 100ml or less and fit in one bag."
+
+
+def chunk(cid, text, section="Liquids", score=0.5):
+    return {"chunk_id": cid, "section": section, "source": "ba", "score": score, "text": text}
+
+
+A = chunk("ba_lr_004", "Intro sentence about liquids. " + SHARED)
+B = chunk("ba_lr_005", SHARED + " Medicines are exempt.")
+C = chunk("ba_lr_006", "Unrelated tail text about aerosols and gels here.", section="Aerosols")
+
+
+def test_merges_consecutive_chunks_without_repeating_overlap():
+    spans = stitch_contexts([dict(B, score=0.9), A, C])
+    assert [s["chunk_ids"] for s in spans] == [["ba_lr_004", "ba_lr_005"], ["ba_lr_006"]]
+    assert spans[0]["text"].count(SHARED) == 1
+    assert spans[0]["score"] == 0.9
+    assert build_context_block(spans).startswith("[ba_lr_004][ba_lr_005]\n")
+
+
+def test_prior_chunks_are_trimmed_not_repeated():
+    spans = stitch_contexts([B], prior=[A])
+    assert spans[0]["chunk_ids"] == ["ba_lr_005"]
+    assert spans[0]["text"] == "Medicines are exempt."
+
+
+def test_expands_neighbours_within_budget():
+    store = {c["chunk_id"]: c for c in (A, B, C)}
+    assert [c["chunk_id"] for c in expand_neighbours([A], store.get, 10_000)] == ["ba_lr_004", "ba_lr_005"]
+    assert [c["chunk_id"] for c in expand_neighbours([A], store.get, len(A["text"]))] == ["ba_lr_004"]
+    # Neighbour in another section is never pulled in
+    assert [c["chunk_id"] for c in expand_neighbours([B], store.get, 10_000)] == ["ba_lr_005", "ba_lr_004"]
+
+
+def test_short_final_window_inside_previous_tail_is_not_repeated():
+    # ba_lr_017 / ba_lr_018 in data/chunks.jsonl: the last window is 11 chars.
+    section = "Duty-free and airport purchases when connecting"
+    prev = chunk("ba_lr_017", "If you exceed this, you may need to check the items in and be charged a fee.", section)
+    tail = chunk("ba_lr_018", "rged a fee.", section)
+    spans = stitch_contexts([prev, tail])
+    assert [s["chunk_ids"] for s in spans] == [["ba_lr_017", "ba_lr_018"]]
+    assert spans[0]["text"] == prev["text"]
+    # Already in the prompt via the draft's contexts: nothing left to add.
+    assert stitch_contexts([tail], prior=[prev]) == []
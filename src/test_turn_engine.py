@@ -0,0 +1,125 @@
+"""
+One turn through TurnEngine (ba_bot.turn_engine) with stub agents and a
+stub LLM.
+
+    python -m pytest src/test_turn_engine.py
+"""
+from ba_bot.citation_aligner import CitationAligner
+from ba_bot.deadline import StageEstimates
+from ba_bot.llm_client import LLMTimeout
+from ba_bot.memory import MemoryStore
+from ba_bot.turn_engine import TurnEngine
+
+CHUNKS = [
+    {"chunk_id": "ba_lr_012", "section": "Hand baggage requirements for liquids and powders",
+     "text": "Liquids in hand baggage must be in containers of 100ml or less.", "score": 0.9},
+    {"chunk_id": "ba_lr_013", "section": "Hand baggage requirements for liquids and powders",
+     "text": "Powders over 350g may need extra screening at security.", "score": 0.8},
+]
+
+
+class StubRetriever:
+    """The liquids chunk for every query, plus the powders one when asked for."""
+
+    def retrieve(self, queries, facts=None):
+        hits = [dict(CHUNKS[0])]
+        if any("powder" in q.lower() for q in queries):
+            hits.append(dict(CHUNKS[1]))
+        return hits
+
+    def get_chunk(self, chunk_id):
+        return None
+
+
+class StubLLM:
+    """Answers every prompt with `reply` (or raises `error`), counting calls."""
+
+    def __init__(self, reply="Liquids must be 100ml or less. [ba_lr_012]", error=None):
+        self.reply, self.error = reply, error
+        self.calls = []
+
+    def chat(self, system, user, timeout=None, role=None, **kw):
+        self.calls.append(role)
+        if self.error:
+            raise self.error
+        return self.reply
+
+    def last_call_stats(self):
+        return {}
+
+
+class StubPlanner:
+    uses_llm = False
+
+    def plan(self, question, user_context="", timeout=None):
+        return [question]
+
+
+class StubEvaluator:
+    def __init__(self, extra_queries=()):
+        self.extra_queries = list(extra_queries)
+
+    def evaluate(self, question, user_context, answer, context_chunk_ids, timeout=None):
+        if self.extra_queries:
+            return True, self.extra_queries, "needs more evidence"
+        return False, [], "enough evidence"
+
+
+def engine(llm, estimates=None, extra_queries=()):
+    return TurnEngine(
+        llm, StubRetriever(), StubPlanner(), StubEvaluator(extra_queries),
+        estimates=estimates, aligner=CitationAligner(),
+    )
+
+
+def memory():
+    return MemoryStore(session_id="t_turn_engine", persist=False)
+
+
+def test_slow_llm_degrades_to_extractive_answer():
+    llm = StubLLM(error=LLMTimeout("Ollama did not answer within 1.0s"))
+    out = engine(llm).run("Can I bring liquids over 100ml?", memory())
+    assert out["degraded"] and out["degraded_reason"].startswith("Ollama did not answer")
+    assert out["citations"] == ["ba_lr_012"] and "[ba_lr_012]" in out["answer"]
+    assert out["llm_calls"] == 1 and llm.calls == ["draft"]
+
+
+def test_used_up_budget_makes_no_llm_call():
+    llm = StubLLM()
+    # Instant stages: only the used-up budget can stop the calls.
+    est = StageEstimates(defaults={"plan": 0.0, "draft": 0.0, "evaluate": 0.0, "final": 0.0})
+    out = engine(llm, est).run("Can I bring liquids over 100ml?", memory(), budget_s=1e-9)
+    assert out["degraded"] and llm.calls == []
+    assert out["llm_calls"] == 0
+    assert "plan" in out["skipped"] and "evaluate" in out["skipped"]
+
+
+def test_draft_reused_as_final_without_new_evidence():
+    # The extra query only finds chunks the draft already had.
+    llm = StubLLM()
+    out = engine(llm, extra_queries=["liquids limit"]).run("Can I bring liquids over 100ml?", memory())
+    assert out["needs_more"] and out["reused"] == ["final"]
+    assert llm.calls == ["draft"]
+    assert out["llm_calls"] == 2  # draft + evaluator
+    assert out["answer"] == llm.reply and out["chunk_ids"] == ["ba_lr_012"]
+
+
+def test_new_evidence_gets_a_final_call():
+    llm = StubLLM()
+    out = engine(llm, extra_queries=["powder rules"]).run("Can I bring liquids over 100ml?", memory())
+    assert out["reused"] == [] and out["skipped"] == []
+    assert llm.calls == ["draft", "final"] and out["llm_calls"] == 3
+    assert out["chunk_ids"] == ["ba_lr_012", "ba_lr_013"]
+
+
+def test_tight_budget_skips_optional_stages():
+    llm = StubLLM()
+    # Room for the draft only: planning and evaluation are estimated not to fit.
+    est = StageEstimates(defaults={"plan": 5.0, "draft": 5.0, "evaluate": 5.0, "final": 5.0})
+    out = engine(llm, est, extra_queries=["powder rules"]).run(
+        "Can I bring liquids over 100ml?", memory(), budget_s=6.0
+    )
+    assert out["skipped"] == ["plan", "evaluate"] and not out["degraded"]
+    assert out["subqueries"] == ["Can I bring liquids over 100ml?"]
+    assert llm.calls == ["draft"] and out["llm_calls"] == 1
+    assert out["reused"] == ["final"]  # no evaluator, so no new evidence